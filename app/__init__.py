@@ -0,0 +1,70 @@
+"""
+FlowerStream, an online flower shop.
+
+create_app() builds the Flask application. The views live in blueprints: catalog, auth,
+cart, orders, admin and api (the JSON API); web.py holds the app-wide hooks, logs.py
+the logging setup and request log, metrics.py the request metrics (/metrics) and profiling.py
+the admins' request profiler. Production
+servers load wsgi.py (see gunicorn.conf.py); 'python -m app' runs the development server.
+"""
+import os
+from collections.abc import Mapping
+
+import stripe
+from flask import Flask
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from . import admin, api, auth, cart, catalog, logs, metrics, orders, profiling, web
+from .compression import CompressionMiddleware, send_static_file
+from .config import Config
+from .db import close_connection, configure_slow_query_log, init_db
+
+BLUEPRINTS = (web.bp, catalog.bp, auth.bp, cart.bp, orders.bp, admin.bp, api.bp)
+
+
+def create_app(config=None):
+    """
+    Creates the application from Config, overridden by 'config' (a dict or a settings
+    object), and creates or migrates the database schema.
+
+    Safe to call once in a pre-fork server's master process (gunicorn --preload): the
+    connection init_db() uses is closed again before this returns, and every per-process
+    resource (database connections, the image and password pools, the group-commit writer,
+    the rate limiter's connections) is created on first use in the process that uses it.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, Mapping):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    stripe.api_key = app.config['STRIPE_SECRET_KEY']
+    app.teardown_appcontext(close_connection)
+    logs.configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+    configure_slow_query_log(app.config['SLOW_QUERY_LOG'], app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                             app.config['SLOW_QUERY_LOG_BACKUPS'])
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        # New worker processes load compiled templates instead of compiling them on their first requests
+        if app.config['TEMPLATE_CACHE_DIR']:
+            os.makedirs(app.config['TEMPLATE_CACHE_DIR'], exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_DIR'] or None)
+    if app.config['COMPRESS_ENABLED']:
+        app.wsgi_app = CompressionMiddleware(app.wsgi_app, minimum_size=app.config['COMPRESS_MIN_SIZE'],
+                                             gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+                                             brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'])
+    if app.config['TRUSTED_PROXIES']:
+        # Outermost, so every other layer sees the client's address (see asgi.read_view for the read path)
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=1)
+    app.view_functions['static'] = send_static_file  # Serves precompressed .br/.gz siblings when present
+
+    # The request log, metrics and profiling hooks go first, so they take in the other hooks too
+    first = (logs.bp,) + ((metrics.bp,) if app.config['METRICS_ENABLED'] else ()) + \
+        ((profiling.bp,) if app.config['PROFILING_ENABLED'] else ())
+    for blueprint in first + BLUEPRINTS:
+        app.register_blueprint(blueprint)
+
+    with app.app_context():  # Closes its connection on exit, before any worker is forked
+        init_db()
+    return app
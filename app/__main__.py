@@ -0,0 +1,5 @@
+"""Development server: 'python -m app'. Production serving goes through wsgi.py (see gunicorn.conf.py)."""
+from . import create_app
+
+if __name__ == '__main__':
+    create_app().run(debug=True)
@@ -0,0 +1,574 @@
+"""
+Administration: edit mode and product management (with image uploads processed off the
+request thread), the order list with its live updates, its CSV export, order statuses and the
+dashboard.
+"""
+import csv
+import datetime
+import io
+import itertools
+import logging
+import os
+
+from flask import (Blueprint, current_app, flash, get_template_attribute, jsonify, redirect, render_template, request,
+                   session, stream_with_context, url_for)
+from werkzeug.utils import secure_filename
+
+from .catalog import get_flower_by_id
+from .db import connect, get_db_connection, get_lock_stats, get_read_connection, get_slow_queries, write_transaction
+from .images import (create_variants, discard_upload, get_image_processor, remove_variants, stage_upload,
+                     store_upload, UploadError)
+from .profiling import list_profiles
+from .web import stream_page
+
+bp = Blueprint('admin', __name__)
+log = logging.getLogger(__name__)
+
+
+def release_image(image_url, db=None):
+    """
+    Deletes an uploaded image file and its variants once no product references it.
+    Uploads are content-addressed, so several products may share one file.
+    The check runs in its own write transaction: an upload of the same content either
+    commits its product first (and the file is kept) or stores the file again afterwards.
+    Bundled catalog images (static/images/flower*) are never deleted.
+    """
+    if not image_url or "static/images/flower" in image_url:
+        return
+    if db is None:
+        db = get_db_connection()
+    with write_transaction(db):
+        if db.execute("SELECT 1 FROM products WHERE image_url = ? LIMIT 1", (image_url,)).fetchone():
+            return
+        file_path = os.path.join(current_app.root_path, image_url.lstrip('/'))
+        try:
+            os.remove(file_path)
+            remove_variants(file_path)
+            log.info("Image deleted: %s", file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.warning("Error deleting image %s: %s", file_path, e)
+
+
+def process_uploaded_image(database, product_id, image_url, old_image_url, widths):
+    """
+    Runs on the image processor thread pool after an upload was committed:
+    decodes the image, writes its srcset variants, records its size and dominant colour,
+    clears products.image_pending (the templates show a placeholder until then)
+    and deletes the replaced image.
+    An upload that cannot be decoded is swapped back for the previous image.
+    """
+    db = connect(database)
+    try:
+        file_path = os.path.join(current_app.root_path, image_url)
+        try:
+            info = create_variants(file_path, widths)
+        except Exception:
+            log.exception("Error processing uploaded image %s", file_path)
+            info = None
+
+        with write_transaction(db):
+            # 'image_url = ?' skips the update if the product got another image meanwhile
+            if info:
+                db.execute("UPDATE products SET image_pending = 0, image_width = ?, image_height = ?, image_placeholder = ?, "
+                           "version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND image_url = ?",
+                           (info.width, info.height, info.placeholder, product_id, image_url))
+            else:
+                db.execute("UPDATE products SET image_url = ?, image_pending = 0, "
+                           "version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ? AND image_url = ?",
+                           (old_image_url, product_id, image_url))
+        release_image(old_image_url if info else image_url, db)
+    finally:
+        db.close()
+
+
+def release_image_task(database, image_url):
+    """release_image() for the image thread pool, on a connection of its own."""
+    db = connect(database)
+    try:
+        release_image(image_url, db)
+    finally:
+        db.close()
+
+
+def submit_image_task(task, *args):
+    """
+    Runs 'task(*args)' on the bounded image thread pool of this process, inside an
+    app context of the current app (the tasks read its root path).
+    """
+    app = current_app._get_current_object()
+
+    def run_in_app_context(*args):
+        with app.app_context():
+            task(*args)
+
+    run_in_app_context.__name__ = task.__name__  # Named in the pool's error messages
+    get_image_processor(app.config['IMAGE_WORKERS'], app.config['IMAGE_QUEUE_SIZE']).submit(run_in_app_context, *args)
+
+
+def stage_image_upload(image_file):
+    """
+    Streams an uploaded image to a temporary file in the upload folder (see images.stage_upload).
+    The format is checked by magic bytes against ALLOWED_EXTENSIONS; raises UploadError.
+    """
+    config = current_app.config
+    return stage_upload(image_file.stream, os.path.join(current_app.root_path, config['UPLOAD_FOLDER']),
+                        allowed_types=config['ALLOWED_EXTENSIONS'], max_bytes=config['MAX_CONTENT_LENGTH'])
+
+
+@bp.route('/toggle_edit_mode', methods=['POST'])
+def toggle_edit_mode():
+    """
+    Toggles edit mode for administrators.
+    Only accessible by logged-in administrators.
+    """
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори можуть перемикати режим редагування.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    session['edit_mode'] = not session.get('edit_mode', False) # Toggle the edit_mode boolean
+    flash(f"Режим редагування: {'увімкнено' if session['edit_mode'] else 'вимкнено'}.", 'info')
+    return redirect(url_for('catalog.home'))
+
+
+@bp.route('/edit_flower/<int:flower_id>', methods=['POST'])
+def edit_flower(flower_id):
+    """
+    Edits an existing product in the database.
+    Allows updating name, description, price, image, and stock.
+    Handles deletion of old images if a new one is uploaded (except initial default images).
+    Requires administrator privileges and edit mode to be active.
+    """
+    if not session.get('is_admin') or not session.get('edit_mode'):
+        flash('Доступ заборонено. Увімкніть режим редагування, щоб редагувати квіти.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    name = request.form['name']
+    description = request.form['description']
+    price = float(request.form['price'])
+    stock = int(request.form['stock']) # Get stock from form
+    image_file = request.files.get('image')
+
+    # Basic validation for stock
+    if stock < 0:
+        flash("Кількість товару в наявності не може бути від'ємною.", "danger")
+        return redirect(url_for('catalog.home'))
+
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    # Get the current product to retrieve the old image_url
+    current_flower = get_flower_by_id(flower_id)
+    old_image_url = current_flower['image_url'] if current_flower else None
+    new_image_url = old_image_url # Default to old if no new image is uploaded
+
+    upload_folder = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+    staged = None
+    if image_file and image_file.filename != '':
+        original_filename = secure_filename(image_file.filename)
+        try:
+            staged = stage_image_upload(image_file) # Named by content hash once stored
+        except UploadError as e:
+            flash(f"Недопустимий файл зображення для оновлення: {e}", "danger")
+            return redirect(url_for('catalog.home'))
+        except Exception as e:
+            flash(f"Помилка при завантаженні нового зображення: {e}", "danger")
+            log.exception("Image upload error")
+            return redirect(url_for('catalog.home'))
+
+    with write_transaction(db):
+        try:
+            if staged:
+                # Stored inside the transaction, so release_image() of another product cannot
+                # delete an identical file between storing it and referencing it
+                file_path = store_upload(staged, upload_folder)
+                new_image_url = os.path.join(current_app.config['UPLOAD_FOLDER'], staged.filename).replace("\\", "/")
+                flash(f"Нове зображення '{original_filename}' завантажено і обробляється.", "success")
+                log.info("New image saved: %s. URL for DB: %s", file_path, new_image_url)
+            # Update query to include stock; a new image stays pending until process_uploaded_image() is done.
+            # version/updated_at are the product page's ETag and Last-Modified (see catalog.product_validators())
+            cursor.execute("UPDATE products SET name = ?, description = ?, price = ?, image_url = ?, stock = ?, "
+                           "image_pending = MAX(image_pending, ?), version = version + 1, updated_at = CURRENT_TIMESTAMP "
+                           "WHERE id = ?",
+                           (name, description, price, new_image_url, stock, int(new_image_url != old_image_url), flower_id))
+            flash(f"Товар \"{name}\" оновлено.", "success")
+        except Exception as e:
+            flash(f"Помилка при оновленні товару в базі даних: {e}", "danger")
+            log.exception("DB error updating product %s", flower_id)
+            db.rollback()
+            new_image_url = old_image_url
+
+    if staged:
+        discard_upload(staged) # Only left over if the update failed
+    if new_image_url != old_image_url:
+        # Resizing and deleting the old file (unless another product shares it) happen off the request thread
+        submit_image_task(process_uploaded_image, current_app.config['DATABASE'], flower_id, new_image_url,
+                          old_image_url, current_app.config['IMAGE_WIDTHS'])
+
+    return redirect(url_for('catalog.home'))
+
+
+@bp.route('/delete_flower/<int:flower_id>', methods=['POST'])
+def delete_flower(flower_id):
+    """
+    Deletes a product from the database and its associated image file.
+    Requires administrator privileges and edit mode to be active.
+    """
+    if not session.get('is_admin') or not session.get('edit_mode'):
+        flash('Доступ заборонено. Увімкніть режим редагування, щоб видаляти квіти.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    flower = get_flower_by_id(flower_id)
+    if not flower:
+        flash("Товар не знайдено.", "danger")
+        return redirect(url_for('catalog.home'))
+
+    with write_transaction(db):
+        try:
+            # Deleting the product will automatically delete related cart_items and favorite_items due to CASCADE
+            cursor.execute("DELETE FROM products WHERE id = ?", (flower_id,))
+        except Exception as e:
+            flash(f"Помилка при видаленні товару: {e}", "danger")
+            log.exception("DB error deleting product %s", flower_id)
+            db.rollback()
+            return redirect(url_for('catalog.home'))
+
+    # Delete the image file (after the commit, off the request thread) unless another product still uses it
+    if flower['image_url']:
+        submit_image_task(release_image_task, current_app.config['DATABASE'], flower['image_url'])
+
+    flash(f"Товар \"{flower['name']}\" успішно видалено.", "success")
+    return redirect(url_for('catalog.home'))
+
+
+@bp.route('/add_flower', methods=['POST'])
+def add_flower():
+    """
+    Adds a new product (flower) to the database.
+    Allows uploading an image for the new product and setting initial stock.
+    Requires administrator privileges and edit mode to be active.
+    """
+    if not session.get('is_admin') or not session.get('edit_mode'):
+        flash('Доступ заборонено. Увімкніть режим редагування, щоб додавати квіти.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    name = request.form.get('name')
+    description = request.form.get('description')
+    price = request.form.get('price')
+    stock = request.form.get('stock') # Get stock from form
+    image_file = request.files.get('image')
+
+    if not all([name, price, stock]): # Ensure stock is also provided
+        flash("Будь ласка, заповніть усі поля: назву, ціну та кількість в наявності.", "danger")
+        return redirect(url_for('catalog.home'))
+
+    try:
+        price = float(price)
+        stock = int(stock)
+        if stock < 0:
+            flash("Кількість товару в наявності не може бути від'ємною.", "danger")
+            return redirect(url_for('catalog.home'))
+    except ValueError:
+        flash("Ціна повинна бути числом, а кількість в наявності - цілим числом.", "danger")
+        return redirect(url_for('catalog.home'))
+
+    image_url = None
+    upload_folder = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+    staged = None
+    if image_file and image_file.filename != '':
+        original_filename = secure_filename(image_file.filename)
+        try:
+            # Copy the upload to a temporary file, named by its content hash once stored
+            staged = stage_image_upload(image_file)
+        except UploadError as e:
+            flash(f"Недопустимий файл зображення: {e}", "danger")
+            return redirect(url_for('catalog.home'))
+        except Exception as e:
+            flash(f"Помилка при збереженні зображення: {e}", "danger")
+            log.exception("Image save error")
+            return redirect(url_for('catalog.home'))
+    else: # If no file selected or filename is empty
+        flash("Товар буде додано без зображення.", "info")
+        log.info("No image provided or file was empty.")
+
+
+    db = get_db_connection()
+    cursor = db.cursor()
+    with write_transaction(db):
+        try:
+            if staged:
+                # Stored inside the transaction, see edit_flower()
+                file_path = store_upload(staged, upload_folder)
+                # Save relative URL for use in Flask templates
+                image_url = os.path.join(current_app.config['UPLOAD_FOLDER'], staged.filename).replace("\\", "/")
+                flash(f"Нове зображення '{original_filename}' завантажено і обробляється.", "success")
+                log.info("New image saved: %s. URL for DB: %s", file_path, image_url)
+            # Insert query now includes stock; the image stays pending until process_uploaded_image() is done
+            cursor.execute("INSERT INTO products (name, description, price, image_url, stock, image_pending) "
+                           "VALUES (?, ?, ?, ?, ?, ?)",
+                           (name, description, price, image_url, stock, int(image_url is not None)))
+            product_id = cursor.lastrowid
+            flash(f"Товар \"{name}\" успішно додано.", "success")
+            log.info("Product '%s' added to DB with URL: %s, Stock: %s", name, image_url, stock)
+        except Exception as e:
+            flash(f"Помилка при додаванні товару до бази даних: {e}", "danger")
+            log.exception("DB error adding product")
+            db.rollback()
+            image_url = None
+
+    if staged:
+        discard_upload(staged) # Only left over if the insert failed
+    if image_url:
+        submit_image_task(process_uploaded_image, current_app.config['DATABASE'], product_id, image_url, None,
+                          current_app.config['IMAGE_WIDTHS'])
+
+    return redirect(url_for('catalog.home'))
+
+
+def group_order_rows(cursor, fetch_size):
+    """
+    Yields the orders of a cursor over the rows of iter_admin_orders' query (one per order item,
+    the rows of an order next to each other) as dicts with their customer, delivery details and items.
+    Rows are fetched 'fetch_size' at a time.
+    """
+    kyiv_offset = datetime.timedelta(hours=3)
+    order = None
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        for row in rows:
+            if order is None or row['id'] != order['id']:
+                if order is not None:
+                    yield order
+
+                # Format created_at to Kyiv time
+                try:
+                    utc_dt = datetime.datetime.strptime(row['created_at'], "%Y-%m-%d %H:%M:%S")
+                    formatted_time = (utc_dt + kyiv_offset).strftime("%Y-%m-%d %H:%M:%S")
+                except ValueError:
+                    formatted_time = row['created_at'] # Fallback
+
+                order = {
+                    'id': row['id'],
+                    'username': row['username'],
+                    'phone_number': row['phone_number'],
+                    'recipient_name': row['recipient_name'],
+                    'delivery_address': row['delivery_address'],
+                    'phone_number_at_purchase': row['phone_number_at_purchase'],
+                    'total_amount': row['total_amount'],
+                    'status': row['status'],
+                    'created_at': formatted_time,
+                    'change_seq': row['change_seq'],
+                    'items': []
+                }
+            if row['name'] is not None: # No items (LEFT JOIN), or the product is gone
+                order['items'].append({
+                    'name': row['name'],
+                    'quantity': row['quantity'],
+                    'price_at_purchase': row['price_at_purchase'],
+                    'image_url': row['image_url']
+                })
+    if order is not None:
+        yield order
+
+
+def iter_admin_orders(db, fetch_size=200):
+    """
+    Yields every order, newest first, as a dict with its customer, delivery details and items.
+    One query joins orders with their items; rows are fetched 'fetch_size' at a time and
+    grouped by order, so memory does not grow with the number of orders.
+    """
+    cursor = db.execute(
+        """
+        SELECT o.id, o.total_amount, o.status, o.created_at, o.recipient_name, o.delivery_address,
+               o.phone_number_at_purchase, o.change_seq, u.username, u.phone_number,
+               oi.quantity, oi.price_at_purchase, p.name, p.image_url
+        FROM orders o
+        JOIN users u ON o.user_id = u.id
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        LEFT JOIN products p ON p.id = oi.flower_id
+        ORDER BY o.created_at DESC, o.id DESC
+        """
+    )
+    return group_order_rows(cursor, fetch_size)
+
+
+def get_last_order_change(db):
+    """The highest orders.change_seq: the admin order page asks for the changes after it."""
+    return db.execute("SELECT COALESCE(MAX(change_seq), 0) FROM orders").fetchone()[0]
+
+
+def load_order_changes(after_seq, limit, db):
+    """
+    The orders created or with a changed status since 'after_seq' (see the orders triggers in
+    init_db), oldest change first: at most 'limit' of them, and whether there are more.
+    The query walks the change_seq index from 'after_seq' and is left once 'limit' orders are
+    read, so it costs the same however many orders there are.
+    """
+    cursor = db.execute(
+        """
+        SELECT o.id, o.total_amount, o.status, o.created_at, o.recipient_name, o.delivery_address,
+               o.phone_number_at_purchase, o.change_seq, u.username, u.phone_number,
+               oi.quantity, oi.price_at_purchase, p.name, p.image_url
+        FROM orders o
+        JOIN users u ON o.user_id = u.id
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        LEFT JOIN products p ON p.id = oi.flower_id
+        WHERE o.change_seq > ?
+        ORDER BY o.change_seq
+        """,
+        (after_seq,)
+    )
+    orders = list(itertools.islice(group_order_rows(cursor, limit + 1), limit + 1))
+    cursor.close()
+    return orders[:limit], len(orders) > limit
+
+
+@bp.route('/admin/orders')
+def admin_orders():
+    """
+    Displays all orders for administrators, allowing them to change order status.
+    Requires administrator privileges.
+    The page is streamed while the orders are read (see iter_admin_orders), then keeps itself
+    up to date from admin_order_changes.
+    """
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори можуть переглядати замовлення.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    db = get_read_connection()
+    # Read before the orders: a change made while the page streams is sent again, not missed
+    last_change = get_last_order_change(db)
+    orders = iter_admin_orders(db, current_app.config['ORDERS_FETCH_SIZE'])
+    return stream_page('admin_orders.html', orders=orders, last_change=last_change)
+
+
+@bp.route('/admin/orders/changes')
+def admin_order_changes():
+    """
+    Returns the orders created or with a changed status after ?after=<change_seq> as JSON:
+    'orders' (id and the rendered card of each), 'last_change' to ask from next time, and
+    'more' when the page should ask again at once. Requires administrator privileges.
+    """
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Доступ заборонено.'}), 403
+
+    after = request.args.get('after', 0, type=int)
+    orders, more = load_order_changes(after, current_app.config['ADMIN_ORDERS_FEED_LIMIT'], get_read_connection())
+    order_card = get_template_attribute('_macros.html', 'order_card')
+    return jsonify({
+        'orders': [{'id': order['id'], 'html': str(order_card(order, admin=True))} for order in orders],
+        'last_change': orders[-1]['change_seq'] if orders else after,
+        'more': more,
+    })
+
+@bp.route('/admin/orders/export.csv')
+def admin_orders_export():
+    """
+    Exports all orders as CSV (one row per order), streamed like the admin order list.
+    Requires administrator privileges.
+    """
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори можуть переглядати замовлення.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    orders = iter_admin_orders(get_read_connection(), current_app.config['ORDERS_FETCH_SIZE'])
+    buffer_size = current_app.config['STREAM_BUFFER_SIZE']
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff') # BOM, so spreadsheet programs read the file as UTF-8
+        writer.writerow(['id', 'created_at', 'status', 'username', 'recipient_name', 'delivery_address',
+                         'phone_number', 'total_amount', 'items'])
+        for order in orders:
+            items = '; '.join(f"{item['name']} x{item['quantity']} ({item['price_at_purchase']:.2f})"
+                              for item in order['items'])
+            writer.writerow([order['id'], order['created_at'], order['status'], order['username'],
+                             order['recipient_name'], order['delivery_address'], order['phone_number_at_purchase'],
+                             f"{order['total_amount']:.2f}", items])
+            if buffer.tell() >= buffer_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='text/csv',
+                                      headers={'Content-Disposition': 'attachment; filename=orders.csv'})
+
+@bp.route('/admin_dashboard')
+def admin_dashboard():
+    """
+    Displays the admin dashboard.
+    Only accessible by logged-in administrators.
+    """
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори мають доступ до адмін-панелі.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    profiles = None
+    if current_app.config['PROFILING_ENABLED']:
+        profiles = list_profiles(current_app.config['PROFILE_DIR'], limit=20)
+    return render_template('admin_dashboard.html', profiles=profiles)
+
+@bp.route('/admin/db_lock_stats')
+def admin_db_lock_stats():
+    """
+    Returns per-route write lock statistics of this worker process as JSON:
+    transactions, BEGIN retries, 503 give-ups and time spent waiting for the lock.
+    Requires administrator privileges.
+    """
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Доступ заборонено.'}), 403
+    return jsonify(get_lock_stats())
+
+@bp.route('/admin/slow_queries')
+def admin_slow_queries():
+    """
+    Lists the SQL statements of this worker process that took longest in total over
+    SLOW_QUERY_MS, with their query plans, and its most recent slow queries.
+    Requires administrator privileges.
+    """
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори мають доступ до адмін-панелі.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    top, recent = get_slow_queries()
+    recent = [dict(entry, at=datetime.datetime.fromtimestamp(entry['at']).strftime("%Y-%m-%d %H:%M:%S"))
+              for entry in recent[:50]]
+    return render_template('admin_slow_queries.html', top=top, recent=recent, pid=os.getpid(),
+                           threshold_ms=current_app.config['SLOW_QUERY_MS'])
+
+@bp.route('/admin/update_order_status/<int:order_id>', methods=['POST'])
+def update_order_status(order_id):
+    """
+    Updates the status of a specific order.
+    Requires administrator privileges.
+    """
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори можуть оновлювати статус замовлень.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    new_status = request.form.get('status')
+    if new_status not in ['Очікується', 'Підтверджено']:
+        flash('Недійсний статус замовлення.', 'danger')
+        return redirect(url_for('admin.admin_orders'))
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    with write_transaction(db):
+        try:
+            cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (new_status, order_id))
+            flash(f"Статус замовлення №{order_id} оновлено на '{new_status}'.", "success")
+        except Exception as e:
+            flash(f"Помилка при оновленні статусу замовлення: {e}", "danger")
+            db.rollback()
+
+    return redirect(url_for('admin.admin_orders'))
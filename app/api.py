@@ -0,0 +1,229 @@
+"""
+JSON API for the mobile app and partners (/api/...), authenticated with bearer tokens
+(see tokens.py).
+"""
+import json
+import math
+from functools import wraps
+
+from flask import Blueprint, current_app, g, jsonify, request, stream_with_context
+
+from . import tokens
+from .admin import iter_admin_orders
+from .auth import check_credentials
+from .cart import add_cart_item, load_user_cart_from_db, load_user_favorites_from_db, set_cart_item_quantity
+from .catalog import get_flower_by_id
+from .db import get_read_connection
+from .orders import load_user_orders
+from .web import _buffered, api_error, run_write
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+
+@bp.record_once
+def create_revocation_set(state):
+    state.app.extensions['revoked_tokens'] = tokens.RevocationSet(state.app.config['JWT_REVOCATION_REFRESH'])
+
+
+def token_keys():
+    return tokens.get_key_ring(current_app.config['JWT_SECRET_KEYS'], current_app.config['SECRET_KEY'])
+
+
+def token_response(user_id, role, refresh_token):
+    """A new access token for the user, together with the refresh token issued with it."""
+    ttl = current_app.config['JWT_ACCESS_TTL']
+    claims = tokens.access_token_claims(user_id, role, ttl)
+    return jsonify({'access_token': tokens.encode(claims, token_keys()), 'token_type': 'Bearer',
+                    'expires_in': ttl, 'refresh_token': refresh_token})
+
+
+def token_required(admin=False):
+    """
+    Decorator for API views: requires 'Authorization: Bearer <access token>'.
+    The token alone identifies the user (g.api_user_id) and role; the users table is not read.
+    Answers 401 for a missing, invalid, expired or revoked token and 403 for a non-admin
+    token on an admin view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+            if scheme.lower() != 'bearer' or not token:
+                return api_error(401, 'Потрібен токен доступу.', {'WWW-Authenticate': 'Bearer'})
+            revoked_tokens = current_app.extensions['revoked_tokens']
+            try:
+                claims = tokens.decode(token, token_keys())
+                if claims.get('typ') != 'access':
+                    raise tokens.TokenError("not an access token")
+                if revoked_tokens.stale():
+                    revoked_tokens.refresh(get_read_connection())
+                if claims.get('jti') in revoked_tokens:
+                    raise tokens.TokenError("token revoked")
+            except tokens.TokenError as e:
+                return api_error(401, f'Недійсний токен: {e}.', {'WWW-Authenticate': 'Bearer error="invalid_token"'})
+            if admin and claims.get('role') != 'admin':
+                return api_error(403, 'Доступ заборонено.')
+            g.token_claims = claims
+            g.api_user_id = int(claims['sub'])
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def json_quantity(default=None):
+    """'quantity' from the JSON body as an int, 'default' if absent, None if it is not a number."""
+    value = (request.get_json(silent=True) or {}).get('quantity', default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        return None
+    return value
+
+
+@bp.route('/auth/token', methods=['POST'])
+def token():
+    """Exchanges {"username", "password"} for an access token and a refresh token."""
+    data = request.get_json(silent=True) or {}
+    username, password = data.get('username'), data.get('password')
+    if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+        return api_error(400, 'Потрібні username і password.')
+
+    user, retry_after = check_credentials(username, password)
+    if retry_after:
+        return api_error(429, 'Забагато невдалих спроб входу.', {'Retry-After': str(math.ceil(retry_after))})
+    if not user:
+        return api_error(401, 'Невірні логін або пароль.')
+    ttl = current_app.config['JWT_REFRESH_TTL']
+    refresh_token = run_write(lambda db: tokens.store_refresh_token(db, user['id'], ttl))
+    return token_response(user['id'], user['role'], refresh_token)
+
+
+@bp.route('/auth/refresh', methods=['POST'])
+def refresh():
+    """Exchanges {"refresh_token"} for a new access token; the refresh token is replaced by a new one."""
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if not isinstance(refresh_token, str) or not refresh_token:
+        return api_error(400, 'Потрібен refresh_token.')
+    ttl = current_app.config['JWT_REFRESH_TTL']
+
+    def rotate(db):
+        user_id = tokens.consume_refresh_token(db, refresh_token)
+        user = user_id is not None and db.execute("SELECT id, role FROM users WHERE id = ?", (user_id,)).fetchone()
+        if not user:
+            return None
+        return user['id'], user['role'], tokens.store_refresh_token(db, user['id'], ttl)
+
+    rotated = run_write(rotate)
+    if rotated is None:
+        return api_error(401, 'Недійсний refresh_token.')
+    return token_response(*rotated)
+
+
+@bp.route('/auth/logout', methods=['POST'])
+@token_required()
+def logout():
+    """Revokes the access token and, if given in the body, the refresh token."""
+    claims = g.token_claims
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    revoked_tokens = current_app.extensions['revoked_tokens']
+
+    def revoke(db):
+        revoked_tokens.revoke(db, claims['jti'], claims['exp'])
+        if isinstance(refresh_token, str):
+            tokens.consume_refresh_token(db, refresh_token)
+
+    run_write(revoke)
+    return '', 204
+
+
+def cart_response(user_id, status=200):
+    cart = load_user_cart_from_db(user_id)
+    return jsonify({'items': cart, 'total': sum(item['price'] * item['quantity'] for item in cart)}), status
+
+
+@bp.route('/cart', methods=['GET'])
+@token_required()
+def cart():
+    return cart_response(g.api_user_id)
+
+
+@bp.route('/cart/<int:flower_id>', methods=['POST'])
+@token_required()
+def add_to_cart(flower_id):
+    """Adds {"quantity": n} (default 1) of a flower to the cart, like cart.add_to_cart()."""
+    quantity = json_quantity(default=1)
+    if quantity is None or quantity < 1:
+        return api_error(400, 'Кількість має бути цілим числом не менше 1.')
+    if not get_flower_by_id(flower_id):
+        return api_error(404, 'Квітка не знайдена.')
+    user_id = g.api_user_id
+    run_write(lambda db: add_cart_item(db, user_id, flower_id, quantity))
+    return cart_response(user_id)
+
+
+@bp.route('/cart/<int:flower_id>', methods=['PUT'])
+@token_required()
+def update_cart_item(flower_id):
+    """Sets the quantity of a cart item to {"quantity": n}; 0 removes it."""
+    quantity = json_quantity()
+    if quantity is None:
+        return api_error(400, 'Кількість має бути цілим числом.')
+    user_id = g.api_user_id
+    if run_write(lambda db: set_cart_item_quantity(db, user_id, flower_id, quantity)) == 'missing':
+        return api_error(404, 'Товар не знайдено в кошику.')
+    return cart_response(user_id)
+
+
+@bp.route('/cart/<int:flower_id>', methods=['DELETE'])
+@token_required()
+def remove_from_cart(flower_id):
+    user_id = g.api_user_id
+    run_write(lambda db: set_cart_item_quantity(db, user_id, flower_id, 0))
+    return cart_response(user_id)
+
+
+@bp.route('/favorites', methods=['GET'])
+@token_required()
+def favorites():
+    return jsonify({'items': load_user_favorites_from_db(g.api_user_id)})
+
+
+@bp.route('/favorites/<int:flower_id>', methods=['POST'])
+@token_required()
+def add_to_favorites(flower_id):
+    """Adds a flower to the favorites; adding one that is already there is not an error."""
+    if not get_flower_by_id(flower_id):
+        return api_error(404, 'Квітка не знайдена.')
+    user_id = g.api_user_id
+    run_write(lambda db: db.execute("INSERT OR IGNORE INTO favorite_items (user_id, flower_id) VALUES (?, ?)",
+                                    (user_id, flower_id)).rowcount)
+    return jsonify({'items': load_user_favorites_from_db(user_id)})
+
+
+@bp.route('/favorites/<int:flower_id>', methods=['DELETE'])
+@token_required()
+def remove_from_favorites(flower_id):
+    user_id = g.api_user_id
+    run_write(lambda db: db.execute("DELETE FROM favorite_items WHERE user_id = ? AND flower_id = ?",
+                                    (user_id, flower_id)).rowcount)
+    return jsonify({'items': load_user_favorites_from_db(user_id)})
+
+
+@bp.route('/orders', methods=['GET'])
+@token_required()
+def orders():
+    return jsonify({'orders': load_user_orders(g.api_user_id)})
+
+
+@bp.route('/admin/orders', methods=['GET'])
+@token_required(admin=True)
+def admin_orders():
+    """Every order, newest first, streamed like the admin order page."""
+    fetch_size, buffer_size = current_app.config['ORDERS_FETCH_SIZE'], current_app.config['STREAM_BUFFER_SIZE']
+
+    def generate():
+        yield '{"orders":['
+        for index, order in enumerate(iter_admin_orders(get_read_connection(), fetch_size)):
+            yield (',' if index else '') + json.dumps(order, ensure_ascii=False)
+        yield ']}'
+
+    return current_app.response_class(stream_with_context(_buffered(generate(), buffer_size)),
+                                      mimetype='application/json')
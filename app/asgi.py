@@ -0,0 +1,308 @@
+"""
+ASGI read path: the catalog, product pages, the flower JSON and the cart page are served by
+coroutines, as is the live stock feed (/stock/stream, see stock_feed.py); every other route
+goes to the Flask app through a WSGI adapter (a2wsgi).
+
+    uvicorn asgi:app --workers 4
+
+A sync worker holds one of its threads for the whole request, including the wait for the
+NBU exchange rate in the cart. Here those waits are awaited instead: SQLite queries run on a
+small pool of threads (ReadExecutor), each with its own read-only connection, and the rate is
+fetched with httpx.AsyncClient, so one process keeps many connections open at once.
+
+The pages are the Flask ones: each view runs inside a Flask request context built from the
+ASGI scope, with the app's before/after request hooks (rate limit, session cookie), templates,
+context processors, cache validators and response compression. Those hooks and the template
+rendering are synchronous and may block (the SQLite rate-limit store takes a write lock, an
+image variant lookup stats the disk), so they run on threads too, never on the event loop.
+"""
+import asyncio
+import contextlib
+import contextvars
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from flask import current_app, flash, jsonify, make_response, redirect, render_template, request, session, url_for
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from .catalog import (clear_anonymous_session, flower_json, get_average_rating_for_product, get_flower_by_id,
+                      get_reviews_for_product, is_not_modified, load_products_from_db, product_validators,
+                      set_cache_validators, user_has_reviewed)
+from .compression import CompressionMiddleware
+from .db import connect
+from .stock_feed import StockNotifier, format_event, parse_product_ids
+from .utils import fetch_uah_to_eur_rate
+
+
+class ReadExecutor:
+    """
+    Runs read queries on 'threads' threads, each with its own read-only connection (see
+    db.connect), and lets the event loop await them. A query is a loader taking a 'db'
+    keyword argument, such as catalog.load_products_from_db.
+    """
+
+    def __init__(self, database, threads):
+        self.database = database
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='asgi-read')
+        self._local = threading.local()
+
+    def _call(self, query, args):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = connect(self.database, readonly=True)
+        return query(*args, db=db)
+
+    async def run(self, query, *args):
+        # In the caller's context, so the statements count towards its request (see metrics.py)
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._pool, context.run, self._call, query, args)
+
+    def close(self):
+        self._pool.shutdown()
+
+
+async def read(query, *args):
+    """Runs 'query' on the read executor of the current app."""
+    return await current_app.extensions['asgi_reads'].run(query, *args)
+
+
+def wsgi_environ(scope):
+    """The WSGI environ of a request without a body (GET/HEAD), for a Flask request context."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def asgi_response(flask_app, response, environ):
+    """Sends a finished Flask response through the same compression as the WSGI path."""
+    config = flask_app.config
+    wsgi_app = response
+    if config['COMPRESS_ENABLED']:
+        wsgi_app = CompressionMiddleware(response, minimum_size=config['COMPRESS_MIN_SIZE'],
+                                         gzip_level=config['COMPRESS_GZIP_LEVEL'],
+                                         brotli_quality=config['COMPRESS_BROTLI_QUALITY'])
+    captured = []
+    app_iter = wsgi_app(environ, lambda status, headers, exc_info=None: captured.extend((status, headers)))
+    try:
+        body = b''.join(app_iter)
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+    status, headers = captured
+    asgi = Response(body, status_code=int(status.split(' ', 1)[0]))
+    asgi.raw_headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    return asgi
+
+
+def finish_response(flask_app, rv, environ):
+    """The view's return value as a compressed ASGI response, after the after_request hooks."""
+    return asgi_response(flask_app, flask_app.process_response(flask_app.make_response(rv)), environ)
+
+
+def read_view(flask_app, view):
+    """
+    Turns an async view into a Starlette endpoint running in a Flask request context, with the
+    app's before_request hooks (a response from one of them skips the view) and after_request
+    hooks, which also save the session cookie. Behind TRUSTED_PROXIES the client's address
+    comes from X-Forwarded-For, as create_app sets up for the WSGI routes.
+
+    The request context, the hooks and the error handlers run on the loop's default executor,
+    all in one contextvars.Context shared with the view, so what a hook sets there (the
+    request context itself, the SQL counter of metrics.py) is seen by the view and the teardown.
+    """
+    proxies = flask_app.config['TRUSTED_PROXIES']
+    trust_proxies = ProxyFix(lambda environ, start_response: environ, x_for=proxies, x_proto=1) if proxies else None
+
+    async def endpoint(starlette_request):
+        environ = wsgi_environ(starlette_request.scope)
+        if trust_proxies:
+            environ = trust_proxies(environ, None)
+        request_context = flask_app.request_context(environ)
+        context = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+
+        def off_loop(function, *args):
+            return loop.run_in_executor(None, context.run, function, *args)
+
+        await off_loop(request_context.push)
+        error = None
+        try:
+            try:
+                rv = await off_loop(flask_app.preprocess_request)
+                if rv is None:
+                    rv = await asyncio.create_task(view(**starlette_request.path_params), context=context)
+            except Exception as e:
+                rv = await off_loop(flask_app.handle_user_exception, e)
+            return await off_loop(finish_response, flask_app, rv, environ)
+        except BaseException as e:  # Including the cancellation of a request whose client went away
+            error = e
+            raise
+        finally:
+            await off_loop(request_context.pop, error)  # The teardown hooks
+
+    endpoint.__name__ = view.__name__
+    return endpoint
+
+
+async def render(template_name, **context):
+    """render_template on a thread: context processors and template globals may touch the disk."""
+    return await asyncio.to_thread(render_template, template_name, **context)
+
+
+async def home():
+    """catalog.home: the product list with search and sorting."""
+    search_query = request.args.get('search_query')
+    sort_order = request.args.get('sort', 'name_asc')
+    flowers = await read(load_products_from_db, search_query, sort_order)
+    clear_anonymous_session()
+    return await render('home.html', flowers=flowers, search_query=search_query, sort_order=sort_order)
+
+
+def load_product_page(product_id, user_id, db):
+    """Reviews, average rating and whether 'user_id' has reviewed, read in one executor call."""
+    return (get_reviews_for_product(product_id, db=db),
+            get_average_rating_for_product(product_id, db=db),
+            user_id is not None and user_has_reviewed(user_id, product_id, db=db))
+
+
+async def product_detail(product_id):
+    """catalog.product_detail: a product page with its reviews, or 304 when the validators match."""
+    user_logged_in = session.get('user_id') is not None
+    flower = await read(get_flower_by_id, product_id)
+    if not flower:
+        flash('Товар не знайдено.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    pending_flashes = '_flashes' in session # Shown once, so the page must be rendered
+    etag, last_modified = product_validators(flower, personal=user_logged_in or pending_flashes)
+    if not pending_flashes and is_not_modified(etag, last_modified):
+        return set_cache_validators(current_app.response_class(status=304), etag, last_modified,
+                                    current_app.config['PRODUCT_CACHE_SECONDS'])
+
+    reviews, average_rating, has_reviewed = await read(load_product_page, product_id, session.get('user_id'))
+    response = make_response(await render('product_detail.html',
+                                          flower=flower,
+                                          reviews=reviews,
+                                          average_rating=average_rating,
+                                          user_logged_in=user_logged_in,
+                                          user_has_reviewed=has_reviewed))
+    return set_cache_validators(response, etag, last_modified, current_app.config['PRODUCT_CACHE_SECONDS'])
+
+
+async def get_flower_data(flower_id):
+    """catalog.get_flower_data: a flower as JSON (the admin edit modal)."""
+    flower = await read(get_flower_by_id, flower_id)
+    if not flower:
+        return jsonify({'error': 'Flower not found'}), 404
+    etag, last_modified = product_validators(flower)
+    if is_not_modified(etag, last_modified):
+        return set_cache_validators(current_app.response_class(status=304), etag, last_modified)
+    return set_cache_validators(jsonify(flower_json(flower)), etag, last_modified)
+
+
+async def view_cart():
+    """cart.view_cart: the cart with its total in UAH and, at the NBU rate, in EUR."""
+    if not session.get('user_id'):
+        flash('Будь ласка, увійдіть, щоб переглянути ваш кошик.', 'info')
+        return redirect(url_for('auth.login'))
+
+    cart = session.get('cart', [])
+    total = sum(item['price'] * item['quantity'] for item in cart)
+    exchange_rate = await fetch_uah_to_eur_rate(current_app.extensions['asgi_http'], current_app.config['NBU_RATE_URL'])
+    approx_total_eur = round(total / exchange_rate, 2) if exchange_rate else 0
+    return await render('cart.html', cart=cart, total=total, exchange_rate=exchange_rate,
+                        approx_total_eur=approx_total_eur)
+
+
+def stock_stream(flask_app):
+    """
+    /stock/stream?ids=1,2,3: Server-Sent Events with the stock of the listed products, first
+    their current levels, then every change. Idle streams get a comment every
+    STOCK_FEED_HEARTBEAT seconds, so proxies do not close them.
+    """
+    async def endpoint(starlette_request):
+        config = flask_app.config
+        product_ids = parse_product_ids(starlette_request.query_params.get('ids'), config['STOCK_FEED_MAX_IDS'])
+        if not product_ids:
+            return PlainTextResponse('ids: a comma-separated list of product ids', status_code=400)
+        notifier = flask_app.extensions['stock_notifier']
+        subscription = notifier.subscribe(product_ids)
+
+        async def events():
+            try:
+                yield f"retry: {int(config['STOCK_FEED_INTERVAL'] * 1000) + 2000}\n\n"
+                while True:
+                    levels = await subscription.next(config['STOCK_FEED_HEARTBEAT'])
+                    yield format_event(levels) if levels else ': keep-alive\n\n'
+            finally:  # The client went away (the response task is cancelled) or the server stops
+                notifier.unsubscribe(subscription)
+
+        return StreamingResponse(events(), media_type='text/event-stream',
+                                 headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    return endpoint
+
+
+READ_ROUTES = (
+    ('/', home),
+    ('/product/{product_id:int}', product_detail),
+    ('/get_flower_data/{flower_id:int}', get_flower_data),
+    ('/cart', view_cart),
+)
+
+
+def create_asgi_app(flask_app):
+    """
+    The ASGI application: READ_ROUTES served here, everything else by 'flask_app' on
+    ASGI_WSGI_THREADS threads. The read executor, the HTTP client and the stock notifier are
+    created when the server starts the app (lifespan), in each worker process.
+    """
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        config = flask_app.config
+        reads = flask_app.extensions['asgi_reads'] = ReadExecutor(config['DATABASE'], config['ASGI_READ_THREADS'])
+        flask_app.extensions['asgi_http'] = httpx.AsyncClient(timeout=config['NBU_TIMEOUT'])
+        notifier = StockNotifier(reads, config['STOCK_FEED_INTERVAL'])
+        await notifier.start()
+        flask_app.extensions['stock_notifier'] = notifier  # Pages rendered from now on subscribe to it
+        try:
+            yield
+        finally:
+            await flask_app.extensions.pop('stock_notifier').stop()
+            await flask_app.extensions.pop('asgi_http').aclose()
+            flask_app.extensions.pop('asgi_reads').close()
+
+    routes = [Route(path, read_view(flask_app, view), methods=['GET']) for path, view in READ_ROUTES]
+    routes.append(Route('/stock/stream', stock_stream(flask_app), methods=['GET']))
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS'])))
+    return Starlette(routes=routes, lifespan=lifespan)
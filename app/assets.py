@@ -0,0 +1,183 @@
+"""
+Static asset bundle.
+
+Every page loads the same stylesheets and scripts from app/static. Bootstrap, Popper and
+Bootstrap Icons live in static/vendor/; their pinned versions are listed in VENDOR_FILES,
+and the files are committed so the shop works without network access. The site styles
+live in static/css/site.css.
+
+'build' copies these files to static/dist/ under content-hashed names
+(css/site.3f9a0c1b2d.css) and writes static/dist/manifest.json, which maps each source
+path to its copy. url() references inside stylesheets are rewritten to the hashed files.
+While a manifest exists, url_for('static', ...) points at the hashed copy (see
+AssetManifest), and browsers may cache it for a year: a changed file gets a new name.
+The copies are precompressed (see compression.py). Copies from earlier builds are kept,
+so pages rendered before a deploy still load.
+
+Usage:
+    python -m app.assets build     # fingerprint static/css, static/js and static/vendor into static/dist
+    python -m app.assets vendor    # download the pinned vendor files from jsDelivr
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import sys
+
+import requests
+
+from .compression import precompress
+
+log = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VENDOR_FILES = {
+    'vendor/bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/js/bootstrap.min.js',
+    'vendor/popper/popper.min.js': 'https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.8/dist/umd/popper.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/bootstrap-icons.min.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff',
+}
+
+ASSET_FOLDERS = ('css', 'js', 'vendor')
+ASSET_EXTENSIONS = ('.css', '.js', '.woff2', '.woff', '.ttf', '.svg')
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+_CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+class AssetManifest:
+    """
+    Source path -> fingerprinted path of the bundle, read from static/dist/manifest.json.
+    Without a manifest (bundle not built) every path resolves to itself.
+    """
+
+    def __init__(self, static_folder):
+        path = os.path.join(static_folder, DIST_FOLDER, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._files = json.load(f)
+        except FileNotFoundError:
+            self._files = {}
+        self._fingerprinted = frozenset(self._files.values())
+
+    def resolve(self, filename):
+        return self._files.get(filename, filename)
+
+    def is_fingerprinted(self, filename):
+        return filename in self._fingerprinted
+
+
+def fingerprint(path, data):
+    """'css/site.css' -> 'css/site.<first 10 hex digits of the SHA-256 of data>.css'"""
+    name, extension = posixpath.splitext(path)
+    return f"{name}.{hashlib.sha256(data).hexdigest()[:10]}{extension}"
+
+
+def _rewrite_css_urls(css, path, manifest):
+    """Points url() references of the stylesheet 'path' at the fingerprinted files in 'manifest'."""
+    folder = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|/|#)', url):  # data:, https:, absolute and fragment-only URLs
+            return match.group(0)
+        target, suffix = re.match(r'([^?#]*)(.*)', url).groups()  # Keeps ?query and #fragment
+        resolved = posixpath.normpath(posixpath.join(folder, target))
+        if resolved not in manifest:
+            return match.group(0)
+        hashed = posixpath.relpath(manifest[resolved], posixpath.join(DIST_FOLDER, folder))
+        return f"url({quote}{hashed}{suffix}{quote})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def build(static_folder, folders=ASSET_FOLDERS, extensions=ASSET_EXTENSIONS):
+    """
+    Writes the fingerprinted copies and the manifest into static/dist and precompresses
+    them. Fonts and scripts are hashed before the stylesheets that reference them.
+    Returns the manifest ({source path: fingerprinted path}, relative to 'static_folder').
+    """
+    sources = []
+    for folder in folders:
+        for root, _, names in os.walk(os.path.join(static_folder, folder)):
+            for name in sorted(names):
+                if name.endswith(extensions):
+                    sources.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+    sources.sort(key=lambda path: (path.endswith('.css'), path))
+
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            data = f.read()
+        if path.endswith('.css'):
+            data = _rewrite_css_urls(data.decode('utf-8'), path, manifest).encode('utf-8')
+        hashed = posixpath.join(DIST_FOLDER, fingerprint(path, data))
+        target = os.path.join(static_folder, hashed)
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+        manifest[path] = hashed
+
+    dist_folder = os.path.join(static_folder, DIST_FOLDER)
+    precompress(dist_folder)
+    _write_atomic(os.path.join(dist_folder, MANIFEST_NAME),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+
+def download_vendor_files(static_folder, files=VENDOR_FILES, timeout=30):
+    """Downloads the pinned vendor files; returns the list of paths that failed."""
+    failed = []
+    for path, url in files.items():
+        try:
+            response = requests.get(url, timeout=timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            log.warning("%s: %s", path, e)
+            failed.append(path)
+            continue
+        _write_atomic(os.path.join(static_folder, path), response.content)
+        log.info("%s: %.1f KB", path, len(response.content) / 1024)
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the fingerprinted static bundle.")
+    parser.add_argument('command', choices=('build', 'vendor'))
+    parser.add_argument('--static', default=os.path.join(APP_DIR, 'static'), help="Static folder (default: app/static).")
+    args = parser.parse_args(argv)
+
+    if args.command == 'vendor':
+        logging.basicConfig(level=logging.INFO, format='%(message)s')  # One line per downloaded file
+        failed = download_vendor_files(args.static)
+        if failed:
+            print(f"{len(failed)} files not downloaded; the committed copies are left in place.")
+            return 1
+        return 0
+
+    manifest = build(args.static)
+    for path, hashed in sorted(manifest.items()):
+        print(f"{path} -> {hashed}")
+    print(f"{len(manifest)} files written to {os.path.join(args.static, DIST_FOLDER)}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Login, logout, registration and the profile page.
+
+Passwords are hashed in the password hasher's process pool (see passwords.py) and failed
+logins are throttled per username and per client IP (see throttle.py).
+"""
+import math
+import sqlite3
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
+
+from .cart import load_user_cart_from_db, load_user_favorites_from_db, save_user_cart_to_db, save_user_favorites_to_db
+from .db import get_db_connection, get_read_connection, write_transaction
+from .passwords import get_password_hasher
+from .throttle import SlidingWindowThrottle
+from .web import run_write
+
+bp = Blueprint('auth', __name__)
+
+
+@bp.record_once
+def create_login_throttles(state):
+    config = state.app.config
+    state.app.extensions['user_login_throttle'] = SlidingWindowThrottle(config['LOGIN_MAX_ATTEMPTS_PER_USER'],
+                                                                        config['LOGIN_THROTTLE_WINDOW'])
+    state.app.extensions['ip_login_throttle'] = SlidingWindowThrottle(config['LOGIN_MAX_ATTEMPTS_PER_IP'],
+                                                                      config['LOGIN_THROTTLE_WINDOW'])
+
+
+def password_hasher():
+    """The process pool that hashes and verifies passwords (see passwords.py)."""
+    config = current_app.config
+    return get_password_hasher(config['PASSWORD_HASH_METHOD'], config['PASSWORD_WORKERS'],
+                               config['PASSWORD_QUEUE_SIZE'], config['PASSWORD_WORKER_NICE'],
+                               config['PASSWORD_TIMEOUT'])
+
+
+def login_throttle_keys(username):
+    """The (throttle, key) pairs a login attempt for 'username' from this client counts against."""
+    extensions = current_app.extensions
+    return [(extensions['user_login_throttle'], f"user:{username}"),
+            (extensions['ip_login_throttle'], f"ip:{request.remote_addr}")]
+
+
+def check_credentials(username, password):
+    """
+    Checks a login attempt (login form and API token endpoint).
+    Returns (user row, 0) on success, (None, 0) for wrong credentials and (None, seconds)
+    while the username or the client's IP is throttled; only failures are counted.
+    The password is checked in the password hasher's pool, and a hash made with outdated
+    parameters is replaced on success.
+    """
+    throttle_keys = login_throttle_keys(username)
+    read_db = get_read_connection()
+    retry_after = max(throttle.retry_after(key, read_db) for throttle, key in throttle_keys)
+    if retry_after:
+        return None, retry_after
+
+    db = get_db_connection()
+    user = db.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+    hasher = password_hasher()
+
+    if user and hasher.verify(user['password_hash'], password):
+        new_hash = hasher.hash(password) if hasher.needs_rehash(user['password_hash']) else None
+        user_throttle, user_key = throttle_keys[0]
+
+        def finish_login(db):
+            if new_hash:
+                # Unless the password was changed meanwhile
+                db.execute("UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                           (new_hash, user['id'], user['password_hash']))
+            user_throttle.reset(user_key, db)
+
+        run_write(finish_login)
+        return user, 0
+
+    def record_failure(db):
+        for throttle, key in throttle_keys:
+            throttle.record(key, db)
+
+    run_write(record_failure)
+    return None, 0
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    """
+    Handles user login. Authenticates user and sets session variables.
+    Loads user's cart and favorites from DB into session upon successful login.
+    Failed attempts are throttled per username and per IP (429 once the limit is reached),
+    see check_credentials().
+    """
+    if request.method == 'POST':
+        username = request.form.get('username', '')
+        password = request.form.get('password', '')
+
+        user, retry_after = check_credentials(username, password)
+        if retry_after:
+            flash(f'Забагато невдалих спроб входу. Спробуйте через {math.ceil(retry_after / 60)} хв.', 'danger')
+            return render_template('admin_login.html'), 429, {'Retry-After': str(math.ceil(retry_after))}
+
+        if user:
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+            session['is_admin'] = (user['role'] == 'admin')
+
+            # Load cart and favorites from DB into session after login
+            session['cart'] = load_user_cart_from_db(user['id'])
+            session['favorites'] = load_user_favorites_from_db(user['id'])
+
+            session['edit_mode'] = False # Disable edit mode on login by default
+
+            flash('Успішний вхід!', 'success')
+            return redirect(url_for('catalog.home'))
+        else:
+            flash('Невірні логін або пароль.', 'danger')
+
+    return render_template('admin_login.html') # Using admin_login.html for general login
+
+@bp.route('/logout')
+def logout():
+    """
+    Handles user logout. Saves user's cart and favorites from session to DB,
+    then clears all relevant session variables.
+    """
+    user_id = session.get('user_id')
+    if user_id:
+        # Save cart and favorites from session to DB before logout
+        save_user_cart_to_db(user_id, session.get('cart', []))
+        save_user_favorites_to_db(user_id, session.get('favorites', []))
+
+    # Clear session variables
+    session.pop('user_id', None)
+    session.pop('username', None)
+    session.pop('is_admin', None)
+    session.pop('cart', None)       # Clear cart from session
+    session.pop('favorites', None)  # Clear favorites from session
+    session.pop('edit_mode', None)  # Disable edit mode
+    flash('Ви вийшли з системи.', 'info')
+    return redirect(url_for('catalog.home'))
+
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    """
+    Handles new user registration.
+    Performs validation for password match, username uniqueness, and phone number format.
+    """
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        confirm = request.form.get('confirm')
+        phone_number = request.form.get('phone_number') # Get phone number from form
+
+        if not all([username, password, confirm, phone_number]): # Check that all fields are filled
+            flash("Будь ласка, заповніть усі поля.", "danger")
+            return redirect(url_for('auth.register'))
+        elif password != confirm:
+            flash("Паролі не збігаються.", "danger")
+            return redirect(url_for('auth.register'))
+        elif len(password) < 6: # Basic password length validation
+            flash("Пароль має бути не менше 6 символів.", "danger")
+            return redirect(url_for('auth.register'))
+        else:
+            # Basic phone number validation (allowing digits, +, -, (, ))
+            allowed_chars = set("0123456789+()- ")
+            if not all(char in allowed_chars for char in phone_number):
+                flash("Телефон має містити лише цифри, символ +, дужки, тире та пробіли.", "danger")
+                return redirect(url_for('auth.register'))
+
+            hashed_password = password_hasher().hash(password)
+            db = get_db_connection()
+            # write_transaction rolls back on failure, so the connection stays clean for the rest of the request
+            with write_transaction(db):
+                try:
+                    cursor = db.cursor()
+                    # Insert phone_number into the users table
+                    cursor.execute("INSERT INTO users (username, password_hash, role, phone_number) VALUES (?, ?, ?, ?)",
+                                   (username, hashed_password, 'user', phone_number))
+                    flash("Реєстрація успішна! Тепер увійдіть.", "success")
+                    return redirect(url_for('auth.login'))
+                except sqlite3.IntegrityError: # Handle error if user already exists
+                    flash("Користувач з таким ім'ям вже існує.", "danger")
+                    db.rollback() # Rollback the failed transaction
+                except Exception as e:
+                    flash(f"Помилка реєстрації: {e}", "danger")
+                    db.rollback()
+
+    return render_template('register.html')
+
+@bp.route('/profile')
+def profile():
+    """
+    Displays the user profile page, allowing password changes.
+    Requires user to be logged in.
+    """
+    if not session.get('user_id'):
+        flash('Будь ласка, увійдіть, щоб переглянути ваш профіль.', 'info')
+        return redirect(url_for('auth.login'))
+
+    username = session.get('username')
+
+    return render_template('profile.html', username=username)
+
+@bp.route('/update_password', methods=['POST'])
+def update_password():
+    """
+    Handles updating the user's password.
+    Requires user to be logged in and validates old password and new password confirmation.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб змінити пароль.', 'info')
+        return redirect(url_for('auth.login'))
+
+    old_password = request.form.get('old_password')
+    new_password = request.form.get('new_password')
+    confirm_new_password = request.form.get('confirm_new_password')
+
+    if not all([old_password, new_password, confirm_new_password]):
+        flash("Будь ласка, заповніть усі поля.", "danger")
+        return redirect(url_for('auth.profile'))
+
+    if new_password != confirm_new_password:
+        flash("Новий пароль та підтвердження не збігаються.", "danger")
+        return redirect(url_for('auth.profile'))
+
+    if len(new_password) < 6:
+        flash("Новий пароль має бути не менше 6 символів.", "danger")
+        return redirect(url_for('auth.profile'))
+
+    db = get_db_connection()
+    user = db.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+    hasher = password_hasher()
+    if user and hasher.verify(user['password_hash'], old_password):
+        hashed_new_password = hasher.hash(new_password)
+        with write_transaction(db):
+            db.execute("UPDATE users SET password_hash = ? WHERE id = ?",
+                       (hashed_new_password, user_id))
+        flash("Пароль успішно оновлено!", "success")
+        return redirect(url_for('auth.profile'))
+    else:
+        flash("Невірний старий пароль.", "danger")
+        return redirect(url_for('auth.profile'))
@@ -0,0 +1,313 @@
+"""
+Cart and favorites of logged-in users: the pages, the form handlers, and the functions that
+load them from and save them to the database (shared with login/logout and the JSON API).
+"""
+import logging
+import sqlite3
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
+
+from .catalog import get_flower_by_id
+from .db import DatabaseBusyError, get_db_connection, get_read_connection, write_transaction
+from .utils import get_uah_to_eur_rate
+from .web import run_write
+
+bp = Blueprint('cart', __name__)
+log = logging.getLogger(__name__)
+
+
+def load_user_cart_from_db(user_id):
+    """Loads user's cart items from the database."""
+    db = get_read_connection()
+    # Ensure 'stock' is also fetched for cart items if needed for display later or validation.
+    # For now, it's implicitly included by SELECT p.*
+    cursor = db.execute("""
+        SELECT ci.quantity, p.id, p.name, p.description, p.price, p.image_url, p.stock
+        FROM cart_items ci
+        JOIN products p ON ci.flower_id = p.id
+        WHERE ci.user_id = ?
+    """, (user_id,))
+    cart_data = []
+    for row in cursor.fetchall():
+        item = {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'price': row['price'],
+            'image_url': row['image_url'],
+            'quantity': row['quantity'],
+            'stock': row['stock'] # Include stock in cart item data
+        }
+        cart_data.append(item)
+    return cart_data
+
+def save_user_cart_to_db(user_id, cart_data):
+    """Saves user's cart items from the session to the database."""
+    db = get_db_connection()
+    with write_transaction(db):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM cart_items WHERE user_id = ?", (user_id,)) # Clear existing cart
+        for item in cart_data:
+            cursor.execute("INSERT INTO cart_items (user_id, flower_id, quantity) VALUES (?, ?, ?)",
+                           (user_id, item['id'], item['quantity']))
+
+def load_user_favorites_from_db(user_id):
+    """Loads user's favorite items from the database."""
+    db = get_read_connection()
+    cursor = db.execute("""
+        SELECT p.id, p.name, p.description, p.price, p.image_url, p.stock
+        FROM favorite_items fi
+        JOIN products p ON fi.flower_id = p.id
+        WHERE fi.user_id = ?
+    """, (user_id,))
+    favorites_data = []
+    for row in cursor.fetchall():
+        item = {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'price': row['price'],
+            'image_url': row['image_url'],
+            'stock': row['stock'] # Include stock in favorite item data
+        }
+        favorites_data.append(item)
+    return favorites_data
+
+def save_user_favorites_to_db(user_id, favorites_data):
+    """Saves user's favorite items from the session to the database."""
+    db = get_db_connection()
+    with write_transaction(db):
+        cursor = db.cursor()
+        cursor.execute("DELETE FROM favorite_items WHERE user_id = ?", (user_id,)) # Clear existing favorites
+        for item in favorites_data:
+            cursor.execute("INSERT INTO favorite_items (user_id, flower_id) VALUES (?, ?)",
+                           (user_id, item['id']))
+
+
+def add_cart_item(db, user_id, flower_id, quantity):
+    """Adds the item or increases its quantity; returns the new quantity if it was already in the cart."""
+    cursor = db.cursor()
+
+    # Check if the item already exists in the cart for this user
+    cursor.execute("SELECT quantity FROM cart_items WHERE user_id = ? AND flower_id = ?", (user_id, flower_id))
+    existing_item_db = cursor.fetchone()
+
+    if existing_item_db:
+        new_quantity = existing_item_db['quantity'] + quantity
+        cursor.execute("UPDATE cart_items SET quantity = ? WHERE user_id = ? AND flower_id = ?",
+                       (new_quantity, user_id, flower_id))
+        return new_quantity
+    cursor.execute("INSERT INTO cart_items (user_id, flower_id, quantity) VALUES (?, ?, ?)",
+                   (user_id, flower_id, quantity))
+    return None
+
+
+def set_cart_item_quantity(db, user_id, flower_id, quantity):
+    """Sets the quantity of a cart item (0 or less removes it); returns 'removed', 'updated' or 'missing'."""
+    cursor = db.cursor()
+    if quantity <= 0:
+        cursor.execute("DELETE FROM cart_items WHERE user_id = ? AND flower_id = ?",
+                       (user_id, flower_id))
+        return 'removed'
+    cursor.execute("UPDATE cart_items SET quantity = ? WHERE user_id = ? AND flower_id = ?",
+                   (quantity, user_id, flower_id))
+    return 'updated' if cursor.rowcount else 'missing'
+
+
+@bp.route('/add_to_cart/<int:flower_id>', methods=['POST'])
+def add_to_cart(flower_id):
+    """
+    Adds a specified quantity of an item to the user's cart.
+    If the item already exists, increases its quantity.
+    Does NOT check stock at this stage, as per user request.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб додати товари до кошика.', 'info')
+        return redirect(url_for('auth.login'))
+
+    flower = get_flower_by_id(flower_id)
+    if not flower:
+        flash('Квітка не знайдена.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    # Get quantity from form. Default to 1 if not specified or invalid.
+    try:
+        quantity = int(request.form.get('quantity', 1))
+        if quantity < 1:
+            quantity = 1 # Ensure quantity is not less than 1
+    except ValueError:
+        quantity = 1 # If conversion to number fails, set to 1
+
+    new_quantity = run_write(lambda db: add_cart_item(db, user_id, flower_id, quantity))
+    if new_quantity:
+        flash(f"{flower['name']}: кількість збільшено до {new_quantity}.", "success")
+    else:
+        flash(f"{flower['name']} (x{quantity}) додано до кошика.", "success")
+
+    # Update cart in session by re-loading from DB to ensure consistency
+    session['cart'] = load_user_cart_from_db(user_id)
+    return redirect(url_for('catalog.home'))
+
+@bp.route('/update_cart_item_quantity/<int:flower_id>', methods=['POST'])
+def update_cart_item_quantity(flower_id):
+    """
+    Updates the quantity of a specific item in the user's cart.
+    If quantity is 0 or less, the item is removed.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб оновити кошик.', 'info')
+        return redirect(url_for('auth.login'))
+
+    try:
+        new_quantity = int(request.form.get('quantity', 1))
+    except ValueError:
+        flash('Недійсна кількість.', 'danger')
+        return redirect(url_for('cart.view_cart'))
+
+    outcome = run_write(lambda db: set_cart_item_quantity(db, user_id, flower_id, new_quantity))
+    if outcome == 'removed':
+        flash(f"Товар видалено з кошика.", "info")
+    elif outcome == 'updated':
+        flash(f"Кількість товару оновлено до {new_quantity}.", "success")
+    else:
+        flash("Товар не знайдено в кошику для оновлення.", "danger")
+        # If item doesn't exist, we can optionally add it or just redirect
+        # For this context, we assume it's an update for existing item.
+
+    # Update cart in session by re-loading from DB to ensure consistency
+    session['cart'] = load_user_cart_from_db(user_id)
+    return redirect(url_for('cart.view_cart'))
+
+
+@bp.route('/remove_from_cart/<int:index>', methods=['POST'])
+def remove_from_cart(index):
+    """
+    Removes an item from the user's cart based on its index in the session cart list.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть.', 'info')
+        return redirect(url_for('auth.login'))
+
+    cart = session.get('cart', [])
+    if 0 <= index < len(cart):
+        removed_item = cart[index]
+
+        db = get_db_connection()
+        with write_transaction(db):
+            db.execute("DELETE FROM cart_items WHERE user_id = ? AND flower_id = ?",
+                       (user_id, removed_item['id']))
+
+        # Update cart in session by re-loading from DB to ensure consistency
+        session['cart'] = load_user_cart_from_db(user_id)
+        flash(f"{removed_item['name']} видалено з кошика.", "info")
+    else:
+        flash("Товар не знайдено в кошику.", "danger")
+    return redirect(url_for('cart.view_cart'))
+
+
+@bp.route('/cart')
+def view_cart():
+    """
+    Displays the user's shopping cart, calculating total price
+    and approximate total in EUR using the current exchange rate.
+    Requires user to be logged in.
+    """
+    if not session.get('user_id'):
+        flash('Будь ласка, увійдіть, щоб переглянути ваш кошик.', 'info')
+        return redirect(url_for('auth.login'))
+
+    cart = session.get('cart', [])
+    total = sum(item['price'] * item['quantity'] for item in cart)
+
+    exchange_rate = get_uah_to_eur_rate(current_app.config['NBU_RATE_URL'], current_app.config['NBU_TIMEOUT'])
+    approx_total_eur = round(total / exchange_rate, 2) if exchange_rate else 0
+
+    return render_template('cart.html',
+                           cart=cart,
+                           total=total,
+                           exchange_rate=exchange_rate,
+                           approx_total_eur=approx_total_eur)
+
+@bp.route('/favorites')
+def view_favorites():
+    """
+    Displays the user's favorite items.
+    Requires user to be logged in.
+    """
+    if not session.get('user_id'):
+        flash('Будь ласка, увійдіть, щоб переглянути ваші улюблені товари.', 'info')
+        return redirect(url_for('auth.login'))
+
+    favorites = session.get('favorites', []) # Get favorites from session
+
+    return render_template('favorites.html', favorites=favorites)
+
+@bp.route('/add_to_favorites/<int:flower_id>', methods=['POST'])
+def add_to_favorites(flower_id):
+    """
+    Adds an item to the user's favorites list.
+    Prevents adding duplicates.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб додати товари до обраного.', 'info')
+        return redirect(url_for('auth.login'))
+
+    flower = get_flower_by_id(flower_id)
+    if not flower:
+        flash('Квітка не знайдена.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    try:
+        run_write(lambda db: db.execute("INSERT INTO favorite_items (user_id, flower_id) VALUES (?, ?)",
+                                        (user_id, flower_id)).rowcount)
+        flash(f"{flower['name']} додано в обране.", "success")
+    except sqlite3.IntegrityError: # Handle if item is already in favorites (UNIQUE constraint violation)
+        flash("Ця квітка вже в обраному.", "info")
+    except DatabaseBusyError:
+        raise # Answered with 503 by web.database_busy()
+    except Exception as e:
+        flash(f"Помилка додавання до обраного: {e}", "danger")
+
+    # Update favorites in session by re-loading from DB to ensure consistency
+    session['favorites'] = load_user_favorites_from_db(user_id)
+    return redirect(url_for('catalog.home'))
+
+@bp.route('/remove_from_favorites/<int:flower_id>', methods=['POST'])
+def remove_from_favorites(flower_id):
+    """
+    Removes an item from the user's favorites list.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть.', 'info')
+        return redirect(url_for('auth.login'))
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    # Get flower name for flash message before potential deletion
+    flower_name_cursor = db.execute("SELECT name FROM products WHERE id = ?", (flower_id,)).fetchone()
+    flower_name = flower_name_cursor['name'] if flower_name_cursor else "Невідомий товар"
+
+    with write_transaction(db):
+        try:
+            cursor.execute("DELETE FROM favorite_items WHERE user_id = ? AND flower_id = ?",
+                           (user_id, flower_id))
+            flash(f"Товар \"{flower_name}\" видалено з обраного.", "info")
+        except Exception as e:
+            flash(f"Помилка при видаленні з обраного: {e}", "danger")
+            log.exception("Error removing flower %s from favorites", flower_id)
+            db.rollback()
+
+    # Update favorites in session by re-loading from DB to ensure consistency
+    session['favorites'] = load_user_favorites_from_db(user_id)
+    return redirect(url_for('cart.view_favorites'))
@@ -0,0 +1,369 @@
+"""
+Catalog views: the product list with search and sorting, product pages with their reviews,
+and the HTTP cache validators (ETag / Last-Modified) of product responses.
+"""
+import datetime
+import hashlib
+
+from flask import Blueprint, current_app, flash, jsonify, make_response, redirect, render_template, request, session, url_for
+
+from .db import DatabaseBusyError, get_db_connection, get_read_connection, write_transaction
+from .web import inject_navbar_state, run_write
+
+bp = Blueprint('catalog', __name__)
+
+
+def load_products_from_db(search_term=None, sort_order=None, db=None):
+    """
+    Loads all products (flowers) from the products table.
+    Filters products by name or description if search_term is provided (case-insensitive for all characters).
+    Sorts products based on sort_order ('price_asc', 'price_desc', 'newest', 'oldest', 'name_asc', 'name_desc').
+    Default sort is 'name_asc'.
+    Like the other loaders here, reads from 'db' when given (the ASGI read path's connections).
+    """
+    if db is None:
+        db = get_read_connection()
+    cursor = db.cursor()
+
+    # Fetch all products first
+    # Selects all columns including 'stock'
+    cursor.execute("SELECT * FROM products")
+    all_products = cursor.fetchall() # Get all rows as a list of sqlite3.Row objects
+
+    filtered_products = []
+    if search_term:
+        search_term_lower = search_term.lower() # Convert search term to lowercase once
+
+        for product in all_products:
+            # Convert product name and description to lowercase in Python for robust comparison
+            name_lower = product['name'].lower() if product['name'] else ''
+            description_lower = product['description'].lower() if product['description'] else ''
+
+            if search_term_lower in name_lower or search_term_lower in description_lower:
+                filtered_products.append(product)
+        products_to_sort = filtered_products
+    else:
+        products_to_sort = list(all_products) # Convert to list as all_products is a cursor result
+
+    # Apply sorting logic in Python
+    if sort_order == 'price_asc':
+        products_to_sort.sort(key=lambda p: p['price'])
+    elif sort_order == 'price_desc':
+        products_to_sort.sort(key=lambda p: p['price'], reverse=True)
+    elif sort_order == 'newest': # Sort by newest (highest ID first)
+        products_to_sort.sort(key=lambda p: p['id'], reverse=True)
+    elif sort_order == 'oldest': # Sort by oldest (lowest ID first)
+        products_to_sort.sort(key=lambda p: p['id'])
+    elif sort_order == 'name_asc': # Sort by name A-Z
+        products_to_sort.sort(key=lambda p: p['name'].lower())
+    elif sort_order == 'name_desc': # Sort by name Z-A
+        products_to_sort.sort(key=lambda p: p['name'].lower(), reverse=True)
+    else:
+        # Default sort to 'name_asc' if no specific sort_order is provided or recognized
+        products_to_sort.sort(key=lambda p: p['name'].lower())
+
+    return products_to_sort
+
+
+@bp.route('/get_flower_data/<int:flower_id>', methods=['GET'])
+def get_flower_data(flower_id):
+    """
+    Returns data for a single flower as JSON.
+    Used by AJAX to populate the edit modal.
+    """
+    flower = get_flower_by_id(flower_id)
+    if flower:
+        etag, last_modified = product_validators(flower)
+        if is_not_modified(etag, last_modified):
+            return set_cache_validators(current_app.response_class(status=304), etag, last_modified)
+        return set_cache_validators(jsonify(flower_json(flower)), etag, last_modified)
+    return jsonify({'error': 'Flower not found'}), 404
+
+
+def flower_json(flower):
+    """The JSON representation of a flower row returned by get_flower_data."""
+    # Convert sqlite3.Row object to a dictionary for JSON serialization
+    flower_dict = dict(flower)
+    # Ensure image_url is a full path if it's relative
+    if flower_dict.get('image_url') and not flower_dict['image_url'].startswith(('http://', 'https://', '/static')):
+        # Ensure the correct base path for static files.
+        # Assuming flower_dict['image_url'] is like 'static/images/flower.jpg'
+        # We want it to be '/static/images/flower.jpg' for correct URL generation.
+        if flower_dict['image_url'].startswith('static/'):
+             flower_dict['image_url'] = '/' + flower_dict['image_url']
+        else:
+             # Fallback for other unexpected relative paths, prepend /static/images/ if it's just a filename
+             flower_dict['image_url'] = f'/static/images/{flower_dict["image_url"]}'
+    return flower_dict
+
+
+def get_reviews_for_product(product_id, db=None):
+    """
+    Returns all reviews for a specific product, ordered by creation date (newest first).
+    Converts timestamps from UTC (as stored by SQLite) to Kyiv time (UTC+3).
+    """
+    if db is None:
+        db = get_read_connection()
+    cursor = db.execute("""
+        SELECT r.id, r.rating, r.comment, r.created_at, u.username, r.user_id
+        FROM reviews r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.product_id = ?
+        ORDER BY r.created_at DESC
+    """, (product_id,))
+
+    reviews_data = []
+    kyiv_offset = datetime.timedelta(hours=3) # Kyiv time is UTC+3 (EEST/EET without considering DST specifics)
+
+    for row in cursor.fetchall():
+        # Parse UTC time string from DB
+        try:
+            utc_dt = datetime.datetime.strptime(row['created_at'], "%Y-%m-%d %H:%M:%S")
+            # Convert to Kyiv time by adding the offset
+            kyiv_dt = utc_dt + kyiv_offset
+            formatted_time = kyiv_dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            # Fallback if timestamp format is unexpected
+            formatted_time = row['created_at']
+
+        item = {
+            'id': row['id'],
+            'rating': row['rating'],
+            'comment': row['comment'],
+            'created_at': formatted_time, # Now in Kyiv time
+            'username': row['username'],
+            'user_id': row['user_id'] # Include user_id for deletion logic in template
+        }
+        reviews_data.append(item)
+    return reviews_data
+
+
+def get_flower_by_id(flower_id, db=None):
+    """
+    Returns a flower object by ID from the database.
+    Pass 'db' to read inside an open write transaction instead of from the read-only connection.
+    """
+    if db is None:
+        db = get_read_connection()
+    # Selects all columns including 'stock'
+    cursor = db.execute("SELECT * FROM products WHERE id = ?", (flower_id,))
+    return cursor.fetchone()
+
+
+def get_average_rating_for_product(product_id, db=None):
+    """Calculates the average rating for a specific product."""
+    if db is None:
+        db = get_read_connection()
+    cursor = db.execute("SELECT AVG(rating) FROM reviews WHERE product_id = ?", (product_id,))
+    avg_rating = cursor.fetchone()[0]
+    return round(avg_rating, 2) if avg_rating else 0.0
+
+
+def user_has_reviewed(user_id, product_id, db=None):
+    """Whether the user has already left a review for the product (one review per product)."""
+    if db is None:
+        db = get_read_connection()
+    cursor = db.execute("SELECT COUNT(*) FROM reviews WHERE user_id = ? AND product_id = ?", (user_id, product_id))
+    return cursor.fetchone()[0] > 0
+
+
+def product_validators(flower, personal=False):
+    """
+    Weak ETag and Last-Modified of a response showing 'flower', from its version/updated_at
+    columns and the release (see web.release_fingerprint). A 'personal' page also shows the
+    visitor's navbar (cart counter, favorites, name), so its ETag covers that state and it
+    gets no Last-Modified.
+    """
+    release_hash, release_time = current_app.extensions['release']
+    parts = [flower['id'], flower['version'], release_hash]
+    if personal:
+        parts += [session.get('user_id'), session.get('username'), sorted(inject_navbar_state().items(), key=str)]
+    etag = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+    if personal or not flower['updated_at']:
+        return etag, None
+    updated_at = datetime.datetime.strptime(flower['updated_at'], "%Y-%m-%d %H:%M:%S")
+    updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)  # CURRENT_TIMESTAMP is UTC
+    return etag, max(updated_at, release_time)
+
+
+def is_not_modified(etag, last_modified):
+    """Whether the conditional request headers match (If-None-Match wins over If-Modified-Since)."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return last_modified is not None and request.if_modified_since is not None \
+        and last_modified <= request.if_modified_since
+
+
+def set_cache_validators(response, etag, last_modified, shared_max_age=None):
+    """
+    Adds the validators and caching headers. Responses with a Last-Modified (not personal)
+    may be stored by shared caches: for 'shared_max_age' seconds without revalidating,
+    or revalidated every time when it is None. Personal ones only by the browser.
+    """
+    response.set_etag(etag, weak=True)
+    response.vary.add('Cookie')
+    if last_modified is None:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    if shared_max_age:
+        response.cache_control.max_age = 0
+        response.cache_control.s_maxage = shared_max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def clear_anonymous_session():
+    """Clears session-related data if user is not logged in."""
+    if session.get('user_id') is None:
+        session.pop('cart', None)
+        session.pop('favorites', None)
+        session.pop('edit_mode', None)
+
+
+@bp.route('/')
+def home():
+    """
+    Handles the home page, displaying products with search and sort functionality.
+    Manages user session, cart, and favorites data for display.
+    """
+    search_query = request.args.get('search_query') # Get search query from URL parameters
+    # Set default sort_order to 'name_asc' if not provided in the URL
+    sort_order = request.args.get('sort', 'name_asc')  # Default to 'name_asc'
+    flowers = load_products_from_db(search_query, sort_order) # Load products based on search and sort
+    clear_anonymous_session()
+
+    # Cart, favorites and edit mode for the navbar and cards come from inject_navbar_state()
+    return render_template('home.html', flowers=flowers,
+                           search_query=search_query, sort_order=sort_order) # Pass search_query and sort_order to template
+
+# Route for viewing product details and reviews
+@bp.route('/product/<int:product_id>')
+def product_detail(product_id):
+    """
+    Displays the product details page, including its description, price,
+    average rating, and user reviews. Allows users to add reviews.
+    Answers a matching conditional request with 304 before loading reviews or rendering.
+    """
+    user_logged_in = session.get('user_id') is not None
+    flower = get_flower_by_id(product_id)
+    if not flower:
+        flash('Товар не знайдено.', 'danger')
+        return redirect(url_for('catalog.home'))
+
+    pending_flashes = '_flashes' in session # Shown once, so the page must be rendered
+    etag, last_modified = product_validators(flower, personal=user_logged_in or pending_flashes)
+    if not pending_flashes and is_not_modified(etag, last_modified):
+        return set_cache_validators(current_app.response_class(status=304), etag, last_modified,
+                                    current_app.config['PRODUCT_CACHE_SECONDS'])
+
+    reviews = get_reviews_for_product(product_id)
+    average_rating = get_average_rating_for_product(product_id)
+
+    # Check if the current user has already left a review
+    has_reviewed = user_logged_in and user_has_reviewed(session.get('user_id'), product_id)
+
+    response = make_response(render_template('product_detail.html',
+                                             flower=flower,
+                                             reviews=reviews,
+                                             average_rating=average_rating,
+                                             user_logged_in=user_logged_in,
+                                             user_has_reviewed=has_reviewed))
+    return set_cache_validators(response, etag, last_modified, current_app.config['PRODUCT_CACHE_SECONDS'])
+
+# Route for adding a review
+@bp.route('/product/<int:product_id>/add_review', methods=['POST'])
+def add_review(product_id):
+    """
+    Handles adding a new review for a product.
+    Validates rating and checks if the user has already reviewed the product.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб залишити відгук.', 'info')
+        return redirect(url_for('auth.login'))
+
+    rating = request.form.get('rating')
+    comment = request.form.get('comment')
+
+    # Check if the user has already left a review for this product
+    if user_has_reviewed(user_id, product_id):
+        flash('Ви вже залишили відгук для цього товару.', 'warning')
+        return redirect(url_for('catalog.product_detail', product_id=product_id))
+
+    if not rating:
+        flash('Будь ласка, оберіть оцінку.', 'danger')
+        return redirect(url_for('catalog.product_detail', product_id=product_id))
+
+    try:
+        rating = int(rating)
+        if not (1 <= rating <= 5):
+            raise ValueError("Rating must be between 1 and 5.")
+    except ValueError:
+        flash('Оцінка повинна бути числом від 1 до 5.', "danger")
+        return redirect(url_for('catalog.product_detail', product_id=product_id))
+
+    if not comment:
+        comment = "" # Allow empty comments, but it's better to encourage them
+
+    def insert_review(db):
+        db.execute("INSERT INTO reviews (product_id, user_id, rating, comment) VALUES (?, ?, ?, ?)",
+                   (product_id, user_id, rating, comment))
+        db.execute("UPDATE products SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?", (product_id,))
+
+    try:
+        run_write(insert_review)
+        flash('Ваш відгук успішно додано!', 'success')
+    except DatabaseBusyError:
+        raise # Answered with 503 by web.database_busy()
+    except Exception as e:
+        flash(f"Помилка при додаванні відгуку: {e}", "danger")
+
+    return redirect(url_for('catalog.product_detail', product_id=product_id))
+
+@bp.route('/delete_review/<int:review_id>', methods=['POST'])
+def delete_review(review_id):
+    """
+    Allows a user to delete their own review.
+    Administrators are explicitly prevented from using this route.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб видалити відгук.', 'info')
+        return redirect(url_for('auth.login'))
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    review_info = cursor.execute("SELECT user_id, product_id FROM reviews WHERE id = ?", (review_id,)).fetchone()
+
+    if not review_info:
+        flash("Відгук не знайдено.", "danger")
+        return redirect(url_for('catalog.home'))
+
+    # Prevent administrators from deleting reviews using this route
+    if session.get('is_admin'):
+        flash('Адміністратори не можуть видаляти відгуки через цей інтерфейс.', 'danger')
+        return redirect(url_for('catalog.product_detail', product_id=review_info['product_id']))
+
+
+    # Check if the logged-in user is the author of the review
+    if review_info['user_id'] != user_id:
+        flash("Ви не можете видалити чужий відгук.", "danger")
+        return redirect(url_for('catalog.product_detail', product_id=review_info['product_id']))
+
+    with write_transaction(db):
+        try:
+            cursor.execute("DELETE FROM reviews WHERE id = ?", (review_id,))
+            cursor.execute("UPDATE products SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                           (review_info['product_id'],))
+            flash("Відгук успішно видалено.", "success")
+        except Exception as e:
+            flash(f"Помилка при видаленні відгуку: {e}", "danger")
+            db.rollback()
+
+    return redirect(url_for('catalog.product_detail', product_id=review_info['product_id']))
@@ -0,0 +1,287 @@
+"""
+Response compression.
+
+CompressionMiddleware wraps the WSGI app and compresses text responses (HTML, JSON, CSS,
+JS, SVG) with brotli or gzip, whichever the client prefers in Accept-Encoding. Bodies
+smaller than 'minimum_size' are sent as is: the headers and CPU time cost more than they
+save. Streamed responses (no Content-Length) are compressed chunk by chunk and flushed
+after every chunk, so a client still sees each part as soon as the app yields it.
+
+Static CSS/JS can be compressed once, at the highest levels, by the build step below;
+send_static_file() then serves the '.br'/'.gz' sibling of a file instead of compressing
+it on every request.
+
+Usage:
+    python -m app.compression             # precompress app/static
+    python -m app.compression --force     # recreate every .br/.gz file
+"""
+import argparse
+import gzip
+import mimetypes
+import os
+import sys
+import zlib
+
+from flask import current_app, request, send_from_directory
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+                      'application/javascript', 'application/json', 'image/svg+xml')
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding, encodings=None):
+    """
+    Returns the encoding to use for a request with the given Accept-Encoding header
+    ('br' or 'gzip', brotli preferred on equal quality), or None for identity.
+    """
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in encodings or available_encodings():
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    """Incremental gzip or brotli stream with an explicit flush."""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._stream = brotli.Compressor(quality=brotli_quality, lgwin=22)
+        else:
+            self._stream = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._stream.process(data)
+        return self._stream.compress(data)
+
+    def flush(self):
+        """Emits everything compressed so far without ending the stream."""
+        if self.encoding == 'br':
+            return self._stream.flush()
+        return self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._stream.finish()
+        return self._stream.flush(zlib.Z_FINISH)
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    """Compresses a whole body in one go."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing 200 responses with a compressible Content-Type.
+    Responses that already have a Content-Encoding (e.g. precompressed static files) or
+    'Cache-Control: no-transform' are left alone. Vary: Accept-Encoding is added to every
+    compressible response, compressed or not, so caches keep the variants apart.
+    """
+
+    def __init__(self, app, minimum_size=500, gzip_level=6, brotli_quality=4, mimetypes=COMPRESSIBLE_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = tuple(mimetypes)
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        captured = {}
+        written = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured['status'], captured['headers'], captured['exc_info'] = status, headers, exc_info
+            return written.append  # Legacy write() data is sent before the iterable
+
+        app_iter = self.app(environ, capture_start_response)
+        headers = Headers(captured['headers'])
+        if not self._should_compress(captured['status'], headers):
+            write = start_response(captured['status'], captured['headers'], captured['exc_info'])
+            for data in written:
+                write(data)
+            return app_iter
+
+        headers['Vary'] = _add_vary(headers.get('Vary', ''))
+        if headers.get('Content-Length') is not None:
+            return self._compress_buffered(app_iter, written, encoding, captured, headers, start_response)
+        return self._compress_streamed(app_iter, written, encoding, captured, headers, start_response)
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200') or 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        mimetype = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return mimetype in self.mimetypes
+
+    def _compress_buffered(self, app_iter, written, encoding, captured, headers, start_response):
+        try:
+            body = b''.join(written) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        if len(body) >= self.minimum_size:
+            compressed = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            if len(compressed) < len(body):
+                body = compressed
+                _set_encoding(headers, encoding)
+        headers['Content-Length'] = str(len(body))
+        start_response(captured['status'], headers.to_wsgi_list(), captured['exc_info'])
+        return [body]
+
+    def _compress_streamed(self, app_iter, written, encoding, captured, headers, start_response):
+        """
+        Holds back the first chunks until 'minimum_size' bytes have been produced (or the
+        body ended), then decides; from there on every chunk is compressed and flushed.
+        """
+        chunks = iter(app_iter)
+        head, size = list(written), sum(len(data) for data in written)
+        try:
+            while size < self.minimum_size:
+                data = next(chunks)
+                head.append(data)
+                size += len(data)
+        except StopIteration:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+            start_response(captured['status'], headers.to_wsgi_list(), captured['exc_info'])
+            return head  # Short body: not worth compressing
+        except BaseException:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+            raise
+
+        _set_encoding(headers, encoding)
+        start_response(captured['status'], headers.to_wsgi_list(), captured['exc_info'])
+        return self._stream(app_iter, chunks, head, _Compressor(encoding, self.gzip_level, self.brotli_quality))
+
+    @staticmethod
+    def _stream(app_iter, chunks, head, compressor):
+        try:
+            yield compressor.compress(b''.join(head)) + compressor.flush()
+            for data in chunks:
+                if data:
+                    yield compressor.compress(data) + compressor.flush()
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def _add_vary(value):
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if not any(field.lower() == 'accept-encoding' for field in fields):
+        fields.append('Accept-Encoding')
+    return ', '.join(fields)
+
+
+def _set_encoding(headers, encoding):
+    headers['Content-Encoding'] = encoding
+    headers.remove('Content-Length')
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = f'W/{etag}'  # The compressed body is a different representation
+
+
+def send_static_file(filename):
+    """
+    Replacement for Flask's static view: serves 'filename.br' or 'filename.gz' from the
+    static folder when it exists and the client accepts that encoding.
+    """
+    static_folder = current_app.static_folder
+    encodings = [encoding for encoding in available_encodings()
+                 if os.path.isfile(safe_join(static_folder, filename + SUFFIXES[encoding]) or '')]
+    if not encodings:
+        return current_app.send_static_file(filename)
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'), encodings)
+    if encoding is None:
+        response = current_app.send_static_file(filename)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(static_folder, filename + SUFFIXES[encoding], mimetype=mimetype,
+                                       max_age=current_app.get_send_file_max_age(filename))
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def precompress(folder, extensions=PRECOMPRESS_EXTENSIONS, force=False):
+    """
+    Writes '.br' and '.gz' siblings (highest compression levels) for every file under
+    'folder' with one of 'extensions'. Siblings newer than their source are kept unless
+    'force'; a sibling that would not be smaller is not written.
+    Returns a list of (path, original size, {encoding: compressed size}).
+    """
+    results = []
+    for root, _, names in os.walk(folder):
+        for name in sorted(names):
+            if not name.endswith(extensions):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            sizes = {}
+            for encoding in available_encodings():
+                target = path + SUFFIXES[encoding]
+                if not force and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    sizes[encoding] = os.path.getsize(target)
+                    continue
+                compressed = compress(data, encoding, gzip_level=9, brotli_quality=11)
+                if len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                tmp_path = f"{target}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp_path, target)
+                sizes[encoding] = len(compressed)
+            results.append((path, len(data), sizes))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write .br/.gz siblings of static CSS/JS files.")
+    parser.add_argument('--folder', default=os.path.join(APP_DIR, 'static'), help="Static folder (default: app/static).")
+    parser.add_argument('--force', action='store_true', help="Recompress files whose siblings are up to date.")
+    args = parser.parse_args(argv)
+
+    results = precompress(args.folder, force=args.force)
+    for path, size, sizes in results:
+        compressed = '  '.join(f"{encoding} {sizes[encoding] / 1024:.1f} KB" for encoding in sizes)
+        print(f"{os.path.relpath(path, args.folder)}: {size / 1024:.1f} KB -> {compressed or 'not compressible'}")
+    print(f"{len(results)} files precompressed.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,4 +9,135 @@ class Config:
     STRIPE_SECRET_KEY      = os.getenv('STRIPE_SECRET_KEY', '')
     STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')
     UPLOAD_FOLDER  = os.getenv('UPLOAD_FOLDER', 'static/images')
-    ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'png,jpg,jpeg,gif').split(','))
\ No newline at end of file
+    ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'png,jpg,jpeg,gif').split(','))
+    IMAGE_WIDTHS   = tuple(int(width) for width in os.getenv('IMAGE_WIDTHS', '320,640,1280').split(',')) # srcset variants
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_UPLOAD_MB', '10')) * 1024 * 1024 # Larger requests get 413
+    IMAGE_WORKERS      = int(os.getenv('IMAGE_WORKERS', '2'))       # Threads decoding/resizing uploads
+    IMAGE_QUEUE_SIZE   = int(os.getenv('IMAGE_QUEUE_SIZE', '16'))   # Beyond this, uploads are processed inline
+
+    # Password hashing runs in PASSWORD_WORKERS background processes per worker (0: on the request
+    # thread) at a lower CPU priority; beyond PASSWORD_QUEUE_SIZE waiting hashes, or after
+    # PASSWORD_TIMEOUT seconds without a result, a login gets 503.
+    # Stored hashes made with other parameters are replaced on the next successful login.
+    PASSWORD_HASH_METHOD    = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_WORKERS        = int(os.getenv('PASSWORD_WORKERS', '1'))
+    PASSWORD_QUEUE_SIZE     = int(os.getenv('PASSWORD_QUEUE_SIZE', '8'))
+    PASSWORD_WORKER_NICE    = int(os.getenv('PASSWORD_WORKER_NICE', '10'))
+    PASSWORD_TIMEOUT        = float(os.getenv('PASSWORD_TIMEOUT', '10'))
+
+    # Reverse proxies in front of the app (nginx, a load balancer): with TRUSTED_PROXIES = n, the client
+    # address is taken from the n-th last X-Forwarded-For entry and the scheme from X-Forwarded-Proto, so the
+    # login throttle and the rate limits count clients rather than the proxy. 0: no proxy, the headers are
+    # ignored (a client could set them itself). Applies to the WSGI and the ASGI server alike
+    TRUSTED_PROXIES         = int(os.getenv('TRUSTED_PROXIES', '0'))
+
+    # Failed logins allowed per username and per client IP within LOGIN_THROTTLE_WINDOW seconds
+    LOGIN_MAX_ATTEMPTS_PER_USER = int(os.getenv('LOGIN_MAX_ATTEMPTS_PER_USER', '5'))
+    LOGIN_MAX_ATTEMPTS_PER_IP   = int(os.getenv('LOGIN_MAX_ATTEMPTS_PER_IP', '20'))
+    LOGIN_THROTTLE_WINDOW       = int(os.getenv('LOGIN_THROTTLE_WINDOW', '900'))
+
+    # Token-bucket budgets per client IP and per user: 'endpoint=requests/seconds' (burst of 'requests',
+    # refilled over 'seconds'); endpoints are 'blueprint.view', 'search' is the catalog with ?search_query=.
+    # RATE_LIMIT_DATABASE: a SQLite file shared by all workers; empty keeps the buckets in each worker's
+    # memory (see app/ratelimit.py).
+    RATE_LIMIT_ENABLED      = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATE_LIMITS             = os.getenv('RATE_LIMITS',
+                                        'search=30/60,cart.add_to_cart=30/60,cart.update_cart_item_quantity=60/60,'
+                                        'cart.remove_from_cart=60/60,cart.add_to_favorites=30/60,'
+                                        'cart.remove_from_favorites=30/60,catalog.add_review=5/60,auth.register=5/600,'
+                                        'orders.create_checkout_session=10/60,api.add_to_cart=30/60,'
+                                        'api.update_cart_item=60/60,api.remove_from_cart=60/60,'
+                                        'api.add_to_favorites=30/60,api.remove_from_favorites=30/60')
+    RATE_LIMIT_DATABASE     = os.getenv('RATE_LIMIT_DATABASE', '')
+
+    # JSON API bearer tokens (see app/tokens.py). JWT_SECRET_KEYS: 'kid:secret,...', the first signs;
+    # empty derives one key from SECRET_KEY. Revocations reach other workers within JWT_REVOCATION_REFRESH seconds.
+    JWT_SECRET_KEYS         = os.getenv('JWT_SECRET_KEYS', '')
+    JWT_ACCESS_TTL          = int(os.getenv('JWT_ACCESS_TTL', '900'))
+    JWT_REFRESH_TTL         = int(os.getenv('JWT_REFRESH_TTL', str(30 * 24 * 3600)))
+    JWT_REVOCATION_REFRESH  = float(os.getenv('JWT_REVOCATION_REFRESH', '5'))
+
+    # Streamed pages (admin order list, CSV export): rows fetched from the cursor at a time, and
+    # the rendered size after which a chunk is sent to the client
+    ORDERS_FETCH_SIZE       = int(os.getenv('ORDERS_FETCH_SIZE', '200'))
+    STREAM_BUFFER_SIZE      = int(os.getenv('STREAM_BUFFER_SIZE', '16384'))
+
+    # Admin order page: seconds between its requests for new orders and status changes, and the
+    # most orders one response carries (the page asks again at once for the rest)
+    ADMIN_ORDERS_POLL_SECONDS = float(os.getenv('ADMIN_ORDERS_POLL_SECONDS', '5'))
+    ADMIN_ORDERS_FEED_LIMIT   = int(os.getenv('ADMIN_ORDERS_FEED_LIMIT', '50'))
+
+    # Response compression (brotli or gzip, negotiated on Accept-Encoding); bodies below
+    # COMPRESS_MIN_SIZE bytes are sent uncompressed. Static CSS/JS is precompressed by app/compression.py.
+    COMPRESS_ENABLED        = os.getenv('COMPRESS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    COMPRESS_MIN_SIZE       = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+    COMPRESS_GZIP_LEVEL     = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+
+    # NBU exchange rate used for the approximate EUR totals of the cart and checkout
+    NBU_RATE_URL            = os.getenv('NBU_RATE_URL', 'https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=EUR&json')
+    NBU_TIMEOUT             = float(os.getenv('NBU_TIMEOUT', '5'))
+
+    # ASGI read path (asgi.py, see app/asgi.py): threads running its catalog queries, each with its own
+    # read-only connection, and threads serving the remaining routes through the Flask WSGI app
+    ASGI_READ_THREADS       = int(os.getenv('ASGI_READ_THREADS', '4'))
+    ASGI_WSGI_THREADS       = int(os.getenv('ASGI_WSGI_THREADS', '10'))
+
+    # Live stock levels on the catalog and product pages (ASGI only, see app/stock_feed.py): how often each
+    # worker reads new changes, the keep-alive comment interval of idle streams, products per stream
+    STOCK_FEED_INTERVAL     = float(os.getenv('STOCK_FEED_INTERVAL', '0.5'))
+    STOCK_FEED_HEARTBEAT    = float(os.getenv('STOCK_FEED_HEARTBEAT', '15'))
+    STOCK_FEED_MAX_IDS      = int(os.getenv('STOCK_FEED_MAX_IDS', '200'))
+
+    # Prometheus metrics at /metrics (see app/metrics.py). Off unless enabled, as they name the endpoints
+    # and their traffic; set METRICS_TOKEN too, which scrapers then send as 'Authorization: Bearer <token>',
+    # unless only the scraper can reach the app
+    METRICS_ENABLED         = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN           = os.getenv('METRICS_TOKEN', '')
+
+    # How long a reverse proxy may serve a cached product page to anonymous visitors without
+    # asking the app again; browsers always revalidate (ETag / Last-Modified, answered with 304)
+    PRODUCT_CACHE_SECONDS   = int(os.getenv('PRODUCT_CACHE_SECONDS', '60'))
+
+    # Browser cache lifetime of content-hashed static files (uploads, the app/assets.py bundle)
+    ASSET_MAX_AGE           = int(os.getenv('ASSET_MAX_AGE', str(365 * 24 * 3600)))
+
+    # Jinja bytecode cache shared by all worker processes; an empty directory means
+    # a per-user folder in the system temp directory
+    TEMPLATE_BYTECODE_CACHE = os.getenv('TEMPLATE_BYTECODE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    TEMPLATE_CACHE_DIR      = os.getenv('TEMPLATE_CACHE_DIR', '')
+
+    # Group commit: coalesce small writes (cart, favorites, reviews) from concurrent requests
+    # into one transaction every GROUP_COMMIT_MAX_DELAY_MS milliseconds or GROUP_COMMIT_MAX_BATCH operations.
+    GROUP_COMMIT_ENABLED      = os.getenv('GROUP_COMMIT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv('GROUP_COMMIT_MAX_DELAY_MS', '2'))
+    GROUP_COMMIT_MAX_BATCH    = int(os.getenv('GROUP_COMMIT_MAX_BATCH', '64'))
+
+    # SQLite lock handling: a short busy timeout per attempt, then BEGIN IMMEDIATE is retried
+    # with jittered exponential backoff; a write that still cannot get the lock returns 503.
+    DB_BUSY_TIMEOUT_MS       = int(os.getenv('DB_BUSY_TIMEOUT_MS', '100'))
+    DB_WRITE_RETRIES         = int(os.getenv('DB_WRITE_RETRIES', '6'))
+    DB_RETRY_BASE_DELAY_MS   = float(os.getenv('DB_RETRY_BASE_DELAY_MS', '10'))
+    DB_RETRY_MAX_DELAY_MS    = float(os.getenv('DB_RETRY_MAX_DELAY_MS', '250'))
+    DB_WRITE_LOCK_TIMEOUT_MS = float(os.getenv('DB_WRITE_LOCK_TIMEOUT_MS', '2000'))
+
+    # Statements slower than SLOW_QUERY_MS (0: off) go to a rotating log file (empty: none), with their
+    # query plan the first time; the worst ones are listed at /admin/slow_queries (see app/db.py)
+    SLOW_QUERY_MS            = float(os.getenv('SLOW_QUERY_MS', '100'))
+    SLOW_QUERY_LOG           = os.getenv('SLOW_QUERY_LOG', 'slow_queries.log')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv('SLOW_QUERY_LOG_MAX_BYTES', str(1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS   = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+
+    # Administrators can profile their own requests ('X-Profile' header, '?profile=1' or the switch on
+    # the admin dashboard); the newest PROFILE_MAX_FILES profiles are kept in PROFILE_DIR (see app/profiling.py)
+    PROFILING_ENABLED        = os.getenv('PROFILING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    PROFILE_DIR              = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_FILES        = int(os.getenv('PROFILE_MAX_FILES', '50'))
+
+    # Application logs go to stderr from a background thread, as JSON lines (LOG_FORMAT=text: plain lines).
+    # Of the ordinary requests LOG_REQUEST_SAMPLE_RATE are logged; failed requests and those slower than
+    # LOG_SLOW_REQUEST_MS always are (see app/logs.py)
+    LOG_LEVEL                = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT               = os.getenv('LOG_FORMAT', 'json')
+    LOG_REQUEST_SAMPLE_RATE  = float(os.getenv('LOG_REQUEST_SAMPLE_RATE', '0.1'))
+    LOG_SLOW_REQUEST_MS      = float(os.getenv('LOG_SLOW_REQUEST_MS', '1000'))
@@ -1,31 +1,391 @@
+import contextvars
+import logging
+import pathlib
+import random
+import re
 import sqlite3
-from flask import current_app, g
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from flask import current_app, g, has_app_context, has_request_context, request
 from werkzeug.security import generate_password_hash
 
+from .logs import QueuedHandler
+
+# Serializes writers within one worker process, so that threads queue on this lock
+# instead of spinning in SQLite's busy handler. Writers in other processes are
+# serialized by SQLite itself (BEGIN IMMEDIATE).
+_write_lock = threading.RLock()
+
+# Lock-wait settings used outside an app context (group-commit thread, benchmarks).
+# Inside the app they come from Config.
+DEFAULT_SETTINGS = {
+    'DB_BUSY_TIMEOUT_MS': 100,        # SQLite busy handler wait per attempt
+    'DB_WRITE_RETRIES': 6,            # BEGIN IMMEDIATE retries after the first attempt
+    'DB_RETRY_BASE_DELAY_MS': 10,     # Backoff bound for the first retry, doubled each time
+    'DB_RETRY_MAX_DELAY_MS': 250,     # Upper bound of a single backoff sleep
+    'DB_WRITE_LOCK_TIMEOUT_MS': 2000, # Max wait for the in-process writer lock
+    'SLOW_QUERY_MS': 100,             # Statements slower than this are logged (0: off), see _record_slow_query()
+}
+
+# Rows of stock_changes kept for the live stock feed (see init_db); a worker that falls
+# further behind reloads every level instead
+STOCK_CHANGES_KEPT = 10000
+
+# Per-route lock-wait statistics, see get_lock_stats()
+_lock_stats = {}
+_lock_stats_guard = threading.Lock()
+
+# Slow statements of this process, see _record_slow_query(): totals per normalized statement
+# (at most SLOW_QUERY_STATEMENTS_KEPT of them) and the last SLOW_QUERIES_KEPT occurrences
+SLOW_QUERY_STATEMENTS_KEPT = 500
+SLOW_QUERIES_KEPT = 200
+_slow_query_stats = {}
+_recent_slow_queries = deque(maxlen=SLOW_QUERIES_KEPT)
+_slow_query_guard = threading.Lock()
+log = logging.getLogger(__name__)
+slow_query_log = logging.getLogger(__name__ + '.slow_queries')
+
+
+class DatabaseBusyError(Exception):
+    """Raised when the write lock could not be acquired within the retry budget."""
+
+
+class QueryStats:
+    """Statements run and the time spent in them, for one request (see track_queries)."""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# The QueryStats of the current request, set by metrics.py; None outside a request
+_query_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+def track_queries():
+    """Starts counting the statements of the current context; returns the QueryStats and a reset token."""
+    stats = QueryStats()
+    return stats, _query_stats.set(stats)
+
+
+def stop_tracking_queries(token):
+    try:
+        _query_stats.reset(token)
+    except ValueError:  # Ended in another context than it started (a generator resumed elsewhere)
+        _query_stats.set(None)
+
+
+def _observe_query(conn, sql, parameters, seconds, many=False):
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += seconds
+    threshold = _setting('SLOW_QUERY_MS')
+    if threshold and seconds * 1000 >= threshold:
+        _record_slow_query(conn, sql, parameters, seconds, many)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    A cursor that adds every statement it runs to the current request's QueryStats and
+    records it when it is slower than SLOW_QUERY_MS.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observe_query(self.connection, sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observe_query(self.connection, sql, seq_of_parameters, time.perf_counter() - started, many=True)
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    The connection connect() opens: its cursors are TimedCursors. Connection.execute() would
+    run the statement on a plain cursor internally, so it goes through cursor() here.
+    """
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def _setting(name):
+    if has_app_context():
+        return current_app.config.get(name, DEFAULT_SETTINGS[name])
+    return DEFAULT_SETTINGS[name]
+
+
+def connect(database, readonly=False, timeout=None):
+    """
+    Opens a new SQLite connection with the application's settings.
+    Read-only connections are opened through a 'mode=ro' URI with PRAGMA query_only,
+    so they can never take the write lock; in WAL mode they are not blocked by writers.
+    The busy timeout is short (DB_BUSY_TIMEOUT_MS): write_transaction() retries with
+    backoff instead of letting a worker sleep in SQLite's busy handler.
+    Statements are counted and timed per request (TimedConnection, see metrics.py).
+    """
+    if timeout is None:
+        timeout = _setting('DB_BUSY_TIMEOUT_MS') / 1000
+    if readonly:
+        uri = f"{pathlib.Path(database).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=timeout, factory=TimedConnection)
+        conn.execute("PRAGMA query_only = ON")
+    else:
+        conn = sqlite3.connect(database, timeout=timeout, factory=TimedConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+_SQL_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SQL_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+
+def normalize_sql(sql):
+    """
+    The statement without comments, with literals replaced by '?', lists of placeholders
+    (IN (?, ?, ?)) by '?, ...' and whitespace collapsed, so its variants are counted as one statement.
+    """
+    sql = _SQL_COMMENT.sub(' ', sql)
+    sql = _SQL_STRING.sub('?', sql)
+    sql = _SQL_NUMBER.sub('?', sql)
+    sql = _SQL_PLACEHOLDER_LIST.sub('?, ...', sql)
+    return ' '.join(sql.split())
+
+
+def parameter_shape(parameters, many=False):
+    """The types of bound parameters, without their values: '(int, str, null)', '3 x (int)'."""
+    if many:
+        if not isinstance(parameters, (list, tuple)):
+            return 'many'
+        return f"{len(parameters)} x {parameter_shape(parameters[0]) if parameters else '()'}"
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f"{name}: {_type_name(value)}" for name, value in parameters.items()) + '}'
+    return '(' + ', '.join(_type_name(value) for value in parameters) + ')'
+
+
+def _type_name(value):
+    return 'null' if value is None else type(value).__name__
+
+
+def _explain(conn, sql, parameters, many):
+    """EXPLAIN QUERY PLAN of a statement, as its detail lines; None when it cannot be explained."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    if many:
+        if not isinstance(parameters, (list, tuple)) or not parameters:
+            return None
+        parameters = parameters[0]
+    try:
+        # sqlite3.Connection.execute runs it on a plain statement: not timed, never recorded as slow
+        return [row[3] for row in sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parameters)]
+    except sqlite3.Error:
+        return None
+
+
+def _record_slow_query(conn, sql, parameters, seconds, many):
+    """
+    Adds a statement slower than SLOW_QUERY_MS to this process's slow query statistics and
+    writes it to the slow query log: normalized SQL, parameter types (never their values),
+    duration and route. Its query plan is captured the first time the statement is slow.
+    """
+    normalized = normalize_sql(sql)
+    route = request.endpoint if has_request_context() and request.endpoint else 'background'
+    with _slow_query_guard:
+        stats = _slow_query_stats.get(normalized)
+        new = stats is None and len(_slow_query_stats) < SLOW_QUERY_STATEMENTS_KEPT
+        if new:
+            stats = _slow_query_stats[normalized] = {
+                'sql': normalized, 'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'routes': set(), 'plan': None,
+            }
+        if stats is not None:
+            stats['count'] += 1
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['routes'].add(route)
+        entry = {'sql': normalized, 'parameters': parameter_shape(parameters, many), 'seconds': seconds,
+                 'route': route, 'at': time.time()}
+        _recent_slow_queries.append(entry)
+    plan = None
+    if new:
+        plan = stats['plan'] = _explain(conn, sql, parameters, many)
+    slow_query_log.warning("%.1f ms %s %s %s%s", seconds * 1000, route, normalized, entry['parameters'],
+                           ''.join(f"\n    {line}" for line in plan or ()), extra={'slow_query': entry})
+
+
+def get_slow_queries(limit=20):
+    """
+    The statements of this process with the most time over SLOW_QUERY_MS (top offenders first)
+    and its most recent slow queries (newest first).
+    """
+    with _slow_query_guard:
+        top = sorted(_slow_query_stats.values(), key=lambda stats: stats['total_seconds'], reverse=True)[:limit]
+        top = [dict(stats, routes=sorted(stats['routes'])) for stats in top]
+        recent = [dict(entry) for entry in reversed(_recent_slow_queries)]  # Copies, as for 'top'
+    return top, recent
+
+
+def configure_slow_query_log(path, max_bytes, backup_count):
+    """
+    Sends the slow query log to a rotating file ('path'; empty: no file), written by a
+    background thread (see logs.QueuedHandler). Idempotent per path.
+    """
+    if not path:
+        return
+    path = str(pathlib.Path(path).resolve())
+    if any(getattr(target, 'baseFilename', None) == path
+           for handler in slow_query_log.handlers for target in getattr(handler, 'targets', ())):
+        return
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+    handler.setFormatter(logging.Formatter('%(asctime)s pid=%(process)d %(message)s'))
+    slow_query_log.addHandler(QueuedHandler(handler))
+    slow_query_log.setLevel(logging.WARNING)
+
+
+def _database_path():
+    database = current_app.config.get('DATABASE')
+    if not database:
+        raise RuntimeError("Environment variable 'DATABASE' is not set. Check your .env file.")
+    return database
+
 
 def get_db_connection():
     """
-    Establishes a database connection.
+    Establishes a read-write database connection.
     Uses Flask's 'g' object to cache the connection throughout the request,
     ensuring a single connection per request.
+    Writes should go through write_transaction().
     """
     if 'db' not in g:
-        database = current_app.config.get('DATABASE')
-        if not database:
-            raise RuntimeError("Environment variable 'DATABASE' is not set. Check your .env file.")
-        # Added a timeout to the connection to prevent 'database is locked' errors.
-        # This makes the connection wait for up to 20 seconds if the database is busy.
-        conn = sqlite3.connect(database, timeout=20)
-        conn.row_factory = sqlite3.Row
-        g.db = conn
+        g.db = connect(_database_path())
     return g.db
 
 
+def get_read_connection():
+    """
+    Establishes a read-only database connection for GET handlers.
+    Cached in 'g' like get_db_connection(), but never blocks behind a writer.
+    """
+    if 'read_db' not in g:
+        g.read_db = connect(_database_path(), readonly=True)
+    return g.read_db
+
+
+def _is_busy(error):
+    return (getattr(error, 'sqlite_errorcode', None) in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+            or 'database is locked' in str(error))
+
+
+def _record_lock_wait(waited, retries, gave_up):
+    """Adds one write transaction attempt to the statistics of the current route."""
+    route = request.endpoint if has_request_context() and request.endpoint else 'background'
+    with _lock_stats_guard:
+        stats = _lock_stats.setdefault(route, {
+            'transactions': 0, 'retries': 0, 'busy_errors': 0,
+            'lock_wait_seconds': 0.0, 'max_lock_wait_seconds': 0.0,
+        })
+        stats['transactions'] += 1
+        stats['retries'] += retries
+        stats['busy_errors'] += int(gave_up)
+        stats['lock_wait_seconds'] += waited
+        stats['max_lock_wait_seconds'] = max(stats['max_lock_wait_seconds'], waited)
+
+
+def get_lock_stats():
+    """Returns a copy of the per-route lock-wait statistics of this process."""
+    with _lock_stats_guard:
+        return {route: dict(stats) for route, stats in _lock_stats.items()}
+
+
+def _begin_immediate(conn, started):
+    """
+    Starts a write transaction, retrying SQLITE_BUSY with jittered exponential backoff
+    ("full jitter": a random sleep up to base * 2^attempt, capped at DB_RETRY_MAX_DELAY_MS).
+    Raises DatabaseBusyError when DB_WRITE_RETRIES retries are exhausted.
+    """
+    retries = _setting('DB_WRITE_RETRIES')
+    base_delay = _setting('DB_RETRY_BASE_DELAY_MS') / 1000
+    max_delay = _setting('DB_RETRY_MAX_DELAY_MS') / 1000
+    for attempt in range(retries + 1):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e):
+                raise
+            if attempt == retries:
+                _record_lock_wait(time.perf_counter() - started, attempt, gave_up=True)
+                raise DatabaseBusyError(f"Database is busy, gave up after {attempt} retries.") from e
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+        else:
+            _record_lock_wait(time.perf_counter() - started, attempt, gave_up=False)
+            return
+
+
+@contextmanager
+def write_transaction(conn=None):
+    """
+    Runs the enclosed block as one short write transaction on 'conn'
+    (the request's read-write connection by default).
+    Takes the process-wide writer lock and starts the transaction with BEGIN IMMEDIATE,
+    so the SQLite write lock is acquired up front instead of on the first write;
+    a busy database is retried with backoff and ends in DatabaseBusyError (a 503).
+    Commits when the block finishes and rolls back if it raises.
+    Nested calls join the already open transaction.
+    """
+    if conn is None:
+        conn = get_db_connection()
+    started = time.perf_counter()
+    if not _write_lock.acquire(timeout=_setting('DB_WRITE_LOCK_TIMEOUT_MS') / 1000):
+        _record_lock_wait(time.perf_counter() - started, 0, gave_up=True)
+        raise DatabaseBusyError("Timed out waiting for the writer lock.")
+    try:
+        if conn.in_transaction:
+            yield conn
+            return
+        _begin_immediate(conn, started)
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    finally:
+        _write_lock.release()
+
+
 def close_connection(exception):
-    """Closes the database connection after the request is complete."""
-    db = getattr(g, '_database', None)
-    if db is not None:
-        db.close()
+    """Closes the database connections after the request is complete."""
+    for name in ('db', 'read_db'):
+        db = g.pop(name, None)
+        if db is not None:
+            db.close()
+
+
+def _ensure_column(cursor, table, column, definition):
+    """Adds 'column' to an existing 'table' unless it is already there."""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
 
 
 def init_db():
@@ -36,6 +396,10 @@ def init_db():
     db = get_db_connection()
     cursor = db.cursor()
 
+    # WAL lets readers (get_read_connection) run while a writer holds the write lock.
+    # The journal mode is stored in the database file, so this only needs to run once.
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     # Create the users table
     # Added 'phone_number' column
     cursor.execute('''
@@ -58,7 +422,13 @@ def init_db():
             description TEXT,
             price REAL NOT NULL,
             image_url TEXT,
-            stock INTEGER NOT NULL DEFAULT 100 -- New stock column
+            stock INTEGER NOT NULL DEFAULT 100, -- New stock column
+            image_pending INTEGER NOT NULL DEFAULT 0, -- 1 while an uploaded image is being processed
+            image_width INTEGER, -- Size of the original image, for <img width/height>
+            image_height INTEGER,
+            image_placeholder TEXT, -- Dominant colour ('#rrggbb') shown while the image loads
+            version INTEGER NOT NULL DEFAULT 1, -- Bumped by every change to the product page (HTTP ETag)
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP -- Time of that change, UTC (HTTP Last-Modified)
         )
     ''')
 
@@ -131,6 +501,99 @@ def init_db():
         )
     ''')
 
+    # Failed logins per 'user:<name>' / 'ip:<address>' key, see throttle.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL,
+            attempted_at REAL NOT NULL -- Unix time
+        )
+    ''')
+
+    # API refresh tokens (SHA-256 of the token) and revoked access tokens, see tokens.py
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            token_hash TEXT UNIQUE NOT NULL,
+            expires_at REAL NOT NULL, -- Unix time
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, -- Workers read new rows by id range
+            jti TEXT UNIQUE NOT NULL,
+            expires_at REAL NOT NULL -- Expiry of the revoked token; the row is useless after it
+        )
+    ''')
+
+    # New stock level of a product after every change, written by the triggers below, so no
+    # write path (checkout, the admin editor, test orders) can forget it. ASGI workers read new
+    # rows by seq range and push them to the pages showing the product (see stock_feed.py).
+    # Only the newest STOCK_CHANGES_KEPT rows are kept.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stock_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            stock INTEGER NOT NULL -- 0 once the product is deleted
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_stock_changed AFTER UPDATE OF stock ON products
+        WHEN NEW.stock IS NOT OLD.stock
+        BEGIN
+            INSERT INTO stock_changes (product_id, stock) VALUES (NEW.id, NEW.stock);
+            DELETE FROM stock_changes WHERE seq <= last_insert_rowid() - {STOCK_CHANGES_KEPT};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS products_deleted AFTER DELETE ON products
+        BEGIN
+            INSERT INTO stock_changes (product_id, stock) VALUES (OLD.id, 0);
+            DELETE FROM stock_changes WHERE seq <= last_insert_rowid() - {STOCK_CHANGES_KEPT};
+        END
+    ''')
+
+    # Columns added after the first release, for databases created before them
+    _ensure_column(cursor, 'products', 'image_pending', 'INTEGER NOT NULL DEFAULT 0')
+    _ensure_column(cursor, 'products', 'image_width', 'INTEGER')
+    _ensure_column(cursor, 'products', 'image_height', 'INTEGER')
+    _ensure_column(cursor, 'products', 'image_placeholder', 'TEXT')
+    _ensure_column(cursor, 'products', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    _ensure_column(cursor, 'products', 'updated_at', 'TEXT')  # ADD COLUMN takes no CURRENT_TIMESTAMP default
+    cursor.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+    _ensure_column(cursor, 'orders', 'change_seq', 'INTEGER')
+    cursor.execute("UPDATE orders SET change_seq = id WHERE change_seq IS NULL")
+
+    # orders.change_seq grows with every new order and status change, whichever write path made it
+    # (checkout, test orders, the API, the admin). The admin order page asks for the orders with
+    # change_seq above the last one it has seen (see admin.load_order_changes). Writes are
+    # serialized, so the numbers are handed out in commit order and no change is skipped.
+    for trigger, event in (('orders_created', 'AFTER INSERT ON orders'),
+                           ('orders_status_changed', 'AFTER UPDATE OF status ON orders WHEN NEW.status IS NOT OLD.status')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {trigger} {event}
+            BEGIN
+                UPDATE orders SET change_seq = (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM orders) WHERE id = NEW.id;
+            END
+        ''')
+
+    # Secondary indexes for the foreign keys used in WHERE / ORDER BY clauses.
+    # cart_items and favorite_items are already covered by their UNIQUE(user_id, flower_id) index.
+    # Run 'python -m app.query_audit' after adding a query to check that it still uses an index.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reviews_product_created ON reviews (product_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders (user_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_change_seq ON orders (change_seq)") # Admin order feed
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_image_url ON products (image_url)") # Image refcounts
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_login_attempts_key ON login_attempts (key, attempted_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_login_attempts_time ON login_attempts (attempted_at)") # Pruning
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id, expires_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at)") # Pruning
+
     db.commit()
 
     # Check if the default administrator exists, and add if not
@@ -141,7 +604,7 @@ def init_db():
         cursor.execute("INSERT INTO users (username, password_hash, role, phone_number) VALUES (?, ?, ?, ?)",
                        ('admin', hashed_password, 'admin', '+380501234567')) # Added a default phone number for admin
         db.commit()
-        print("Default administrator added (login: admin, password: admin123, phone: +380501234567)")
+        log.info("Default administrator added (login: admin, password: admin123, phone: +380501234567)")
 
     # Check if initial products exist, and add if not
     cursor.execute("SELECT COUNT(*) FROM products")
@@ -229,6 +692,6 @@ def init_db():
             cursor.execute("INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?)",
                            (flower['name'], flower['description'], flower['price'], flower['image_url'], flower['stock']))
         db.commit()
-        print("Initial flowers added to the database.")
+        log.info("Initial flowers added to the database.")
 
-    print("Database initialized.")
+    log.info("Database initialized.")
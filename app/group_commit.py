@@ -0,0 +1,184 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+
+from .db import DatabaseBusyError, connect, write_transaction
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Coalesces small write operations from concurrent requests into shared transactions.
+
+    Each operation is a callable taking a connection, e.g. 'lambda db: db.execute(...)'.
+    A background thread collects queued operations for up to 'max_delay' seconds or
+    'max_batch' operations, runs them in one transaction (each in its own SAVEPOINT, so a
+    failing operation does not affect the others) and commits once. The Future returned by
+    submit() is resolved only after that commit, i.e. once the write is durable.
+    execute() waits for it at most 'timeout' seconds.
+    """
+
+    def __init__(self, database, max_delay=0.005, max_batch=64, timeout=5):
+        self.database = database
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """Commits everything already queued and stops the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def submit(self, operation):
+        """Queues 'operation(db)' and returns a Future with its result (or exception)."""
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def execute(self, operation):
+        """
+        submit() and wait for the result. An operation still queued after 'timeout' seconds is
+        withdrawn, and one whose transaction is still open after another 'timeout' is given up
+        on; both raise DatabaseBusyError (a 503), as a write that could not get the lock does.
+        """
+        future = self.submit(operation)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise DatabaseBusyError("Timed out waiting for the group-commit writer.") from None
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise DatabaseBusyError("The group-commit transaction did not finish in time.") from None
+
+    def _run(self):
+        try:
+            conn = connect(self.database)
+        except Exception as e:
+            log.exception("Group-commit writer cannot open the database")
+            self._fail_queued([], e)
+            return
+        batch = []
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+        except Exception as e:  # get_group_commit_writer() starts a new writer for the next request
+            log.exception("Group-commit writer failed")
+            self._fail_queued(batch, e)
+        finally:
+            conn.close()
+
+    def _fail_queued(self, batch, error):
+        """Fails the operations of 'batch' and those still queued, so that nobody waits for them."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for _, future in batch:
+            if _claim(future):
+                future.set_exception(error)
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            with write_transaction(conn):
+                for operation, future in batch:
+                    if not _claim(future):
+                        continue  # Withdrawn by execute() while it waited
+                    conn.execute("SAVEPOINT group_commit_op")
+                    try:
+                        result = operation(conn)
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO group_commit_op")
+                        outcomes.append((future, None, e))
+                    else:
+                        outcomes.append((future, result, None))
+                    conn.execute("RELEASE group_commit_op")
+        except Exception as e:
+            # The transaction itself failed (e.g. commit error): nothing in the batch was written
+            for _, future in batch:
+                if _claim(future):
+                    future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def _claim(future):
+    """Marks a queued operation's future as running, so execute() can no longer withdraw it; False if it was."""
+    return future.running() or (not future.done() and future.set_running_or_notify_cancel())
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_group_commit_writer():
+    """
+    Returns the group-commit writer of the current process, starting it on first use,
+    or None if GROUP_COMMIT_ENABLED is off.
+    The writer is recreated after fork, so each worker process owns its own thread, and
+    after its thread has died.
+    """
+    if not current_app.config.get('GROUP_COMMIT_ENABLED'):
+        return None
+
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid() or not _writer.is_alive():
+            config = current_app.config
+            # A queued write waits as long as a write of its own could wait for the lock
+            timeout = (config['DB_WRITE_LOCK_TIMEOUT_MS'] + config['DB_WRITE_RETRIES'] * config['DB_RETRY_MAX_DELAY_MS'])
+            _writer = GroupCommitWriter(config['DATABASE'],
+                                        max_delay=config['GROUP_COMMIT_MAX_DELAY_MS'] / 1000,
+                                        max_batch=config['GROUP_COMMIT_MAX_BATCH'],
+                                        timeout=timeout / 1000)
+            _writer.start()
+            atexit.register(_writer.stop)
+    return _writer
@@ -0,0 +1,170 @@
+"""
+Orphan image collector.
+
+Finds files in the upload folder (and their srcset variants) that no products.image_url
+references: leftovers of failed uploads, of edits that failed after storing the file
+and of products whose image could not be deleted. The referenced names are loaded with
+one query and diffed against a directory listing as sets.
+
+Orphans are first moved to a quarantine folder (outside 'static', so they are no longer
+served) and only deleted by a later run once they are older than --retention-days.
+A file can be restored by moving it back. The move happens inside a write transaction:
+uploads store their file and reference it within one (see app.edit_flower), so no
+upload can commit a reference to a file while it is being quarantined, and the
+collector can run while the app is serving. Files younger than --min-age are never
+touched, which covers uploads that are still being staged.
+
+Usage:
+    python -m app.image_gc --dry-run
+    python -m app.image_gc --database database.db --retention-days 7
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import time
+from collections import namedtuple
+
+from .config import Config
+from .db import connect, write_transaction
+from .images import VARIANTS_DIR
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUARANTINE = os.path.join(APP_DIR, 'image_quarantine')
+BATCH_FORMAT = '%Y%m%d-%H%M%S'
+
+# Bundled catalog images seeded by init_db() (flower1.jpg ...); kept unless --include-bundled is given
+BUNDLED_STEM = re.compile(r'^flower\d+$')
+_VARIANT_NAME = re.compile(r'^(?P<stem>.+)-\d+w\.\w+$')
+
+GcReport = namedtuple('GcReport', 'scanned quarantined quarantined_bytes purged purged_bytes')
+
+
+def referenced_names(conn):
+    """Returns the set of file names referenced by products.image_url."""
+    rows = conn.execute("SELECT DISTINCT image_url FROM products WHERE image_url IS NOT NULL")
+    return {os.path.basename(row[0]) for row in rows}
+
+
+def _list_files(folder):
+    try:
+        with os.scandir(folder) as entries:
+            return [entry for entry in entries if entry.is_file(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+def find_orphans(conn, folder, min_age=3600, include_bundled=False, now=None):
+    """
+    Returns (number of files scanned, paths of orphaned originals and variants under 'folder').
+    Files modified less than 'min_age' seconds ago are skipped.
+    """
+    now = time.time() if now is None else now
+    referenced = referenced_names(conn)
+    referenced_stems = {os.path.splitext(name)[0] for name in referenced}
+
+    originals = _list_files(folder)
+    variants = _list_files(os.path.join(folder, VARIANTS_DIR))
+    candidates = []
+    for entry in originals:
+        if entry.name.startswith('.upload-'):
+            candidates.append(entry)  # Temporary file of an upload; old ones were interrupted
+        elif entry.name not in referenced and (include_bundled or not BUNDLED_STEM.match(os.path.splitext(entry.name)[0])):
+            candidates.append(entry)
+    for entry in variants:
+        match = _VARIANT_NAME.match(entry.name)
+        stem = match.group('stem') if match else ''
+        if stem not in referenced_stems and (include_bundled or not BUNDLED_STEM.match(stem)):
+            candidates.append(entry)
+
+    orphans = [entry.path for entry in candidates if now - entry.stat().st_mtime >= min_age]
+    return len(originals) + len(variants), orphans
+
+
+def quarantine_orphans(database, folder, quarantine_dir=DEFAULT_QUARANTINE, min_age=3600,
+                       include_bundled=False, dry_run=False):
+    """
+    Moves orphaned files into a new timestamped batch under 'quarantine_dir'.
+    Returns (number scanned, list of (path, size) quarantined, or that would be with 'dry_run').
+    """
+    conn = connect(database)
+    try:
+        with write_transaction(conn):  # Holds the write lock so no upload can reference a file mid-move
+            scanned, orphans = find_orphans(conn, folder, min_age, include_bundled)
+            moved = []
+            batch_dir = os.path.join(quarantine_dir, time.strftime(BATCH_FORMAT))
+            for path in orphans:
+                size = os.path.getsize(path)
+                if not dry_run:
+                    target = os.path.join(batch_dir, os.path.relpath(path, folder))
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                moved.append((path, size))
+    finally:
+        conn.close()
+    return scanned, moved
+
+
+def purge_quarantine(quarantine_dir=DEFAULT_QUARANTINE, retention=7 * 86400, dry_run=False, now=None):
+    """
+    Deletes quarantine batches older than 'retention' seconds.
+    Returns (number of files, bytes reclaimed).
+    """
+    now = time.time() if now is None else now
+    files, reclaimed = 0, 0
+    for entry in _list_dirs(quarantine_dir):
+        try:
+            created = time.mktime(time.strptime(entry.name, BATCH_FORMAT))
+        except ValueError:
+            continue  # Not a batch created by this tool
+        if now - created < retention:
+            continue
+        for root, _, names in os.walk(entry.path):
+            for name in names:
+                files += 1
+                reclaimed += os.path.getsize(os.path.join(root, name))
+        if not dry_run:
+            shutil.rmtree(entry.path)
+    return files, reclaimed
+
+
+def _list_dirs(folder):
+    try:
+        with os.scandir(folder) as entries:
+            return sorted((entry for entry in entries if entry.is_dir(follow_symlinks=False)), key=lambda e: e.name)
+    except FileNotFoundError:
+        return []
+
+
+def collect_garbage(database, folder, quarantine_dir=DEFAULT_QUARANTINE, min_age=3600,
+                    retention=7 * 86400, include_bundled=False, dry_run=False):
+    """Purges expired quarantine batches, then quarantines current orphans. Returns a GcReport."""
+    purged, purged_bytes = purge_quarantine(quarantine_dir, retention, dry_run)
+    scanned, moved = quarantine_orphans(database, folder, quarantine_dir, min_age, include_bundled, dry_run)
+    return GcReport(scanned, len(moved), sum(size for _, size in moved), purged, purged_bytes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quarantine and delete image files no product references.")
+    parser.add_argument('--database', default=Config.DATABASE, help="SQLite database (default: %(default)s).")
+    parser.add_argument('--folder', default=os.path.join(APP_DIR, Config.UPLOAD_FOLDER),
+                        help="Upload folder (default: app/static/images).")
+    parser.add_argument('--quarantine', default=DEFAULT_QUARANTINE, help="Quarantine folder (default: app/image_quarantine).")
+    parser.add_argument('--min-age', type=float, default=3600, help="Skip files younger than this many seconds (default: 3600).")
+    parser.add_argument('--retention-days', type=float, default=7, help="Delete quarantined files after this many days (default: 7).")
+    parser.add_argument('--include-bundled', action='store_true', help="Also collect unreferenced bundled flower*.jpg images.")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be moved or deleted.")
+    args = parser.parse_args(argv)
+
+    report = collect_garbage(args.database, args.folder, args.quarantine, args.min_age,
+                             args.retention_days * 86400, args.include_bundled, args.dry_run)
+    prefix = "[dry run] " if args.dry_run else ""
+    print(f"{prefix}Scanned {report.scanned} files.")
+    print(f"{prefix}Quarantined {report.quarantined} orphaned files ({report.quarantined_bytes / 1024:.1f} KB).")
+    print(f"{prefix}Deleted {report.purged} expired quarantined files, {report.purged_bytes / 1024:.1f} KB reclaimed.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+Responsive image variants.
+
+Uploads are stored under the SHA-256 of their content (first HASH_PREFIX_LENGTH hex
+digits), so re-uploading the same photo reuses the existing file and every file name
+can be cached by browsers forever (see is_content_addressed()).
+
+Every uploaded product image is resized to a few fixed widths and saved as WebP and
+JPEG next to it, in a 'variants' sub-folder:
+
+    static/images/flower1.jpg
+    static/images/variants/flower1-320w.webp
+    static/images/variants/flower1-320w.jpg
+    ...
+
+Templates pick the right size through srcset (see image_variants()), so a grid card on
+a phone downloads a ~15 KB WebP instead of the full-size original. Widths larger than
+the original are not upscaled; the original width is used as the largest variant instead.
+
+Processing also records the image's size and dominant colour (ImageInfo), which the
+templates use for explicit <img> dimensions and a colour placeholder while it loads.
+
+Usage (backfill variants for images uploaded before this existed):
+    python -m app.images                     # every image in static/images
+    python -m app.images --pattern 'flower*'
+    python -m app.images --database database.db   # also fill in products' size and colour
+"""
+import argparse
+import atexit
+import glob
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from .db import connect, write_transaction
+
+log = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_WIDTHS = (320, 640, 1280)
+VARIANTS_DIR = 'variants'
+FORMATS = {
+    # extension: (Pillow format, save options)
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+HASH_PREFIX_LENGTH = 16  # 64 bits of SHA-256, collisions are not a practical concern
+CHUNK_SIZE = 64 * 1024
+# '<hash>.<ext>' originals and their '<hash>-<width>w.<ext>' variants
+_CONTENT_ADDRESSED_NAME = re.compile(rf'^[0-9a-f]{{{HASH_PREFIX_LENGTH}}}(-\d+w)?\.[a-z0-9]+$')
+
+# File signatures of the accepted image formats: (offset, bytes) -> extension
+MAGIC_BYTES = (
+    ((0, b'\xff\xd8\xff'), 'jpg'),
+    ((0, b'\x89PNG\r\n\x1a\n'), 'png'),
+    ((0, b'GIF87a'), 'gif'),
+    ((0, b'GIF89a'), 'gif'),
+    ((8, b'WEBP'), 'webp'),  # 'RIFF' <size> 'WEBP'
+)
+
+StagedUpload = namedtuple('StagedUpload', 'tmp_path filename')
+ImageInfo = namedtuple('ImageInfo', 'widths width height placeholder')
+
+
+class UploadError(ValueError):
+    """An upload was rejected; the message is shown to the user."""
+
+
+def sniff_image_type(head):
+    """Returns the extension matching the magic bytes at the start of a file, or None."""
+    for (offset, signature), ext in MAGIC_BYTES:
+        if head[offset:offset + len(signature)] == signature:
+            if ext == 'webp' and not head.startswith(b'RIFF'):
+                continue
+            return ext
+    return None
+
+# Variants found on disk, keyed by the image's path under 'static/'.
+# Only hits are cached: variants of a file never change once written, while a miss
+# may turn into a hit when the backfill runs in another process.
+_variants_cache = {}
+_variants_cache_lock = threading.Lock()
+
+
+def variant_paths(image_path, width):
+    """Returns {extension: path} of the variants of 'image_path' with the given width."""
+    folder, filename = os.path.split(image_path)
+    stem = os.path.splitext(filename)[0]
+    return {ext: os.path.join(folder, VARIANTS_DIR, f"{stem}-{width}w.{ext}") for ext in FORMATS}
+
+
+def stage_upload(stream, folder, allowed_types=None, max_bytes=None):
+    """
+    Copies an uploaded file stream to a temporary file in 'folder' in chunks, hashing it
+    on the way, and returns a StagedUpload with its content-addressed file name.
+    The format is taken from the file's magic bytes, not from its name; UploadError is
+    raised for formats outside 'allowed_types' and for files larger than 'max_bytes'.
+    Call store_upload() to move it into place, or discard_upload() to drop it.
+    """
+    head = stream.read(CHUNK_SIZE)
+    ext = sniff_image_type(head)
+    if ext is None or (allowed_types is not None and ext not in allowed_types):
+        raise UploadError("Файл не є зображенням у підтримуваному форматі.")
+
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=folder, prefix='.upload-', delete=False) as tmp:
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                tmp.close()
+                os.remove(tmp.name)
+                raise UploadError(f"Зображення більше за {max_bytes // (1024 * 1024)} МБ.")
+            digest.update(chunk)
+            tmp.write(chunk)
+            chunk = stream.read(CHUNK_SIZE)
+    return StagedUpload(tmp.name, f"{digest.hexdigest()[:HASH_PREFIX_LENGTH]}.{ext}")
+
+
+def store_upload(staged, folder):
+    """
+    Moves a staged upload to its content-addressed name in 'folder' and returns its path.
+    If a file with the same content is already stored, it is reused and the copy dropped.
+    """
+    path = os.path.join(folder, staged.filename)
+    if os.path.exists(path):
+        discard_upload(staged)
+    else:
+        os.replace(staged.tmp_path, path)
+    return path
+
+
+def discard_upload(staged):
+    """Removes the temporary file of a staged upload, if it is still there."""
+    try:
+        os.remove(staged.tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+def is_content_addressed(filename):
+    """True for stored uploads and their variants, whose content never changes under the same name."""
+    return bool(_CONTENT_ADDRESSED_NAME.match(os.path.basename(filename)))
+
+
+def _open_image(image_path):
+    with Image.open(image_path) as original:
+        image = ImageOps.exif_transpose(original)  # Phone photos carry their rotation in EXIF
+        return image.convert('RGB')
+
+
+def dominant_colour(image):
+    """Returns the most common of 8 colours of a downscaled copy of 'image' as '#rrggbb'."""
+    sample = image.copy()
+    sample.thumbnail((64, 64))
+    palette_image = sample.quantize(colors=8)
+    _, index = max(palette_image.getcolors())
+    r, g, b = palette_image.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def image_info(image_path):
+    """Returns ImageInfo (without variant widths) for the image file at 'image_path'."""
+    image = _open_image(image_path)
+    return ImageInfo([], image.width, image.height, dominant_colour(image))
+
+
+def create_variants(image_path, widths=DEFAULT_WIDTHS):
+    """
+    Writes WebP and JPEG variants of the image file at 'image_path' for every width
+    and returns an ImageInfo with the widths actually written (never wider than the
+    original), the original size and the dominant colour.
+    Each file is written under a temporary name and renamed, so a reader never
+    sees a partially written variant.
+    """
+    image = _open_image(image_path)
+
+    targets = sorted({min(width, image.width) for width in widths})
+    os.makedirs(os.path.join(os.path.dirname(image_path), VARIANTS_DIR), exist_ok=True)
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for ext, path in variant_paths(image_path, width).items():
+            pil_format, options = FORMATS[ext]
+            tmp_path = f"{path}.tmp"
+            resized.save(tmp_path, pil_format, **options)
+            os.replace(tmp_path, path)
+    return ImageInfo(targets, image.width, image.height, dominant_colour(image))
+
+
+def remove_variants(image_path):
+    """Deletes every variant of 'image_path'. Missing files are ignored."""
+    folder, filename = os.path.split(image_path)
+    stem = os.path.splitext(filename)[0]
+    for path in glob.glob(os.path.join(glob.escape(folder), VARIANTS_DIR, f"{glob.escape(stem)}-*w.*")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _find_variants(static_folder, static_path):
+    """Lists the variant widths that exist on disk for an image under 'static/', or []."""
+    image_path = os.path.join(static_folder, static_path)
+    folder, filename = os.path.split(image_path)
+    stem = os.path.splitext(filename)[0]
+    widths = []
+    for path in glob.glob(os.path.join(glob.escape(folder), VARIANTS_DIR, f"{glob.escape(stem)}-*w.webp")):
+        width = os.path.basename(path)[len(stem) + 1:-len('w.webp')]
+        if width.isdigit() and all(os.path.exists(p) for p in variant_paths(image_path, width).values()):
+            widths.append(int(width))
+    return sorted(widths)
+
+
+def image_variants(image_url, static_folder, url_for_static):
+    """
+    Returns srcset data for a product image, or None if it has no variants (yet):
+    {'webp': srcset, 'jpg': srcset, 'src': URL of a mid-size JPEG, 'widths': [...]}.
+    'image_url' is the value stored in products.image_url ('static/images/x.jpg' or
+    '/static/images/x.jpg'); 'url_for_static' turns a path under 'static/' into a URL.
+    """
+    if not image_url or image_url.startswith(('http://', 'https://')):
+        return None
+    static_path = image_url.split('static/')[-1]
+
+    widths = _variants_cache.get(static_path)
+    if widths is None:
+        widths = _find_variants(static_folder, static_path)
+        if not widths:
+            return None
+        with _variants_cache_lock:
+            _variants_cache[static_path] = widths
+
+    urls = {ext: [] for ext in FORMATS}
+    for width in widths:
+        for ext, path in variant_paths(static_path, width).items():
+            urls[ext].append((url_for_static(path.replace(os.sep, '/')), width))
+
+    src_index = min(1, len(widths) - 1)  # The second-smallest variant is a sensible default src
+    variants = {ext: ', '.join(f"{url} {width}w" for url, width in entries) for ext, entries in urls.items()}
+    variants['src'] = urls['jpg'][src_index][0]
+    variants['widths'] = widths
+    return variants
+
+
+class ImageProcessor:
+    """
+    Bounded thread pool for image work that should not hold a request thread:
+    decoding and resizing uploads and deleting replaced files.
+    At most 'max_pending' tasks are queued or running; beyond that submit() runs the
+    task on the caller's thread, so a burst of uploads slows down the uploader instead
+    of growing the queue without limit.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16):
+        self.pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-processor')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, task, *args):
+        if not self._slots.acquire(blocking=False):
+            _run_task(task, *args)
+            return None
+        future = self._executor.submit(_run_task, task, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self):
+        """Waits for queued tasks to finish."""
+        self._executor.shutdown(wait=True)
+
+
+def _run_task(task, *args):
+    try:
+        return task(*args)
+    except Exception:  # Nobody waits on the future, so report errors here
+        log.exception("Image processing task %s failed", task.__name__)
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_image_processor(max_workers=2, max_pending=16):
+    """
+    Returns the image processor of the current process, creating it on first use.
+    It is recreated after fork, so each worker process owns its own threads.
+    """
+    global _processor
+    with _processor_lock:
+        if _processor is None or _processor.pid != os.getpid():
+            _processor = ImageProcessor(max_workers, max_pending)
+            atexit.register(_processor.shutdown)
+    return _processor
+
+
+def backfill(folder, pattern='*', widths=DEFAULT_WIDTHS, force=False):
+    """
+    Creates variants for every source image in 'folder' matching 'pattern'.
+    Images that already have all variants are skipped unless 'force' is set.
+    Returns a list of (filename, original bytes, smallest WebP bytes) tuples.
+    """
+    report = []
+    for path in sorted(glob.glob(os.path.join(glob.escape(folder), pattern))):
+        if not os.path.isfile(path) or not path.lower().endswith(SOURCE_EXTENSIONS):
+            continue
+        static_folder, static_path = os.path.dirname(folder), os.path.relpath(path, os.path.dirname(folder))
+        if not force and _find_variants(static_folder, static_path):
+            continue
+        try:
+            written = create_variants(path, widths)
+        except OSError as e:
+            log.warning("Skipping %s: %s", path, e)
+            continue
+        smallest = variant_paths(path, written.widths[0])['webp']
+        report.append((os.path.basename(path), os.path.getsize(path), os.path.getsize(smallest)))
+    return report
+
+
+def backfill_image_info(database, static_folder):
+    """
+    Fills in image_width, image_height and image_placeholder of products whose image
+    was processed before these columns existed. Returns the number of updated products.
+    """
+    conn = connect(database)
+    try:
+        rows = conn.execute("SELECT id, image_url FROM products "
+                            "WHERE image_url IS NOT NULL AND image_placeholder IS NULL").fetchall()
+        updates = []
+        for product_id, image_url in rows:
+            path = os.path.join(static_folder, image_url.split('static/')[-1])
+            try:
+                info = image_info(path)
+            except OSError as e:
+                log.warning("Skipping product %s (%s): %s", product_id, path, e)
+                continue
+            updates.append((info.width, info.height, info.placeholder, product_id))
+        with write_transaction(conn):
+            conn.executemany("UPDATE products SET image_width = ?, image_height = ?, image_placeholder = ? WHERE id = ?",
+                             updates)
+    finally:
+        conn.close()
+    return len(updates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create responsive WebP/JPEG variants for existing product images.")
+    parser.add_argument('--folder', default=os.path.join(APP_DIR, 'static', 'images'),
+                        help="Image folder (default: app/static/images).")
+    parser.add_argument('--pattern', default='*', help="Glob pattern of images to convert (default: all).")
+    parser.add_argument('--widths', default=','.join(map(str, DEFAULT_WIDTHS)),
+                        help="Comma-separated variant widths (default: %(default)s).")
+    parser.add_argument('--force', action='store_true', help="Recreate variants that already exist.")
+    parser.add_argument('--database', help="Also record size and dominant colour of product images in this database.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format='%(message)s')  # Images that are skipped
+    widths = tuple(int(width) for width in args.widths.split(','))
+    report = backfill(args.folder, args.pattern, widths, args.force)
+    for filename, original_size, webp_size in report:
+        print(f"{filename:>45}: {original_size / 1024:8.1f} KB -> {webp_size / 1024:6.1f} KB ({widths[0]}w WebP)")
+    total_original = sum(r[1] for r in report)
+    total_webp = sum(r[2] for r in report)
+    if report:
+        print(f"{len(report)} images converted, grid card weight {total_original / 1024:.0f} KB -> "
+              f"{total_webp / 1024:.0f} KB ({total_original / max(total_webp, 1):.1f}x smaller).")
+    else:
+        print("Nothing to convert.")
+    if args.database:
+        updated = backfill_image_info(args.database, os.path.dirname(args.folder))
+        print(f"Image size and placeholder colour recorded for {updated} products.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Application logging, written off the request threads.
+
+configure_logging() puts a QueuedHandler on the 'app' logger, the parent of the module loggers
+(logging.getLogger(__name__)). The handler only puts a record on a queue; a background thread
+formats and writes it to stderr (collected by gunicorn), so logging never waits for I/O.
+Records logged during a request carry its id (the proxy's X-Request-ID, or a new one; sent
+back in the response), the user id and the endpoint. With LOG_FORMAT 'json' every record is
+one JSON object per line, 'extra' fields included.
+
+The blueprint logs every request on 'app.logs.requests' with its status and duration. As the
+most frequent event it is sampled: LOG_REQUEST_SAMPLE_RATE of the ordinary requests are
+written, with the rate in the record to weight counts by. Failed requests (5xx) and requests
+slower than LOG_SLOW_REQUEST_MS are always written, as warnings.
+"""
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import Blueprint, current_app, g, has_request_context, request
+from flask.globals import request_ctx
+
+bp = Blueprint('logs', __name__)
+
+request_log = logging.getLogger(__name__ + '.requests')
+
+REQUEST_ID = re.compile(r'^[\w.:-]{1,64}$')
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, pid and the record's extra fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+                    .isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StderrHandler(logging.StreamHandler):
+    """Writes to the current sys.stderr, which test runners and servers may replace after start-up."""
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class QueuedHandler(QueueHandler):
+    """
+    Hands records to a background thread that writes them with 'handlers'. The thread is
+    started by the first record of each process (a forked worker starts its own); flush(),
+    which logging.shutdown() calls at exit, waits until it has written what is queued.
+    """
+
+    def __init__(self, *handlers):
+        super().__init__(queue.SimpleQueue())
+        self.targets = handlers
+        self.listener = None
+        self.pid = None
+
+    def prepare(self, record):
+        """
+        Runs in the thread that logs: adds the request's fields and renders the message and
+        traceback, so the record carries no references to the caller's objects.
+        """
+        record = copy.copy(record)
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.endpoint = request.endpoint
+            user_session = request_ctx.session  # None while the session is being opened
+            record.user_id = user_session.get('user_id') if user_session is not None else None
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Called with the handler's lock held (Handler.handle); logging renews that lock after fork
+        if self.pid != os.getpid():
+            self.queue = queue.SimpleQueue()  # What a parent process queued is the parent's to write
+            self.listener = QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self.listener.start()
+            self.pid = os.getpid()
+        self.queue.put_nowait(record)
+
+    def flush(self):
+        """Waits until the queued records are written; the next record starts the thread again."""
+        with self.lock:
+            if self.pid == os.getpid():
+                self.listener.stop()
+            self.pid = None
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+def configure_logging(level='INFO', fmt='json'):
+    """
+    Sends the records of the 'app' loggers at 'level' and above through a QueuedHandler to
+    stderr, as JSON ('json') or plain lines ('text'). Idempotent; a later call changes the
+    level and format.
+    """
+    global _handler
+    logger = logging.getLogger('app')
+    if _handler is None:
+        _handler = QueuedHandler(StderrHandler())
+        logger.addHandler(_handler)
+    _handler.targets[0].setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+    logger.setLevel(level)
+    return _handler
+
+
+@bp.before_app_request
+def start_request_log():
+    """Runs first (the blueprint is registered before the others): names the request and starts its clock."""
+    request_id = request.headers.get('X-Request-ID', '')
+    g.request_id = request_id if REQUEST_ID.match(request_id) else uuid.uuid4().hex
+    g.log_started = time.perf_counter()
+
+
+@bp.after_app_request
+def send_request_id(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    g.log_status = response.status_code
+    return response
+
+
+@bp.teardown_app_request
+def log_request(exception=None):
+    """Logs the request once it is over: after a streamed body has been sent, or when the view raised (500)."""
+    started = g.pop('log_started', None)
+    if started is None:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    status = g.pop('log_status', 500)
+    fields = {'method': request.method, 'path': request.path, 'status': status, 'duration_ms': round(duration_ms, 1)}
+    if status >= 500 or duration_ms >= current_app.config['LOG_SLOW_REQUEST_MS']:
+        request_log.warning("%s %s %d %.1f ms", request.method, request.path, status, duration_ms, extra=fields)
+        return
+    sample_rate = current_app.config['LOG_REQUEST_SAMPLE_RATE']
+    if random.random() < sample_rate:  # The record is not even created for the others
+        request_log.info("%s %s %d %.1f ms", request.method, request.path, status, duration_ms,
+                         extra=dict(fields, sample_rate=sample_rate))
@@ -0,0 +1,112 @@
+"""
+Request metrics in the Prometheus text format, at /metrics.
+
+For every request: its latency by endpoint, method and status, and how many SQL statements
+it ran and how long they took (db.TimedConnection counts them for the request). Also the
+time spent rendering each template and waiting for outbound HTTP calls (the NBU exchange
+rate, Stripe; see observe_http). The latency of a streamed page includes the streaming.
+
+The metrics are kept per worker process. Under gunicorn every worker writes them to files
+in PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py creates it) and /metrics adds up the files of
+all workers, so whichever worker answers the scrape reports the whole server. Without that
+variable (the development server, tests) /metrics reports this process.
+
+The blueprint is only registered with METRICS_ENABLED, which is off by default. With
+METRICS_TOKEN set, /metrics asks for it as a bearer token.
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Blueprint, current_app, g, request
+from flask.signals import before_render_template, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from .db import stop_tracking_queries, track_queries
+
+bp = Blueprint('metrics', __name__)
+
+REQUESTS = Counter('flowerstream_requests_total', 'Requests answered.', ['endpoint', 'method', 'status'])
+REQUEST_SECONDS = Histogram('flowerstream_request_duration_seconds', 'Request latency.', ['endpoint', 'method'])
+REQUEST_SQL_STATEMENTS = Histogram('flowerstream_request_sql_statements', 'SQL statements run by a request.',
+                                   ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500))
+REQUEST_SQL_SECONDS = Histogram('flowerstream_request_sql_duration_seconds', 'Time a request spent in SQL statements.',
+                                ['endpoint'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+TEMPLATE_SECONDS = Histogram('flowerstream_template_render_seconds', 'Template rendering time.', ['template'])
+HTTP_SECONDS = Histogram('flowerstream_outbound_http_duration_seconds', 'Outbound HTTP call latency.',
+                         ['service', 'outcome'])
+
+
+@contextmanager
+def observe_http(service):
+    """Times the outbound HTTP call in the block ('nbu', 'stripe'); 'outcome' is 'error' if it raises."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        HTTP_SECONDS.labels(service, outcome).observe(time.perf_counter() - started)
+
+
+def _template_started(app, template, context, **extra):
+    g.setdefault('template_starts', []).append(time.perf_counter())
+
+
+def _template_finished(app, template, context, **extra):
+    starts = g.get('template_starts')
+    if starts:
+        TEMPLATE_SECONDS.labels(template.name or 'string').observe(time.perf_counter() - starts.pop())
+
+
+@bp.record_once
+def connect_template_signals(state):
+    before_render_template.connect(_template_started, state.app)
+    template_rendered.connect(_template_finished, state.app)
+
+
+@bp.before_app_request
+def start_request_metrics():
+    """Runs first (the blueprint is registered before the others): starts the clock and the SQL counter."""
+    g.request_started = time.perf_counter()
+    g.query_stats, g.query_stats_token = track_queries()
+
+
+@bp.after_app_request
+def record_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@bp.teardown_app_request
+def record_request_metrics(exception=None):
+    """
+    Records the request once it is over: after a streamed body has been sent, or when the
+    view raised (status 500).
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    stats = g.pop('query_stats')
+    stop_tracking_queries(g.pop('query_stats_token'))
+    endpoint = request.endpoint or 'unmatched'  # 404s share one label
+    status = g.pop('response_status', 500)
+    REQUESTS.labels(endpoint, request.method, str(status)).inc()
+    REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    REQUEST_SQL_STATEMENTS.labels(endpoint).observe(stats.count)
+    REQUEST_SQL_SECONDS.labels(endpoint).observe(stats.seconds)
+
+
+@bp.route('/metrics')
+def metrics():
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return 'Unauthorized', 401, {'WWW-Authenticate': 'Bearer'}
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # Adds up the files of every worker
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
@@ -0,0 +1,341 @@
+"""
+Checkout with Stripe, the order that a successful payment creates, and the customer's
+order history.
+"""
+import datetime
+import logging
+
+import stripe
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, session, url_for
+
+from .cart import load_user_cart_from_db
+from .catalog import get_flower_by_id
+from .db import get_db_connection, get_read_connection, write_transaction
+from .metrics import observe_http
+from .utils import get_uah_to_eur_rate
+
+bp = Blueprint('orders', __name__)
+log = logging.getLogger(__name__)
+
+
+@bp.route('/checkout', methods=['GET', 'POST'])
+def checkout():
+    """
+    Displays the checkout page.
+    Passes Stripe publishable key to the template for client-side integration.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб оформити замовлення.', 'info')
+        return redirect(url_for('auth.login'))
+
+    return render_template('checkout.html',
+                           stripe_public_key=current_app.config['STRIPE_PUBLISHABLE_KEY'])
+
+
+@bp.route('/create-checkout-session', methods=['POST'])
+def create_checkout_session():
+    """
+    Creates a Stripe Checkout Session for payment processing.
+    Calculates prices in EUR based on the current exchange rate.
+    Performs stock validation before proceeding.
+    Stores recipient name, delivery address, and phone number in session for checkout_success.
+    Requires user to be logged in and cart not to be empty.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб оформити замовлення.', 'info')
+        return redirect(url_for('auth.login'))
+
+    cart = session.get('cart', [])
+    if not cart:
+        flash('Ваш кошик порожній.', 'info')
+        return redirect(url_for('cart.view_cart'))
+
+    # --- Stock Validation ---
+    for item in cart:
+        flower = get_flower_by_id(item['id'])
+        if not flower:
+            flash(f"Товар '{item['name']}' не знайдено.", "danger")
+            return redirect(url_for('cart.view_cart'))
+
+        if item['quantity'] > flower['stock']:
+            flash(f"На жаль, товару '{item['name']}' є лише {flower['stock']} одиниць в наявності. Оновіть кількість у кошику.", "warning")
+            return redirect(url_for('cart.view_cart'))
+    # --- End Stock Validation ---
+
+    exchange_rate = get_uah_to_eur_rate(current_app.config['NBU_RATE_URL'], current_app.config['NBU_TIMEOUT'])
+    data = request.get_json()
+    recipient_name = data.get('recipient_name')
+    delivery_address = data.get('delivery_address')
+    phone_number = data.get('phone_number')
+
+    # Validation
+    # Updated validation to be slightly more permissive for common phone number formats
+    allowed_chars = set("0123456789+()- ")
+    if not all(char in allowed_chars for char in phone_number):
+        # We don't want an alert() here, it should be a flash message or error in response
+        return jsonify({'error': 'Телефон має містити лише цифри, символ +, дужки, тире та пробіли.'}), 400
+    if not recipient_name or not delivery_address or not phone_number:
+        return jsonify({'error': 'Будь ласка, заповніть усі поля доставки.'}), 400
+
+    session['checkout_delivery_details'] = {
+        'recipient_name': recipient_name,
+        'delivery_address': delivery_address,
+        'phone_number': phone_number,
+    }
+
+    line_items = []
+
+    for item in cart:
+        price_uah = item['price']
+        price_eur = round(price_uah / exchange_rate, 2)
+        line_items.append({
+            'price_data': {
+                'currency': 'eur',
+                'product_data': {'name': item['name']},
+                'unit_amount': int(price_eur * 100),  # Convert to cents
+            },
+            'quantity': item['quantity'],
+        })
+
+    try:
+        with observe_http('stripe'):
+            checkout_session = stripe.checkout.Session.create(
+                payment_method_types=['card'],
+                line_items=line_items,
+                mode='payment',
+                success_url=url_for('orders.checkout_success', _external=True) + '?session_id={CHECKOUT_SESSION_ID}',
+                cancel_url=url_for('orders.checkout_cancel', _external=True),
+            )
+        return jsonify({'sessionId': checkout_session.id})
+    except stripe.error.StripeError as e:
+        # Clear delivery details from session if Stripe checkout creation fails
+        session.pop('checkout_delivery_details', None)
+        flash(f"Помилка при створенні сесії оплати: {e}", "danger")
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/checkout/success')
+def checkout_success():
+    """
+    Handles successful Stripe payment. Clears the user's cart in the database and session.
+    Also, *decreases product stock* by ordered quantities and creates an order record,
+    including delivery details from the session.
+    """
+    user_id = session.get('user_id')
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    cart = session.get('cart', [])
+    total_amount = sum(item['price'] * item['quantity'] for item in cart)
+
+    # Delivery details were stored by create_checkout_session
+    delivery_details = session.get('checkout_delivery_details', {})
+    recipient_name = delivery_details.get('recipient_name')
+    delivery_address = delivery_details.get('delivery_address')
+    phone_number_at_purchase = delivery_details.get('phone_number')
+
+    with write_transaction(db):
+        try:
+            # 1. Create a new order
+            cursor.execute(
+                "INSERT INTO orders (user_id, total_amount, status, recipient_name, delivery_address, phone_number_at_purchase) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, total_amount, 'Очікується', recipient_name, delivery_address, phone_number_at_purchase)
+            )
+            order_id = cursor.lastrowid # Get the ID of the newly created order
+
+            # 2. Add items to order_items and decrease product stock
+            for item in cart:
+                flower_id = item['id']
+                ordered_quantity = item['quantity']
+                price_at_purchase = item['price'] # Record price at the time of purchase
+
+                cursor.execute(
+                    "INSERT INTO order_items (order_id, flower_id, quantity, price_at_purchase) VALUES (?, ?, ?, ?)",
+                    (order_id, flower_id, ordered_quantity, price_at_purchase)
+                )
+
+                # Decrease stock for the product (read inside the transaction)
+                current_flower = get_flower_by_id(flower_id, db)
+                if current_flower:
+                    new_stock = current_flower['stock'] - ordered_quantity
+                    if new_stock < 0: # Should not happen due to prior validation, but as a safeguard
+                        new_stock = 0
+                    cursor.execute("UPDATE products SET stock = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP "
+                                   "WHERE id = ?", (new_stock, flower_id))
+                    log.debug("Product %s stock updated from %s to %s", flower_id, current_flower['stock'], new_stock)
+                else:
+                    log.warning("Product %s not found when trying to update stock.", flower_id)
+
+            # 3. Clear user's cart after successful payment and order creation
+            cursor.execute("DELETE FROM cart_items WHERE user_id = ?", (user_id,))
+
+        except Exception as e:
+            db.rollback() # Rollback any changes if an error occurs
+            flash(f"Помилка при обробці замовлення: {e}", "danger")
+            log.exception("Error processing order after Stripe success")
+            return redirect(url_for('cart.view_cart'))
+
+    session.pop('cart', None) # Clear cart from session
+    session.pop('checkout_delivery_details', None)
+
+    flash("Оплата успішна! Дякуємо за замовлення. Ваше замовлення очікує підтвердження.", "success")
+    return redirect(url_for('orders.orders_history')) # Redirect to order history
+
+
+@bp.route('/checkout/cancel')
+def checkout_cancel():
+    """Handles Stripe payment cancellation. Also clears delivery details from session."""
+    session.pop('checkout_delivery_details', None) # Clear delivery details
+    flash("Оплата скасована, ви повернулися до кошика.", "warning")
+    return redirect(url_for('cart.view_cart'))
+
+
+@bp.route('/orders_history')
+def orders_history():
+    """
+    Displays the current user's order history.
+    Requires user to be logged in.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть, щоб переглянути історію замовлень.', 'info')
+        return redirect(url_for('auth.login'))
+
+    return render_template('orders_history.html', orders=load_user_orders(user_id))
+
+
+def load_user_orders(user_id):
+    """The user's orders with their items, newest first; created_at is converted to Kyiv time."""
+    db = get_read_connection()
+    cursor = db.cursor()
+
+    # Fetch all orders for the current user
+    orders_data = cursor.execute(
+        "SELECT id, total_amount, status, created_at FROM orders WHERE user_id = ? ORDER BY created_at DESC",
+        (user_id,)
+    ).fetchall()
+
+    orders = []
+    kyiv_offset = datetime.timedelta(hours=3)
+
+    for order_row in orders_data:
+        order_id = order_row['id']
+        # Fetch items for each order
+        order_items_data = cursor.execute(
+            """
+            SELECT oi.quantity, oi.price_at_purchase, p.name, p.image_url
+            FROM order_items oi
+            JOIN products p ON oi.flower_id = p.id
+            WHERE oi.order_id = ?
+            """,
+            (order_id,)
+        ).fetchall()
+
+        items = []
+        for item_row in order_items_data:
+            items.append({
+                'name': item_row['name'],
+                'quantity': item_row['quantity'],
+                'price_at_purchase': item_row['price_at_purchase'],
+                'image_url': item_row['image_url']
+            })
+
+        # Format created_at to Kyiv time
+        try:
+            utc_dt = datetime.datetime.strptime(order_row['created_at'], "%Y-%m-%d %H:%M:%S")
+            kyiv_dt = utc_dt + kyiv_offset
+            formatted_time = kyiv_dt.strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            formatted_time = order_row['created_at'] # Fallback
+
+        orders.append({
+            'id': order_row['id'],
+            'total_amount': order_row['total_amount'],
+            'status': order_row['status'],
+            'created_at': formatted_time,
+            'items': items
+        })
+    return orders
+
+# --- TEST ROUTE FOR MANUAL ORDER CREATION (FOR DEVELOPMENT ONLY) ---
+@bp.route('/create_test_order', methods=['GET'])
+def create_test_order():
+    """
+    [DEVELOPMENT ONLY]
+    Creates a test order for the current logged-in user with items from their cart.
+    Bypasses Stripe payment. Decreases product stock.
+    This route should be REMOVED or PROTECTED in a production environment.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        flash('Будь ласка, увійдіть як користувач, щоб створити тестове замовлення.', 'info')
+        return redirect(url_for('auth.login'))
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    # Get current user's cart
+    cart = load_user_cart_from_db(user_id)
+    if not cart:
+        flash('Ваш кошик порожній. Додайте товари, щоб створити тестове замовлення.', 'warning')
+        return redirect(url_for('catalog.home'))
+
+    total_amount = sum(item['price'] * item['quantity'] for item in cart)
+
+    # For test order, dummy delivery details
+    recipient_name = "Стасько Тарас"
+    delivery_address = "Шевченка вул. 1, місто Київ, 02000"
+    phone_number_at_purchase = "+380991234567"
+
+
+    with write_transaction(db):
+        try:
+            # 1. Create a new order with 'Очікується' status and delivery details
+            cursor.execute(
+                "INSERT INTO orders (user_id, total_amount, status, recipient_name, delivery_address, phone_number_at_purchase) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, total_amount, 'Очікується', recipient_name, delivery_address, phone_number_at_purchase)
+            )
+            order_id = cursor.lastrowid # Get the ID of the newly created order
+
+            # 2. Add items to order_items and decrease product stock
+            for item in cart:
+                flower_id = item['id']
+                ordered_quantity = item['quantity']
+                price_at_purchase = item['price']
+
+                # Check stock before creating the order (read inside the transaction)
+                current_flower = get_flower_by_id(flower_id, db)
+                if not current_flower or current_flower['stock'] < ordered_quantity:
+                    flash(f"Недостатньо товару '{item['name']}' для тестового замовлення. В наявності: {current_flower['stock'] if current_flower else 0}.", 'danger')
+                    db.rollback() # Rollback the order creation if stock is insufficient
+                    return redirect(url_for('cart.view_cart')) # Redirect back to cart or home
+
+                cursor.execute(
+                    "INSERT INTO order_items (order_id, flower_id, quantity, price_at_purchase) VALUES (?, ?, ?, ?)",
+                    (order_id, flower_id, ordered_quantity, price_at_purchase)
+                )
+
+                # Decrease stock
+                new_stock = current_flower['stock'] - ordered_quantity
+                cursor.execute("UPDATE products SET stock = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP "
+                               "WHERE id = ?", (new_stock, flower_id))
+                log.debug("Test Order: Product %s stock updated from %s to %s", flower_id, current_flower['stock'], new_stock)
+
+            # 3. Clear user's cart
+            cursor.execute("DELETE FROM cart_items WHERE user_id = ?", (user_id,))
+
+        except Exception as e:
+            db.rollback()
+            flash(f"Помилка при створенні тестового замовлення: {e}", "danger")
+            log.exception("Error creating test order")
+            return redirect(url_for('catalog.home'))
+
+    session.pop('cart', None) # Clear cart from session
+
+    flash(f"Тестове замовлення №{order_id} успішно створено!.", "success")
+    return redirect(url_for('orders.orders_history'))
+
+# --- END TEST ROUTE ---
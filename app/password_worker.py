@@ -0,0 +1,19 @@
+"""
+The code the password hasher's worker processes run (see passwords.py).
+
+The workers are started by a forkserver, a single-threaded process that imports this module
+once and forks a worker for each pool slot, so they are never forked from a request-serving
+process whose other threads may hold locks. As under spawn, the parent's __main__ script is
+imported (as __mp_main__) in the forkserver: a script using the hasher needs the usual
+"if __name__ == '__main__':" guard, which gunicorn, flask, uvicorn and 'python -m app' have.
+"""
+import os
+
+# What the pool runs: imported here so the forkserver has it loaded before forking the workers
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+def lower_priority(nice):
+    """Pool initializer: lowers the worker's CPU priority by 'nice'."""
+    if nice and hasattr(os, 'nice'):  # Unix only; on Windows the workers keep the normal priority
+        os.nice(nice)
@@ -0,0 +1,139 @@
+"""
+Password hashing off the request threads.
+
+A scrypt hash costs tens of milliseconds of CPU by design. Run on a request thread, a
+burst of login attempts (credential stuffing) keeps every worker busy hashing while
+shoppers wait for the catalog. PasswordHasher runs hashing in a small pool of separate
+processes instead:
+
+- the pool has 'max_workers' processes (PASSWORD_WORKERS) at a lowered CPU priority
+  (PASSWORD_WORKER_NICE), so page rendering always gets the CPU first; they are started
+  by a forkserver (see password_worker.py), never forked from a multi-threaded worker;
+- at most 'max_pending' hashes are queued or running (PASSWORD_QUEUE_SIZE); beyond that
+  HasherBusyError is raised and the request is answered with 503 instead of queueing;
+- a request thread waiting for its hash holds no CPU and no GIL, and waits at most 'timeout'
+  seconds (PASSWORD_TIMEOUT) before it is answered with 503 as well;
+- a pool whose worker died (OOM killer, a crash) is replaced and the hash retried once.
+
+Hashes are created with PASSWORD_HASH_METHOD. needs_rehash() tells whether a stored hash
+was made with other parameters (older werkzeug defaults, a changed setting), in which case
+login replaces it with a fresh hash of the password it has just verified.
+"""
+import atexit
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from . import password_worker
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'  # werkzeug's scrypt default (N=2**15, r=8, p=1), spelled out
+
+
+class HasherBusyError(Exception):
+    """Raised when PASSWORD_QUEUE_SIZE hashes are already queued or running, or the pool does not answer in time."""
+
+
+def needs_rehash(password_hash, method=DEFAULT_METHOD):
+    """True if 'password_hash' was not created with 'method' ('scrypt:32768:8:1$salt$hash')."""
+    return not hmac.compare_digest(password_hash.split('$', 1)[0], method)
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for generate_password_hash / check_password_hash.
+    With max_workers=0 hashing runs on the calling thread (tests, single-user tools).
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, max_workers=1, max_pending=8, nice=10, timeout=10):
+        self.method = method
+        self.pid = os.getpid()
+        self.max_workers = max_workers
+        self.nice = nice
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = self._create_executor() if max_workers else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_worker_context(),
+                                   initializer=password_worker.lower_priority, initargs=(self.nice,))
+
+    def _replace_broken(self, executor):
+        """Swaps a pool whose worker died for a new one; threads that saw it break at once replace it once."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = self._create_executor()
+        executor.shutdown(wait=False)
+
+    def _submit(self, function, *args):
+        executor = self._executor
+        try:
+            return executor.submit(function, *args).result(self.timeout)
+        except BrokenProcessPool:
+            self._replace_broken(executor)
+            raise
+
+    def _run(self, function, *args):
+        if self._executor is None:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError(f"{function.__name__}: hashing queue is full")
+        try:
+            try:
+                return self._submit(function, *args)
+            except BrokenProcessPool:
+                return self._submit(function, *args)  # Once, in the new pool
+        except BrokenProcessPool:
+            raise HasherBusyError(f"{function.__name__}: hashing worker died twice")
+        except FutureTimeoutError:
+            # The hash is left to finish in the pool; its slot is freed for the next request
+            raise HasherBusyError(f"{function.__name__}: no result in {self.timeout} s")
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return needs_rehash(password_hash, self.method)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+def _worker_context():
+    """
+    forkserver where available (Unix), preloading password_worker besides __main__; spawn
+    elsewhere. A plain fork would copy the locks held by the request threads into the worker.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['__main__', password_worker.__name__])
+    return context
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher(method=DEFAULT_METHOD, max_workers=1, max_pending=8, nice=10, timeout=10):
+    """
+    Returns the password hasher of the current process, creating it on first use.
+    It is recreated after fork, so each worker process owns its own pool.
+    """
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None or _hasher.pid != os.getpid():
+            _hasher = PasswordHasher(method, max_workers, max_pending, nice, timeout)
+            atexit.register(_hasher.shutdown)
+    return _hasher
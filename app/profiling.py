@@ -0,0 +1,154 @@
+"""
+On-demand profiling of single requests, for administrators.
+
+A request of a logged-in administrator runs under cProfile when it has an 'X-Profile' header
+or a 'profile=1' query parameter, or while profiling is switched on for their session (the
+button on the admin dashboard; for pages reached by redirects, such as checkout_success after
+Stripe). The profile covers the app's hooks, the view and, for streamed pages, the streaming;
+the response names it in its X-Profile header.
+
+Profiles are pstats files in PROFILE_DIR, of which the newest PROFILE_MAX_FILES are kept.
+The admin dashboard lists them; each one can be read sorted by cumulative or own time, or
+downloaded for snakeviz, 'python -m pstats' or a conversion to speedscope.
+
+Static files and requests without a session cookie pass without the session being read; other
+requests cost a few dictionary lookups. One request per process is profiled at a time, but
+not alone: since Python 3.12 (the Pipfile targets 3.13) cProfile is built on sys.monitoring,
+which covers every thread, so the profile also takes in whatever the process's other threads
+(gthread requests, the ASGI event loop and executors) ran meanwhile. Profile on a quiet
+worker for a clean picture.
+"""
+import cProfile
+import datetime
+import io
+import os
+import pstats
+import re
+import threading
+
+from flask import (Blueprint, abort, current_app, flash, g, redirect, render_template, request, send_file, session,
+                   url_for)
+
+bp = Blueprint('profiling', __name__)
+
+_profiling = threading.Lock()  # Held while a request of this process is profiled
+
+PROFILE_NAME = re.compile(r'^(?P<at>\d{8}-\d{6}-\d{6})-(?P<endpoint>[\w.]+)-(?P<pid>\d+)\.prof$')
+
+
+def list_profiles(directory, limit=None):
+    """The profiles in 'directory', newest first, as dicts with name, time, endpoint and size."""
+    profiles = []
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            match = PROFILE_NAME.match(entry.name)
+            if match:
+                profiles.append({
+                    'name': entry.name,
+                    'at': datetime.datetime.strptime(match['at'], '%Y%m%d-%H%M%S-%f').strftime('%Y-%m-%d %H:%M:%S'),
+                    'endpoint': match['endpoint'],
+                    'size': entry.stat().st_size,
+                })
+    profiles.sort(key=lambda profile: profile['name'], reverse=True)
+    return profiles[:limit]
+
+
+def _enforce_cap(directory, max_files):
+    for profile in list_profiles(directory)[max_files:]:
+        try:
+            os.remove(os.path.join(directory, profile['name']))
+        except FileNotFoundError:
+            pass  # Removed by another worker
+
+
+def _profiling_requested():
+    """
+    Whether an administrator asked to profile this request. Static files and requests without
+    a session cookie are answered without reading the session, which would add 'Vary: Cookie'
+    to responses that shared caches keep for everyone.
+    """
+    if request.endpoint == 'static' or current_app.config['SESSION_COOKIE_NAME'] not in request.cookies:
+        return False
+    flagged = 'X-Profile' in request.headers or request.args.get('profile') == '1'
+    return bool((flagged or session.get('profile_requests')) and session.get('is_admin'))
+
+
+@bp.before_app_request
+def start_profiling():
+    """Runs first (the blueprint is registered before the others, see create_app)."""
+    if not _profiling_requested():
+        return
+    if not _profiling.acquire(blocking=False):
+        g.profile_name = None  # Another request is being profiled; answered unprofiled
+        return
+    now = datetime.datetime.now()
+    g.profile_name = f"{now:%Y%m%d-%H%M%S-%f}-{request.endpoint or 'unmatched'}-{os.getpid()}.prof"
+    g.profiler = cProfile.Profile()
+    g.profiler.enable()
+
+
+@bp.after_app_request
+def name_profile(response):
+    if 'profile_name' in g:
+        response.headers['X-Profile'] = g.profile_name or 'busy'
+    return response
+
+
+@bp.teardown_app_request
+def save_profile(exception=None):
+    """Stops the profiler once the request is over (after a streamed body) and stores the profile."""
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        directory = current_app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        profiler.dump_stats(os.path.join(directory, g.profile_name))
+        _enforce_cap(directory, current_app.config['PROFILE_MAX_FILES'])
+    finally:
+        _profiling.release()
+
+
+def _profile_path(name):
+    if not PROFILE_NAME.match(name):
+        abort(404)
+    path = os.path.join(current_app.config['PROFILE_DIR'], name)
+    if not os.path.exists(path):
+        abort(404)
+    return path
+
+
+@bp.route('/admin/profiles/<name>')
+def view_profile(name):
+    """A stored profile as pstats text, sorted by ?sort=cumulative (default) or tottime."""
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори мають доступ до адмін-панелі.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime'):
+        sort = 'cumulative'
+    output = io.StringIO()
+    stats = pstats.Stats(_profile_path(name), stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(60)
+    return render_template('admin_profile.html', name=name, sort=sort, report=output.getvalue())
+
+
+@bp.route('/admin/profiles/<name>/download')
+def download_profile(name):
+    if not session.get('is_admin'):
+        abort(403)
+    return send_file(_profile_path(name), mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
+
+@bp.route('/admin/profiling/toggle', methods=['POST'])
+def toggle_profiling():
+    """Profiles every request of this administrator's session until switched off again."""
+    if not session.get('is_admin'):
+        flash('Доступ заборонено. Тільки адміністратори мають доступ до адмін-панелі.', 'danger')
+        return redirect(url_for('auth.login'))
+
+    session['profile_requests'] = not session.get('profile_requests', False)
+    flash(f"Профілювання запитів: {'увімкнено' if session['profile_requests'] else 'вимкнено'}.", 'info')
+    return redirect(url_for('admin.admin_dashboard'))
@@ -0,0 +1,231 @@
+"""
+Query-plan auditor.
+
+Collects the SQL statements passed to execute()/executemany() in every app module, seeds a
+throwaway database with a large synthetic dataset and runs EXPLAIN QUERY PLAN on each. A full
+table SCAN or a temporary B-tree for ORDER BY fails the audit unless listed in ALLOWED_SCANS.
+
+Usage:
+    python -m app.query_audit                 # seed a temporary database and audit
+    python -m app.query_audit --rows 100000   # bigger dataset
+    python -m app.query_audit --database database.db --all
+"""
+import argparse
+import ast
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from collections import namedtuple
+
+from flask import Flask
+
+from .db import init_db
+from .ratelimit import create_bucket_table
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules whose SQL statements are audited (relative to the app directory): all of them, so a
+# new module cannot be forgotten; this one only holds the seeding statements.
+SOURCE_FILES = tuple(sorted(name for name in os.listdir(APP_DIR)
+                            if name.endswith('.py') and name != os.path.basename(__file__)))
+
+# Statements that are allowed to scan a table, keyed by (function name, table or alias
+# as it appears in the plan). Every entry needs a reason.
+ALLOWED_SCANS = {
+    ('load_products_from_db', 'products'): 'catalog page lists (and filters in Python) every product',
+    ('init_db', 'products'): 'runs once at startup to decide whether to seed the catalog',
+    ('load_stock_levels', 'products'): 'each ASGI worker reads every stock level once, then follows stock_changes',
+    ('iter_admin_orders', 'o'): 'admin page and CSV export list every order, walked in created_at order via index',
+    ('backfill_image_info', 'products'): 'one-off command that fills in the image info of every product missing it',
+}
+
+# Statement kinds that are not worth explaining (schema changes, pragmas).
+SKIPPED_PREFIXES = ('CREATE', 'DROP', 'ALTER', 'PRAGMA', 'ANALYZE', 'VACUUM', 'BEGIN', 'COMMIT', 'ROLLBACK',
+                    'SAVEPOINT', 'RELEASE')
+
+Statement = namedtuple('Statement', 'source lineno function route sql')
+AuditResult = namedtuple('AuditResult', 'statement plan problems')
+
+
+def _route_of(function_node):
+    """Returns the URL rule of an @app.route(...) decorated function, or None."""
+    for decorator in function_node.decorator_list:
+        if (isinstance(decorator, ast.Call)
+                and isinstance(decorator.func, ast.Attribute)
+                and decorator.func.attr == 'route'
+                and decorator.args
+                and isinstance(decorator.args[0], ast.Constant)):
+            return decorator.args[0].value
+    return None
+
+
+def collect_statements(source_files=SOURCE_FILES, base_dir=APP_DIR):
+    """
+    Parses the given source files and returns a Statement for every string literal
+    passed as the first argument to .execute() or .executemany().
+    """
+    statements = []
+    for source in source_files:
+        path = os.path.join(base_dir, source)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+
+        # Statements in nested functions (e.g. operations passed to run_write) are
+        # attributed to the enclosing module-level function (or method) and its route.
+        functions = []
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                functions.extend(node.body)
+            else:
+                functions.append(node)
+        for function in functions:
+            if not isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            route = _route_of(function)
+            for node in ast.walk(function):
+                if (isinstance(node, ast.Call)
+                        and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in ('execute', 'executemany')
+                        and node.args
+                        and isinstance(node.args[0], ast.Constant)
+                        and isinstance(node.args[0].value, str)):
+                    sql = ' '.join(node.args[0].value.split())  # Collapse whitespace for the report
+                    if sql.upper().startswith(SKIPPED_PREFIXES):
+                        continue
+                    statements.append(Statement(source, node.lineno, function.name, route, sql))
+
+    statements.sort(key=lambda s: (s.source, s.lineno))
+    return statements
+
+
+def seed_database(path, rows=20000):
+    """
+    Creates the application schema (including indexes) in 'path' via init_db(), plus the
+    rate limiter's table, and fills it with a synthetic dataset sized by 'rows' orders.
+    """
+    flask_app = Flask(__name__)
+    flask_app.config['DATABASE'] = path
+    with flask_app.app_context():
+        init_db()
+
+    rng = random.Random(42)  # Deterministic data gives deterministic plans
+    users = max(rows // 10, 10)
+    products = max(rows // 40, 20)
+
+    conn = sqlite3.connect(path)
+    create_bucket_table(conn)
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO users (username, password_hash, role, phone_number) VALUES (?, ?, 'user', ?)",
+                       ((f"user{i}", 'x', '+380000000000') for i in range(users)))
+    cursor.executemany("INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, NULL, ?)",
+                       ((f"Flower {i}", 'Synthetic product', rng.uniform(50, 500), rng.randint(0, 200))
+                        for i in range(products)))
+    cursor.executemany("INSERT INTO orders (user_id, total_amount, status, created_at) VALUES (?, ?, ?, ?)",
+                       ((rng.randint(1, users), rng.uniform(50, 5000), rng.choice(['Очікується', 'Підтверджено']),
+                         f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 12:00:00")
+                        for _ in range(rows)))
+    cursor.executemany("INSERT INTO order_items (order_id, flower_id, quantity, price_at_purchase) VALUES (?, ?, ?, ?)",
+                       ((rng.randint(1, rows), rng.randint(1, products), rng.randint(1, 5), rng.uniform(50, 500))
+                        for _ in range(rows * 3)))
+    cursor.executemany("INSERT INTO reviews (product_id, user_id, rating, comment) VALUES (?, ?, ?, '')",
+                       ((rng.randint(1, products), rng.randint(1, users), rng.randint(1, 5)) for _ in range(rows)))
+    pairs = {(rng.randint(1, users), rng.randint(1, products)) for _ in range(rows)}
+    cursor.executemany("INSERT OR IGNORE INTO cart_items (user_id, flower_id, quantity) VALUES (?, ?, 1)", pairs)
+    cursor.executemany("INSERT OR IGNORE INTO favorite_items (user_id, flower_id) VALUES (?, ?)", pairs)
+    conn.commit()
+    conn.execute("ANALYZE")  # Give the planner realistic statistics
+    conn.commit()
+    conn.close()
+
+
+def explain(conn, sql):
+    """Returns the EXPLAIN QUERY PLAN detail lines for 'sql', binding NULL to every placeholder."""
+    params = (None,) * sql.count('?')
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def check_plan(statement, plan):
+    """Returns a list of human-readable problems found in the plan of a statement."""
+    problems = []
+    for detail in plan:
+        if detail.startswith('SCAN '):
+            table = detail.split()[1]
+            if table != 'CONSTANT' and (statement.function, table) not in ALLOWED_SCANS:
+                problems.append(f"full table scan: {detail}")
+        elif detail.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in detail:
+            problems.append(f"sort without index: {detail}")
+    return problems
+
+
+def audit(conn, statements):
+    """Explains every statement and returns a list of AuditResult."""
+    results = []
+    for statement in statements:
+        try:
+            plan = explain(conn, statement.sql)
+            problems = check_plan(statement, plan)
+        except sqlite3.Error as e:
+            plan, problems = [], [f"cannot explain: {e}"]
+        results.append(AuditResult(statement, plan, problems))
+    return results
+
+
+def format_report(results, show_all=False):
+    """Formats audit results as a plain-text report grouped by route (or helper function)."""
+    groups = {}
+    for result in results:
+        statement = result.statement
+        key = f"{statement.route}  ({statement.function})" if statement.route else f"{statement.function}()"
+        groups.setdefault(key, []).append(result)
+
+    lines = []
+    for key in sorted(groups):
+        group = groups[key]
+        if not show_all and not any(r.problems for r in group):
+            continue
+        lines.append(key)
+        for result in group:
+            statement = result.statement
+            status = 'FAIL' if result.problems else 'ok'
+            lines.append(f"  [{status}] {statement.source}:{statement.lineno}  {statement.sql}")
+            for detail in result.plan:
+                lines.append(f"         | {detail}")
+            for problem in result.problems:
+                lines.append(f"         ! {problem}")
+        lines.append('')
+
+    failed = sum(1 for r in results if r.problems)
+    lines.append(f"{len(results)} statements audited, {failed} with problems.")
+    return '\n'.join(lines)
+
+
+def run_audit(database=None, rows=20000):
+    """Seeds a temporary database (unless 'database' is given) and audits every statement."""
+    statements = collect_statements()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if database is None:
+            database = os.path.join(tmp_dir, 'audit.db')
+            seed_database(database, rows)
+        conn = sqlite3.connect(database)
+        try:
+            return audit(conn, statements)
+        finally:
+            conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Audit EXPLAIN QUERY PLAN output for every SQL statement in the app.")
+    parser.add_argument('--database', help="Audit an existing database instead of seeding a temporary one.")
+    parser.add_argument('--rows', type=int, default=20000, help="Number of synthetic orders to seed (default: 20000).")
+    parser.add_argument('--all', action='store_true', help="Show passing statements as well.")
+    args = parser.parse_args(argv)
+
+    results = run_audit(args.database, args.rows)
+    print(format_report(results, show_all=args.all))
+    return 1 if any(r.problems for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Token-bucket rate limiting per client for write and search endpoints.
+
+Each limited endpoint has a budget 'capacity/period' (RATE_LIMITS, e.g. 'catalog.add_review=5/60'):
+a bucket holds up to 'capacity' tokens and refills at capacity/period tokens per second,
+so a client may burst 'capacity' requests and then sustain one every period/capacity
+seconds. Every request takes a token from the bucket of its IP address and, when logged
+in, from the bucket of its user; a request that finds either bucket empty is answered
+with 429 and Retry-After (see enforce_rate_limit() in web.py).
+
+A bucket is two numbers (tokens, time of the last update); taking a token refills it for
+the elapsed time first, so there is no background timer. Buckets live in:
+
+- MemoryBucketStore: a dict per worker process, O(1) per request. With several worker
+  processes each one has its own budget, i.e. a client gets up to 'workers' times as much.
+- SqliteBucketStore: a table in a separate SQLite file (RATE_LIMIT_DATABASE) shared by
+  all workers on the host. Each request adds one small write transaction on that file,
+  which never contends with the shop's own database.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+log = logging.getLogger(__name__)
+
+Limit = namedtuple('Limit', 'capacity period')
+
+
+def parse_limits(spec):
+    """'search=30/60,add_review=5/60' -> {'search': Limit(30, 60.0), 'add_review': Limit(5, 60.0)}"""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, budget = entry.partition('=')
+        capacity, _, period = budget.partition('/')
+        try:
+            limits[name.strip()] = Limit(int(capacity), float(period))
+        except ValueError:
+            raise ValueError(f"rate limit {entry!r} is not 'endpoint=requests/seconds'") from None
+    return limits
+
+
+def _refill(tokens, updated_at, capacity, rate, now):
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryBucketStore:
+    """Buckets in a dict of this process; the least recently used beyond 'max_keys' are dropped."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Takes one token from the bucket 'key'; returns 0, or the seconds until a token is available."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)  # A forgotten bucket comes back full
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = _refill(bucket[0], bucket[1], capacity, rate, now)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+
+def create_bucket_table(db):
+    db.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+               "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL) WITHOUT ROWID")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated ON rate_limit_buckets (updated_at)")
+
+
+def load_bucket(db, key):
+    return db.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+
+
+def store_bucket(db, key, tokens, updated_at):
+    db.execute("INSERT INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+               "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+               (key, tokens, updated_at))
+
+
+def prune_buckets(db, full_before):
+    """Drops buckets untouched since 'full_before' (refilled to capacity by now, same as no row)."""
+    return db.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (full_before,)).rowcount
+
+
+class SqliteBucketStore:
+    """
+    Buckets in a SQLite file shared by the worker processes. Every thread has its own
+    connection; commits are not fsynced (losing the latest bucket updates in a crash is harmless).
+    """
+
+    def __init__(self, path, busy_timeout=1.0, prune_every=10000):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._takes = 0
+        self._max_period = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():  # Not the parent's connection after fork
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            create_bucket_table(conn)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            # Better to let a request through than to fail it because of the limiter
+            log.warning("Rate limit store unavailable, request not limited: %s", e)
+            return 0
+        try:
+            row = load_bucket(conn, key)
+            tokens = capacity if row is None else _refill(row[0], row[1], capacity, rate, now)
+            granted = tokens >= 1
+            store_bucket(conn, key, tokens - 1 if granted else tokens, now)
+            self._takes += 1
+            self._max_period = max(self._max_period, capacity / rate)
+            if self._takes % self.prune_every == 0:
+                prune_buckets(conn, now - self._max_period)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return 0 if granted else (1 - tokens) / rate
+
+
+class RateLimiter:
+    """The budgets of the limited endpoints ({name: Limit}) applied to a bucket store."""
+
+    def __init__(self, limits, store):
+        self.limits = limits
+        self.store = store
+
+    def check(self, name, keys, now=None):
+        """
+        Takes a token for each of 'keys' (e.g. the client's IP and user) from the budget
+        'name'. Returns 0 if the request may proceed, otherwise the seconds to wait.
+        Names without a budget are not limited. A refused request still uses up the
+        tokens it got from the other keys' buckets.
+        """
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0
+        now = time.time() if now is None else now
+        rate = limit.capacity / limit.period
+        return max(self.store.take(f"{name}:{key}", limit.capacity, rate, now) for key in keys)
+
+
+def create_rate_limiter(spec, database=''):
+    """RateLimiter for the RATE_LIMITS setting, shared through 'database' if it is set."""
+    store = SqliteBucketStore(database) if database else MemoryBucketStore()
+    return RateLimiter(parse_limits(spec), store)
@@ -0,0 +1,62 @@
+// Keeps the admin order list up to date (see admin.admin_order_changes): asks for the orders
+// created or with a changed status since the last change it has, replaces their cards and
+// puts new orders on top. Polling pauses while the tab is hidden.
+(function () {
+    const list = document.getElementById('admin-orders');
+    const url = list.dataset.url;
+    const interval = Number(list.dataset.interval) * 1000;
+    let lastChange = list.dataset.lastChange;
+    let timer = null;
+    let polling = false;
+
+    function applyOrder(order) {
+        const template = document.createElement('template');
+        template.innerHTML = order.html.trim();
+        const card = template.content.firstElementChild;
+        const current = list.querySelector(`[data-order-id="${order.id}"]`);
+        if (current) {
+            current.replaceWith(card);
+        } else {
+            list.querySelector('[data-no-orders]')?.remove();
+            list.prepend(card);
+        }
+    }
+
+    async function poll() {
+        timer = null;
+        polling = true;
+        let more = false;
+        try {
+            const response = await fetch(`${url}?after=${lastChange}`, {headers: {'Accept': 'application/json'}});
+            if (response.status === 403) {
+                return; // Logged out: stop asking (polling stays set)
+            }
+            if (response.ok) {
+                const changes = await response.json();
+                changes.orders.forEach(applyOrder);
+                lastChange = changes.last_change;
+                more = changes.more;
+            }
+        } catch (error) {
+            // Network error: try again on the next tick
+        }
+        polling = false;
+        schedule(more ? 0 : interval);
+    }
+
+    function schedule(delay) {
+        if (timer === null && !polling && !document.hidden) {
+            timer = setTimeout(poll, delay);
+        }
+    }
+
+    document.addEventListener('visibilitychange', function () {
+        if (document.hidden) {
+            clearTimeout(timer);
+            timer = null;
+        } else {
+            schedule(0);
+        }
+    });
+    schedule(interval);
+})();
@@ -0,0 +1,40 @@
+// Live stock levels (see app/stock_feed.py). Subscribes to the products shown on the page
+// and updates their "В наявності" counters and add-to-cart forms as orders come in.
+(function () {
+    const url = document.currentScript.dataset.url;
+
+    function applyStock(productId, stock) {
+        document.querySelectorAll(`[data-stock-level="${productId}"]`).forEach(element => {
+            element.textContent = stock;
+        });
+        document.querySelectorAll(`[data-stock-form="${productId}"]`).forEach(form => {
+            const soldOut = stock <= 0;
+            const quantity = form.querySelector('input[name="quantity"]');
+            const button = form.querySelector('button[type="submit"]');
+            quantity.max = stock;
+            quantity.disabled = soldOut;
+            button.disabled = soldOut;
+            if (!soldOut && Number(quantity.value) > stock) {
+                quantity.value = stock;
+            }
+            button.querySelector('[data-in-stock]').hidden = soldOut;
+            button.querySelector('[data-sold-out]').hidden = !soldOut;
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const ids = new Set();
+        document.querySelectorAll('[data-stock-level], [data-stock-form]').forEach(element => {
+            ids.add(element.dataset.stockLevel || element.dataset.stockForm);
+        });
+        if (!ids.size || !window.EventSource) {
+            return;
+        }
+        // EventSource reconnects by itself; every (re)connect starts with the current levels
+        const source = new EventSource(`${url}?ids=${Array.from(ids).join(',')}`);
+        source.addEventListener('stock', event => {
+            const levels = JSON.parse(event.data);
+            Object.entries(levels).forEach(([productId, stock]) => applyStock(productId, stock));
+        });
+    });
+})();
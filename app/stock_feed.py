@@ -0,0 +1,152 @@
+"""
+Live stock levels for the catalog and product pages.
+
+Triggers on products (see init_db) append the new level of every changed product to
+stock_changes, whichever write path changed it: checkout, the admin editor, test orders.
+Each ASGI worker runs one StockNotifier. Every STOCK_FEED_INTERVAL seconds it reads the rows
+added since its last read, one range query on the primary key however many pages are open,
+keeps the last level of each product and hands it to the subscriptions showing that product.
+A burst of orders within an interval becomes one update, and a subscription that is not read
+in time keeps only the latest level of each product, never a backlog.
+
+The pages receive the levels as Server-Sent Events from /stock/stream?ids=1,2,3, served by
+app/asgi.py: an open connection there costs a coroutine, not a thread.
+"""
+import asyncio
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def load_stock_levels(db):
+    """
+    The last stock_changes seq and the stock of every product. The seq is read first: a
+    change committed in between is read again by the next poll, which is harmless because
+    rows hold levels, not deltas.
+    """
+    last_seq = db.execute("SELECT COALESCE(MAX(seq), 0) FROM stock_changes").fetchone()[0]
+    return last_seq, dict(db.execute("SELECT id, stock FROM products").fetchall())
+
+
+def load_stock_changes(after_seq, db):
+    return db.execute("SELECT seq, product_id, stock FROM stock_changes WHERE seq > ? ORDER BY seq",
+                      (after_seq,)).fetchall()
+
+
+def parse_product_ids(value, limit):
+    """Product ids from a 'ids=1,2,3' query parameter: at most 'limit', invalid ones dropped."""
+    ids = []
+    for part in (value or '').split(','):
+        if part.strip().isdigit() and int(part) not in ids:
+            ids.append(int(part))
+    return ids[:limit]
+
+
+def format_event(levels):
+    """An SSE 'stock' event with {product id: stock}."""
+    return f"event: stock\ndata: {json.dumps({str(product_id): stock for product_id, stock in levels.items()})}\n\n"
+
+
+class Subscription:
+    """The stock levels waiting to be sent to one page, and an event set when there are some."""
+
+    def __init__(self, product_ids):
+        self.product_ids = frozenset(product_ids)
+        self.pending = {}
+        self._ready = asyncio.Event()
+
+    def push(self, levels):
+        self.pending.update(levels)
+        self._ready.set()
+
+    async def next(self, timeout):
+        """Waits up to 'timeout' seconds and returns the pending levels ({} when none came)."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._ready.clear()
+        levels, self.pending = self.pending, {}
+        return levels
+
+
+class StockNotifier:
+    """
+    Follows stock_changes for one worker process and fans the levels out to subscriptions.
+    'reads' runs the queries off the event loop (see asgi.ReadExecutor).
+    """
+
+    def __init__(self, reads, interval=0.5):
+        self.reads = reads
+        self.interval = interval
+        self.levels = {}
+        self._last_seq = 0
+        self._subscriptions = {}  # product id -> set of subscriptions showing it
+        self._task = None
+
+    async def start(self):
+        self._last_seq, self.levels = await self.reads.run(load_stock_levels)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, product_ids):
+        """A subscription for 'product_ids', holding their current levels to send first."""
+        subscription = Subscription(product_ids)
+        for product_id in subscription.product_ids:
+            self._subscriptions.setdefault(product_id, set()).add(subscription)
+        subscription.push({product_id: self.levels.get(product_id, 0) for product_id in subscription.product_ids})
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for product_id in subscription.product_ids:
+            subscribers = self._subscriptions.get(product_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[product_id]
+
+    @property
+    def subscription_count(self):
+        return len({subscription for subscribers in self._subscriptions.values() for subscription in subscribers})
+
+    async def poll(self):
+        """Reads the changes since the last poll and pushes them; returns the number of products changed."""
+        rows = await self.reads.run(load_stock_changes, self._last_seq)
+        if not rows:
+            return 0
+        if rows[0][0] > self._last_seq + 1:
+            # Rows this worker never saw were pruned (see STOCK_CHANGES_KEPT): start over from the products
+            self._last_seq, levels = await self.reads.run(load_stock_levels)
+            changed = {product_id: stock for product_id, stock in levels.items() if self.levels.get(product_id) != stock}
+            changed.update({product_id: 0 for product_id in self.levels.keys() - levels.keys()})
+        else:
+            changed = {product_id: stock for _, product_id, stock in rows}  # The last level of each product wins
+            self._last_seq = rows[-1][0]
+        self.levels.update(changed)
+        self._publish(changed)
+        return len(changed)
+
+    def _publish(self, changed):
+        touched = {}
+        for product_id, stock in changed.items():
+            for subscription in self._subscriptions.get(product_id, ()):
+                touched.setdefault(subscription, {})[product_id] = stock
+        for subscription, levels in touched.items():
+            subscription.push(levels)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception:  # Keep following; the next poll retries from the same seq
+                log.exception("Stock feed poll failed")
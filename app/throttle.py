@@ -0,0 +1,119 @@
+"""
+Sliding-window throttle for failed logins.
+
+Each failed login is recorded under two keys, 'user:<username>' and 'ip:<address>'.
+A key with 'max_attempts' failures within the last 'window' seconds is blocked until
+the oldest of them leaves the window; a successful login clears its username key.
+
+Attempts live in two places:
+
+- in memory, per worker process: a deque of timestamps per key (LRU-bounded to
+  'max_keys'). A blocked key is answered from here, so an attacker hammering the login
+  form costs neither a database query nor a password hash;
+- in the login_attempts table, shared by all workers and kept across restarts. A key
+  that is not blocked in memory is re-read from the table (one indexed query), which
+  also picks up failures recorded by other workers.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def load_attempts(db, key, since, limit):
+    """Times of the latest 'limit' failures of 'key' after 'since', newest first."""
+    rows = db.execute("SELECT attempted_at FROM login_attempts WHERE key = ? AND attempted_at > ? "
+                      "ORDER BY attempted_at DESC LIMIT ?", (key, since, limit)).fetchall()
+    return [row[0] for row in rows]
+
+
+def store_attempt(db, key, attempted_at, expired_before):
+    """Records a failure of 'key' and drops its failures that are out of the window."""
+    db.execute("INSERT INTO login_attempts (key, attempted_at) VALUES (?, ?)", (key, attempted_at))
+    db.execute("DELETE FROM login_attempts WHERE key = ? AND attempted_at <= ?", (key, expired_before))
+
+
+def clear_attempts(db, key):
+    db.execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+
+
+def prune_attempts(db, expired_before):
+    """Drops every failure that is out of the window (keys that were never seen again)."""
+    return db.execute("DELETE FROM login_attempts WHERE attempted_at <= ?", (expired_before,)).rowcount
+
+
+class SlidingWindowThrottle:
+    """
+    At most 'max_attempts' recorded attempts per key within 'window' seconds.
+    Methods taking 'db' also read or write the login_attempts table; pass db=None to
+    use the in-memory store only.
+    """
+
+    def __init__(self, max_attempts, window, max_keys=10000, prune_every=1000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys = max_keys
+        self.prune_every = prune_every
+        self._attempts = OrderedDict()  # key -> deque of attempt times, oldest first
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        """The key's attempts within the window (expired ones are dropped); caller holds the lock."""
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return None
+        self._attempts.move_to_end(key)
+        return attempts
+
+    def _remember(self, key, attempts):
+        self._attempts[key] = attempts
+        self._attempts.move_to_end(key)
+        while len(self._attempts) > self.max_keys:
+            self._attempts.popitem(last=False)
+
+    def retry_after(self, key, db=None, now=None):
+        """Seconds until 'key' may try again, or 0 if it is not blocked."""
+        now = time.time() if now is None else now
+        with self._lock:
+            attempts = self._recent(key, now)
+            if attempts is not None and len(attempts) >= self.max_attempts:
+                return attempts[-self.max_attempts] + self.window - now
+        if db is None:
+            return 0
+
+        stored = load_attempts(db, key, now - self.window, self.max_attempts)
+        with self._lock:
+            if stored:
+                self._remember(key, deque(reversed(stored)))  # The table has every worker's attempts
+            else:
+                self._attempts.pop(key, None)
+        if len(stored) >= self.max_attempts:
+            return stored[-1] + self.window - now
+        return 0
+
+    def record(self, key, db=None, now=None):
+        """Records an attempt of 'key'."""
+        now = time.time() if now is None else now
+        with self._lock:
+            attempts = self._recent(key, now)
+            if attempts is None:
+                attempts = deque()
+                self._remember(key, attempts)
+            attempts.append(now)
+            self._recorded += 1
+            prune = self._recorded % self.prune_every == 0
+        if db is not None:
+            store_attempt(db, key, now, now - self.window)
+            if prune:
+                prune_attempts(db, now - self.window)
+
+    def reset(self, key, db=None):
+        with self._lock:
+            self._attempts.pop(key, None)
+        if db is not None:
+            clear_attempts(db, key)
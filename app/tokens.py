@@ -0,0 +1,203 @@
+"""
+Bearer tokens for the JSON API (/api/...).
+
+Access tokens are JWTs signed with HMAC-SHA256 (HS256), built with the standard library
+only. They carry the user id ('sub') and role, live JWT_ACCESS_TTL seconds and are
+verified without touching the users table: a signature check against a cached key, an
+expiry check and a lookup in the in-memory revocation set.
+
+- Keys: JWT_SECRET_KEYS is a comma-separated list of 'kid:secret' pairs; the first one
+  signs, all of them verify (rotate by prepending a new key and dropping the old one after
+  JWT_ACCESS_TTL). Without it a single key is derived from SECRET_KEY. KeyRing keeps a
+  ready HMAC object per key, so verifying a token does not re-derive the key pads.
+- Refresh tokens are random strings, stored as their SHA-256 in refresh_tokens. Each one
+  is used once: refreshing replaces it with a new one (rotation).
+- Revocation (logout): the token's 'jti' goes into revoked_tokens until the token would
+  have expired anyway. Every worker keeps those ids in a set and reads new rows (an
+  indexed id range) at most every JWT_REVOCATION_REFRESH seconds.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from functools import lru_cache
+
+ALGORITHM = 'HS256'
+
+
+class TokenError(Exception):
+    """The token is malformed, badly signed, expired or revoked."""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+def _b64decode(segment):
+    return base64.urlsafe_b64decode(segment + b'=' * (-len(segment) % 4))
+
+
+class KeyRing:
+    """HMAC keys by key id; 'current_kid' signs new tokens."""
+
+    def __init__(self, keys):
+        if not keys:
+            raise ValueError("at least one signing key is required")
+        self.current_kid = next(iter(keys))
+        self._macs = {kid: hmac.new(secret, digestmod=hashlib.sha256) for kid, secret in keys.items()}
+        self._headers = {kid: _b64encode(json.dumps({'alg': ALGORITHM, 'typ': 'JWT', 'kid': kid},
+                                                    separators=(',', ':')).encode())
+                         for kid in keys}
+
+    def header(self, kid):
+        return self._headers[kid]
+
+    def sign(self, kid, signing_input):
+        mac = self._macs.get(kid)
+        if mac is None:
+            raise TokenError(f"unknown key id {kid!r}")
+        mac = mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+
+@lru_cache(maxsize=8)
+def get_key_ring(secret_keys, fallback_secret):
+    """
+    KeyRing for the JWT_SECRET_KEYS setting ('kid:secret,...'), or a single key derived
+    from 'fallback_secret' (SECRET_KEY) when it is empty. Cached per setting value.
+    """
+    keys = {}
+    for entry in filter(None, (part.strip() for part in secret_keys.split(','))):
+        kid, _, secret = entry.partition(':')
+        if not secret:
+            raise ValueError(f"JWT_SECRET_KEYS entry {kid!r} has no secret")
+        keys[kid] = secret.encode()
+    if not keys:
+        keys['default'] = hmac.new(fallback_secret.encode(), b'flowerstream-api-tokens', hashlib.sha256).digest()
+    return KeyRing(keys)
+
+
+def encode(claims, key_ring):
+    """Signs 'claims' (a JSON-serializable dict) with the current key; returns the token string."""
+    kid = key_ring.current_kid
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    signing_input = key_ring.header(kid) + b'.' + payload
+    return (signing_input + b'.' + _b64encode(key_ring.sign(kid, signing_input))).decode('ascii')
+
+
+def decode(token, key_ring, now=None, leeway=0):
+    """Verifies the signature and the 'exp'/'nbf' claims of 'token'; returns its claims."""
+    try:
+        header_segment, payload_segment, signature_segment = token.encode('ascii').split(b'.')
+        header = json.loads(_b64decode(header_segment))
+        signature = _b64decode(signature_segment)
+    except (UnicodeError, ValueError, binascii.Error):
+        raise TokenError("malformed token") from None
+    if not isinstance(header, dict) or header.get('alg') != ALGORITHM:
+        raise TokenError("unsupported algorithm")
+    if not isinstance(header.get('kid'), str):  # A list or object would not even be a dict key
+        raise TokenError("missing or invalid key id")
+
+    expected = key_ring.sign(header['kid'], header_segment + b'.' + payload_segment)
+    if not hmac.compare_digest(signature, expected):
+        raise TokenError("bad signature")
+
+    try:
+        claims = json.loads(_b64decode(payload_segment))
+    except (ValueError, binascii.Error):
+        raise TokenError("malformed token") from None
+    now = time.time() if now is None else now
+    if not isinstance(claims, dict) or not isinstance(claims.get('exp'), (int, float)):
+        raise TokenError("token has no expiry")
+    if claims['exp'] <= now - leeway:
+        raise TokenError("token expired")
+    if claims.get('nbf', 0) > now + leeway:
+        raise TokenError("token not valid yet")
+    return claims
+
+
+def access_token_claims(user_id, role, ttl, now=None):
+    now = int(time.time() if now is None else now)
+    return {'sub': str(user_id), 'role': role, 'typ': 'access', 'iat': now, 'exp': now + ttl,
+            'jti': secrets.token_urlsafe(12)}
+
+
+def hash_refresh_token(token):
+    # Refresh tokens are 256 random bits, so a fast hash is enough (nothing to brute-force)
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def store_refresh_token(db, user_id, ttl, now=None):
+    """Creates a refresh token for 'user_id' and returns it; the user's expired ones are dropped."""
+    now = time.time() if now is None else now
+    token = secrets.token_urlsafe(32)
+    db.execute("DELETE FROM refresh_tokens WHERE user_id = ? AND expires_at <= ?", (user_id, now))
+    db.execute("INSERT INTO refresh_tokens (user_id, token_hash, expires_at) VALUES (?, ?, ?)",
+               (user_id, hash_refresh_token(token), now + ttl))
+    return token
+
+
+def consume_refresh_token(db, token, now=None):
+    """Deletes a valid refresh token and returns its user id, or None if it is unknown or expired."""
+    now = time.time() if now is None else now
+    row = db.execute("SELECT id, user_id, expires_at FROM refresh_tokens WHERE token_hash = ?",
+                     (hash_refresh_token(token),)).fetchone()
+    if row is None:
+        return None
+    db.execute("DELETE FROM refresh_tokens WHERE id = ?", (row[0],))
+    return row[1] if row[2] > now else None
+
+
+def load_revoked_tokens(db, after_id):
+    return db.execute("SELECT id, jti, expires_at FROM revoked_tokens WHERE id > ? ORDER BY id",
+                      (after_id,)).fetchall()
+
+
+def store_revoked_token(db, jti, expires_at, now=None):
+    now = time.time() if now is None else now
+    db.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+    db.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+
+
+class RevocationSet:
+    """
+    Ids of revoked access tokens that have not expired yet, mirrored from revoked_tokens.
+    refresh() reads only rows added since the last read; callers refresh when stale(), so
+    a revocation made in another worker takes effect here within 'refresh_interval' seconds.
+    """
+
+    def __init__(self, refresh_interval=5):
+        self.refresh_interval = refresh_interval
+        self._revoked = {}  # jti -> exp
+        self._last_id = 0
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+
+    def stale(self, now=None):
+        """True once 'refresh_interval' seconds have passed since the last refresh()."""
+        return (time.time() if now is None else now) >= self._next_refresh
+
+    def refresh(self, db, now=None):
+        """Reads the revocations added since the last refresh and forgets expired ones."""
+        now = time.time() if now is None else now
+        rows = load_revoked_tokens(db, self._last_id)
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                self._revoked[jti] = expires_at
+                self._last_id = max(self._last_id, row_id)
+            for jti in [jti for jti, expires_at in self._revoked.items() if expires_at <= now]:
+                del self._revoked[jti]
+            self._next_refresh = now + self.refresh_interval
+
+    def revoke(self, db, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+        store_revoked_token(db, jti, expires_at)
+
+    def __contains__(self, jti):
+        return jti in self._revoked
@@ -1,25 +1,41 @@
+import logging
+
 import requests
-from flask import current_app
+
+from .metrics import observe_http
+
+log = logging.getLogger(__name__)
+
+NBU_RATE_URL = "https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=EUR&json"
+DEFAULT_UAH_TO_EUR_RATE = 50.0  # extra price in case of error of getting rate
 
 
-def get_uah_to_eur_rate():
+def get_uah_to_eur_rate(url=NBU_RATE_URL, timeout=5):
     """
     Fetches the current UAH to EUR exchange rate from the National Bank of Ukraine API.
     Returns a default value (50.0) in case of an error.
     """
     try:
-        response = requests.get("https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=EUR&json")
+        with observe_http('nbu'):
+            response = requests.get(url, timeout=timeout)
         data = response.json()
         rate = float(data[0]['rate'])
         return rate
     except Exception as e:
-        print(f"Не вдалося отримати курс НБУ: {e}")
-        return 50.0  # extra price in case of error of getting rate
+        log.warning("Не вдалося отримати курс НБУ: %s", e)
+        return DEFAULT_UAH_TO_EUR_RATE
 
 
-def allowed_file(filename):
+async def fetch_uah_to_eur_rate(client, url=NBU_RATE_URL):
     """
-    Checks if the file extension is allowed based on ALLOWED_EXTENSIONS.
+    get_uah_to_eur_rate() with an httpx.AsyncClient (its timeout applies): the event loop
+    serves other requests while the NBU answers.
     """
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
\ No newline at end of file
+    try:
+        with observe_http('nbu'):
+            response = await client.get(url)
+        data = response.json()
+        return float(data[0]['rate'])
+    except Exception as e:
+        log.warning("Не вдалося отримати курс НБУ: %s", e)
+        return DEFAULT_UAH_TO_EUR_RATE
@@ -0,0 +1,224 @@
+"""
+App-wide request hooks, error handlers and template helpers, and the helpers views of
+every blueprint share (run_write, stream_page, api_error).
+
+They are registered through the 'web' blueprint, which has no routes of its own.
+"""
+import datetime
+import hashlib
+import logging
+import math
+import os
+
+from flask import (Blueprint, current_app, flash, get_flashed_messages, jsonify, redirect, request, session,
+                   stream_template, url_for)
+
+from .assets import AssetManifest, DIST_FOLDER, MANIFEST_NAME
+from .db import DatabaseBusyError, get_db_connection, write_transaction
+from .group_commit import get_group_commit_writer
+from .images import image_variants as lookup_image_variants, is_content_addressed
+from .passwords import HasherBusyError
+from .ratelimit import create_rate_limiter
+
+bp = Blueprint('web', __name__)
+log = logging.getLogger(__name__)
+
+
+def release_fingerprint(app):
+    """
+    Hash and newest modification time of the templates and the asset manifest: the markup of
+    a page changes with them even when its product does not.
+    """
+    paths = [os.path.join(root, name)
+             for root, _, names in os.walk(os.path.join(app.root_path, app.template_folder)) for name in names]
+    paths.append(os.path.join(app.static_folder, DIST_FOLDER, MANIFEST_NAME))
+    digest, newest = hashlib.sha256(), 0
+    for path in sorted(path for path in paths if os.path.exists(path)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        newest = max(newest, int(os.path.getmtime(path)))
+    return digest.hexdigest()[:12], datetime.datetime.fromtimestamp(newest, datetime.timezone.utc)
+
+
+@bp.record_once
+def init_app_state(state):
+    """Creates the app's asset manifest, rate limiter and release fingerprint."""
+    app = state.app
+    app.extensions['asset_manifest'] = AssetManifest(app.static_folder)  # Empty until 'python -m app.assets build' has run
+    app.extensions['rate_limiter'] = (create_rate_limiter(app.config['RATE_LIMITS'], app.config['RATE_LIMIT_DATABASE'])
+                                      if app.config['RATE_LIMIT_ENABLED'] else None)
+    app.extensions['release'] = release_fingerprint(app)
+
+
+@bp.app_errorhandler(413)
+def request_too_large(error):
+    """The request body exceeded MAX_CONTENT_LENGTH (an oversized image upload)."""
+    flash(f"Файл завеликий. Максимальний розмір — {current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} МБ.",
+          "danger")
+    return redirect(url_for('catalog.home'))
+
+
+@bp.app_errorhandler(DatabaseBusyError)
+def database_busy(error):
+    """
+    A write could not get the database lock within the retry budget (see write_transaction).
+    Answers 503 with Retry-After instead of holding the worker any longer.
+    """
+    log.warning("Database busy: %s", error)
+    return "Сервер зараз перевантажений. Будь ласка, спробуйте ще раз за мить.", 503, {'Retry-After': '1'}
+
+
+@bp.app_errorhandler(HasherBusyError)
+def password_hasher_busy(error):
+    """Too many logins/registrations are already waiting for a password hash (see passwords.py)."""
+    log.warning("Password hasher busy: %s", error)
+    return "Сервер зараз перевантажений. Будь ласка, спробуйте ще раз за мить.", 503, {'Retry-After': '1'}
+
+
+def api_error(status, message, headers=None):
+    return jsonify({'error': message}), status, headers or {}
+
+
+@bp.before_app_request
+def enforce_rate_limit():
+    """
+    Applies the endpoint's RATE_LIMITS budget (see ratelimit.py) to the client's IP and,
+    when logged in, to its user; catalog searches use the 'search' budget.
+    Over budget, the request is answered with 429 and Retry-After before the view runs.
+    """
+    rate_limiter = current_app.extensions['rate_limiter']
+    if rate_limiter is None:
+        return None
+    name = request.endpoint
+    if name == 'catalog.home' and request.args.get('search_query'):
+        name = 'search'
+    if name not in rate_limiter.limits:
+        return None
+
+    keys = [f"ip:{request.remote_addr}"]
+    if session.get('user_id'):
+        keys.append(f"user:{session['user_id']}")
+    retry_after = rate_limiter.check(name, keys)
+    if not retry_after:
+        return None
+    headers = {'Retry-After': str(math.ceil(retry_after))}
+    if request.blueprint == 'api':
+        return api_error(429, 'Забагато запитів.', headers)
+    return "Забагато запитів. Будь ласка, спробуйте ще раз за кілька секунд.", 429, headers
+
+
+@bp.app_template_global()
+def image_variants(image_url):
+    """Returns srcset data for a product image (see images.image_variants), or None."""
+    return lookup_image_variants(image_url, current_app.static_folder, lambda path: url_for('static', filename=path))
+
+
+@bp.app_template_global()
+def stock_feed_enabled():
+    """Whether this process serves the live stock feed (/stock/stream, the ASGI read path)."""
+    return 'stock_notifier' in current_app.extensions
+
+
+@bp.app_url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """url_for('static', filename=...) points at the content-hashed copy of bundled CSS/JS/fonts."""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = current_app.extensions['asset_manifest'].resolve(values['filename'])
+
+
+@bp.app_context_processor
+def inject_navbar_state():
+    """
+    Login state, role and the cart/favorites counters used by the navbar in base.html.
+    Values passed to render_template() explicitly take precedence.
+    """
+    user_logged_in = session.get('user_id') is not None
+    return {
+        'user_logged_in': user_logged_in,
+        'is_admin': session.get('is_admin', False),
+        'edit_mode': session.get('edit_mode', False),
+        'cart_count': sum(item['quantity'] for item in session.get('cart', [])) if user_logged_in else 0,
+        'favorites': session.get('favorites', []) if user_logged_in else [],
+    }
+
+
+@bp.after_app_request
+def cache_content_addressed_files(response):
+    """
+    Uploaded images and the fingerprinted asset bundle are named by their content hash, so a
+    URL always returns the same bytes: let browsers and proxies cache them for a year without
+    revalidating.
+    """
+    if request.endpoint == 'static' and response.status_code == 200:
+        filename = request.view_args.get('filename', '')
+        if is_content_addressed(filename) or current_app.extensions['asset_manifest'].is_fingerprinted(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['ASSET_MAX_AGE']
+            response.cache_control.immutable = True
+    return response
+
+
+@bp.app_template_filter('date')
+def format_date(value, format="%Y"):
+    """
+    Jinja2 filter to format a datetime object or "now" string to the specified format.
+    Accepts "now" to get the current date.
+    Note: This filter does not handle timezone conversion directly.
+    Timezone conversion for reviews is handled in get_reviews_for_product.
+    """
+    if value == 'now':
+        return datetime.datetime.now().strftime(format)
+    elif isinstance(value, datetime.datetime):
+        return value.strftime(format)
+    try:
+        # Ensure value is treated as string for strptime, then parse
+        dt_object = datetime.datetime.strptime(str(value), "%Y-%m-%d %H:%M:%S")
+        return dt_object.strftime(format)
+    except (TypeError, ValueError):
+        # Fallback for unexpected formats, return original value as string
+        return str(value)
+
+
+def run_write(operation):
+    """
+    Runs a small write 'operation(db)' and returns its result once it is committed.
+    With GROUP_COMMIT_ENABLED the operation is handed to the group-commit writer and shares
+    one transaction (and one fsync) with concurrent requests; otherwise it runs in its own
+    write_transaction(). The operation must only use the connection it is given. A write that
+    cannot be committed in time raises DatabaseBusyError (a 503) either way.
+    """
+    writer = get_group_commit_writer()
+    if writer is not None:
+        return writer.execute(operation)
+    db = get_db_connection()
+    with write_transaction(db):
+        return operation(db)
+
+
+def _buffered(chunks, size):
+    """Joins the small pieces a streamed template yields into chunks of at least 'size' characters."""
+    buffer, buffered = [], 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= size:
+                yield ''.join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        chunks.close()
+
+
+def stream_page(template_name, **context):
+    """
+    Renders a template while the response is being sent (stream_template), so the first bytes
+    leave before the last row is rendered. Flashed messages are taken out of the session here,
+    while the session cookie can still be updated.
+    """
+    get_flashed_messages(with_categories=True)
+    return current_app.response_class(_buffered(stream_template(template_name, **context),
+                                                current_app.config['STREAM_BUFFER_SIZE']),
+                                      mimetype='text/html')
@@ -0,0 +1,12 @@
+"""
+ASGI entry point, serving the catalog, product pages and the cart asynchronously (see
+app/asgi.py) and the other routes through the Flask app:
+
+    uvicorn asgi:app --workers 4
+
+Settings come from the environment and .env, like wsgi.py.
+"""
+from app import create_app
+from app.asgi import create_asgi_app
+
+app = create_asgi_app(create_app())
@@ -0,0 +1,179 @@
+"""
+Concurrent-connection capacity of the sync workers (gunicorn, gthread) and the ASGI read path (uvicorn).
+
+Both servers run the app on a seeded database, with the same number of worker processes,
+and fetch the NBU exchange rate from a local stub that answers after --nbu-delay seconds,
+like a slow upstream. For each concurrency level, that many clients request the cart page
+(logged in, so the rate is fetched) and the home page in a loop for --seconds. The report
+shows requests per second, median and 95th percentile latency, and failed requests
+(timeouts, refused connections, 5xx) for each server.
+
+A gthread worker serves at most --threads requests at once, so while every cart page waits
+on the NBU its throughput stays near workers * threads / delay and the other clients queue;
+the event loop keeps waiting requests open without a thread each.
+
+Usage:
+    python benchmarks/bench_asgi.py [--workers 1] [--threads 4] [--clients 16 64 256] [--seconds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+SECRET_KEY = 'bench-asgi'
+
+
+def start_nbu_stub(delay):
+    """A local NBU exchange-rate endpoint answering after 'delay' seconds; returns its URL."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps([{'r030': 978, 'cc': 'EUR', 'rate': 45.0}]).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}/exchange?valcode=EUR&json'
+
+
+def session_cookie(database):
+    """A signed session of a logged-in user with two products in the cart."""
+    from app import create_app
+    app = create_app({'DATABASE': database, 'SECRET_KEY': SECRET_KEY})
+    cart = [{'id': flower_id, 'name': f'Flower {flower_id}', 'price': 100.0, 'quantity': 1,
+             'image_url': 'static/images/flower1.jpg', 'stock': 10} for flower_id in (1, 2)]
+    return app.session_interface.get_signing_serializer(app).dumps({'user_id': 1, 'username': 'admin', 'cart': cart})
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, port, env, args):
+    if kind == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+        env = dict(env, GUNICORN_BIND=f'127.0.0.1:{port}', WEB_CONCURRENCY=str(args.workers),
+                   GUNICORN_THREADS=str(args.threads), GUNICORN_ACCESS_LOG='')
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(args.workers), '--no-access-log', '--log-level', 'warning']
+    server = subprocess.Popen(command, env=env, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/', timeout=5).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"{kind} did not start")
+
+
+def drain(base_url, limit=60):
+    """Waits until requests abandoned by a previous measurement have left the server's queue."""
+    deadline = time.perf_counter() + limit
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            httpx.get(f'{base_url}/', timeout=limit)
+        except httpx.HTTPError:
+            continue
+        if time.perf_counter() - started < 0.5:
+            return
+
+
+async def load(base_url, path, cookie, clients, seconds, timeout):
+    """'clients' connections requesting 'path' in a loop; returns latencies and the failure count."""
+    latencies, failures = [], 0
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout,
+                                 cookies={'session': cookie}) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def run():
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 500:
+                        failures += 1
+                        continue
+                except httpx.HTTPError:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(run() for _ in range(clients)))
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes of both servers.")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per gunicorn worker.")
+    parser.add_argument('--clients', type=int, nargs='+', default=[16, 64, 256], help="Concurrency levels.")
+    parser.add_argument('--seconds', type=float, default=5, help="Duration of each measurement.")
+    parser.add_argument('--nbu-delay', type=float, default=0.2, help="Seconds the NBU stub takes to answer.")
+    parser.add_argument('--timeout', type=float, default=10, help="Client timeout; slower requests count as failed.")
+    args = parser.parse_args()
+
+    from app.query_audit import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=500)
+        conn = sqlite3.connect(database)
+        with conn:  # The synthetic products have no image; the catalog pages expect one
+            conn.execute("UPDATE products SET image_url = 'static/images/flower1.jpg' WHERE image_url IS NULL")
+        conn.close()
+        cookie = session_cookie(database)
+        env = dict(os.environ, DATABASE=database, SECRET_KEY=SECRET_KEY, NBU_RATE_URL=start_nbu_stub(args.nbu_delay),
+                   RATE_LIMIT_ENABLED='false', TEMPLATE_CACHE_DIR=os.path.join(tmp_dir, 'jinja'))
+
+        print(f"{'server':>8} {'page':>5} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'failed':>7}")
+        for kind in ('gunicorn', 'uvicorn'):
+            port = free_port()
+            server = start_server(kind, port, env, args)
+            try:
+                for name, path in (('cart', '/cart'), ('home', '/')):
+                    for clients in args.clients:
+                        drain(f'http://127.0.0.1:{port}')
+                        latencies, failures = asyncio.run(load(f'http://127.0.0.1:{port}', path, cookie, clients,
+                                                               args.seconds, args.timeout))
+                        p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+                        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else p50
+                        print(f"{kind:>8} {name:>5} {clients:>7} {len(latencies) / args.seconds:>8.1f}"
+                              f" {p50:>8.1f} {p95:>8.1f} {failures:>7}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Transfer size and CPU cost of compressing the app's responses at each level.
+
+The home, admin orders and product detail pages and one get_flower_data JSON response
+are rendered once against a seeded database; each body is then compressed with gzip
+levels 1/6/9 and brotli qualities 1/4/6/11 and the compressed size and median time per
+response are reported. Level 9/11 is what the precompress build step uses for static
+files; the middleware defaults are gzip 6 and brotli 4.
+
+Usage:
+    python benchmarks/bench_compression.py [--repeat 50] [--rows 500]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+PAGES = (('home', '/'), ('admin_orders', '/admin/orders'), ('product_detail', '/product/1'),
+         ('flower_json', '/get_flower_data/1'))
+LEVELS = (('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 6), ('br', 11))
+
+
+def render_bodies(database):
+    from app import create_app
+    app = create_app({'TESTING': True, 'DATABASE': database})
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = 'admin'
+        session['is_admin'] = True
+    bodies = {}
+    for name, path in PAGES:
+        response = client.get(path)  # No Accept-Encoding: the uncompressed body
+        assert response.status_code == 200, (path, response.status_code)
+        bodies[name] = response.data
+    return bodies
+
+
+def time_compress(body, encoding, level, repeat):
+    from app.compression import compress
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        compressed = compress(body, encoding, gzip_level=level, brotli_quality=level)
+        timings.append(time.perf_counter() - started)
+    return len(compressed), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=50, help="Compressions per body and level (brotli 11: a fifth).")
+    parser.add_argument('--rows', type=int, default=500, help="Synthetic orders to seed.")
+    args = parser.parse_args()
+
+    from app.query_audit import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=args.rows)
+        conn = sqlite3.connect(database)
+        with conn:  # The synthetic products have no image; the catalog pages expect one
+            conn.execute("UPDATE products SET image_url = 'static/images/flower1.jpg' WHERE image_url IS NULL")
+        conn.close()
+        bodies = render_bodies(database)
+
+    for name, body in bodies.items():
+        print(f"{name}: {len(body) / 1024:.1f} KB uncompressed")
+        for encoding, level in LEVELS:
+            repeat = max(1, args.repeat // 5) if (encoding, level) == ('br', 11) else args.repeat
+            size, seconds = time_compress(body, encoding, level, repeat)
+            print(f"  {encoding:>4} {level:>2}: {size / 1024:8.1f} KB  ({size / len(body):6.1%})"
+                  f"  {seconds * 1e6:9.0f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput of small cart writes from concurrent request threads:
+one commit per operation (rollback journal, as before the WAL switch, and WAL)
+versus WAL with the group-commit writer.
+
+Each operation is the add_to_cart upsert. Every mode runs with SQLite's default
+synchronous=FULL, so an acknowledged write is durable in all of them.
+
+Usage:
+    python benchmarks/bench_group_commit.py [--threads 32] [--ops 100]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.db import connect, write_transaction  # noqa: E402
+from app.group_commit import GroupCommitWriter  # noqa: E402
+from app.query_audit import seed_database  # noqa: E402
+
+
+def add_to_cart(user_id, flower_id):
+    def operation(db):
+        row = db.execute("SELECT quantity FROM cart_items WHERE user_id = ? AND flower_id = ?",
+                         (user_id, flower_id)).fetchone()
+        if row:
+            db.execute("UPDATE cart_items SET quantity = ? WHERE user_id = ? AND flower_id = ?",
+                       (row['quantity'] + 1, user_id, flower_id))
+        else:
+            db.execute("INSERT INTO cart_items (user_id, flower_id, quantity) VALUES (?, ?, 1)", (user_id, flower_id))
+    return operation
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=2000)
+        conn = sqlite3.connect(database)
+        conn.execute(f"PRAGMA journal_mode = {'DELETE' if mode == 'per-op, rollback journal' else 'WAL'}")
+        conn.close()
+
+        writer = None
+        if mode == 'group commit, WAL':
+            writer = GroupCommitWriter(database, max_delay=args.delay / 1000, max_batch=args.batch)
+            writer.start()
+
+        latencies = []
+
+        def worker(thread_id):
+            conn = None if writer else connect(database)
+            for i in range(args.ops):
+                operation = add_to_cart(thread_id + 1, i % 40 + 1)
+                started = time.perf_counter()
+                if writer:
+                    writer.submit(operation).result()
+                else:
+                    with write_transaction(conn):
+                        operation(conn)
+                latencies.append(time.perf_counter() - started)
+            if conn is not None:
+                conn.close()
+
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if writer:
+            writer.stop()
+
+    ms = [value * 1000 for value in latencies]
+    print(f"{mode:>26}: {len(ms) / elapsed:8.0f} ops/s  ack p50={percentile(ms, 50):6.2f} ms  "
+          f"p99={percentile(ms, 99):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--ops', type=int, default=100, help="Operations per thread.")
+    parser.add_argument('--delay', type=float, default=2, help="Group commit delay in milliseconds.")
+    parser.add_argument('--batch', type=int, default=64, help="Group commit batch size.")
+    parser.add_argument('--dir', help="Directory for the database (use a real disk to include fsync cost).")
+    args = parser.parse_args()
+    for mode in ('per-op, rollback journal', 'per-op, WAL', 'group commit, WAL'):
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Catalog latency while the login form is under a credential-stuffing burst.
+
+The app is served by a threaded werkzeug server in a child process. A shopper thread
+requests the home page in a loop, first alone and then while attacker threads post wrong
+passwords for the admin account to /login as fast as they get answers. The report shows
+the shopper's median and 95th percentile latency in both phases and how the login
+requests were answered. Run it once with the default throttle limits and once with
+--no-throttle to see the effect of the hashing pool alone.
+
+Usage:
+    python benchmarks/bench_login.py [--attackers 8] [--seconds 10] [--no-throttle]
+"""
+import argparse
+import collections
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+
+def serve(port):
+    """Runs in the child interpreter."""
+    from werkzeug.serving import make_server
+    from app import create_app
+    app = create_app()
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+def shop(port, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        request(port, 'GET', '/')
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.05)  # A shopper, not a load generator
+
+
+def attack(port, stop, statuses):
+    attempt = 0
+    while not stop.is_set():
+        attempt += 1
+        body = urllib.parse.urlencode({'username': 'admin', 'password': f'guess{attempt}'})
+        statuses[request(port, 'POST', '/login', body)] += 1
+
+
+def phase(port, seconds, attackers):
+    stop = threading.Event()
+    latencies, statuses = [], collections.Counter()
+    threads = [threading.Thread(target=shop, args=(port, stop, latencies))]
+    threads += [threading.Thread(target=attack, args=(port, stop, statuses)) for _ in range(attackers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    return statistics.median(latencies), p95, statuses
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--attackers', type=int, default=8, help="Concurrent attacker connections.")
+    parser.add_argument('--seconds', type=float, default=10, help="Duration of each phase.")
+    parser.add_argument('--no-throttle', action='store_true', help="Raise the login limits out of reach.")
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    from app.query_audit import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=500)
+        env = dict(os.environ, DATABASE=database)
+        if args.no_throttle:
+            env.update(LOGIN_MAX_ATTEMPTS_PER_USER='1000000', LOGIN_MAX_ATTEMPTS_PER_IP='1000000')
+        port = free_port()
+        server = subprocess.Popen([sys.executable, __file__, '--serve', str(port)], env=env, cwd=ROOT_DIR,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                try:
+                    request(port, 'GET', '/')
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            for name, attackers in (('idle', 0), ('attack', args.attackers)):
+                median, p95, statuses = phase(port, args.seconds, attackers)
+                answers = ', '.join(f"{status}: {count / args.seconds:.1f}/s" for status, count in sorted(statuses.items()))
+                print(f"{name:>6}: catalog p50 {median * 1000:6.1f} ms  p95 {p95 * 1000:6.1f} ms"
+                      f"{'  logins ' + answers if answers else ''}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-request overhead of the rate limiter.
+
+Times RateLimiter.check() for one client key with the in-memory store and the shared
+SQLite store, and the enforce_rate_limit() hook as it runs before every request: for an
+endpoint without a budget (the common case) and for a limited one (a logged-in search,
+so both the IP and the user bucket are charged). Budgets are set high enough that no
+request is refused.
+
+Usage:
+    python benchmarks/bench_ratelimit.py [--repeat 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+
+def per_call(function, repeat):
+    function()  # Warm up (creates the bucket / connection)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20000, help="Calls per measurement.")
+    args = parser.parse_args()
+
+    from app.ratelimit import create_rate_limiter
+
+    spec = 'search=1000000000/1'
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, limiter in (('memory', create_rate_limiter(spec)),
+                              ('sqlite', create_rate_limiter(spec, os.path.join(tmp_dir, 'limits.db')))):
+            seconds = per_call(lambda: limiter.check('search', ['ip:127.0.0.1']), args.repeat)
+            print(f"check(), {name} store: {seconds * 1e6:7.2f} µs")
+
+        from app.query_audit import seed_database
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=100)
+        from flask import session
+        from app import create_app
+        from app.web import enforce_rate_limit
+        app = create_app({'DATABASE': database})
+        app.extensions['rate_limiter'] = create_rate_limiter(spec)
+        for label, path in (('not limited (/)', '/'), ('search, logged in', '/?search_query=rose')):
+            with app.test_request_context(path):
+                session['user_id'] = 1
+                seconds = per_call(enforce_rate_limit, args.repeat)
+            print(f"enforce_rate_limit(), {label}: {seconds * 1e6:6.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
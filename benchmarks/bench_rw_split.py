@@ -0,0 +1,112 @@
+"""
+Reader latency under sustained write load: shared read-write connections (rollback journal)
+versus the read/write split used by the app (WAL, read-only reader connections,
+writes serialized through write_transaction()).
+
+Writers simulate checkout_success / admin bulk edits: a transaction that inserts an order
+with items, rewrites a large share of the orders table (enough to spill the page cache, which
+escalates a rollback-journal writer to an EXCLUSIVE lock) and holds the write lock for a while.
+Readers run the catalog and product-detail queries in a loop. Every reader and writer is
+a separate process, like gunicorn workers.
+
+Usage:
+    python benchmarks/bench_rw_split.py [--seconds 5] [--readers 4] [--writers 2]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import multiprocessing
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.db import DatabaseBusyError, connect, write_transaction  # noqa: E402
+from app.query_audit import seed_database  # noqa: E402
+
+READ_QUERIES = (
+    ("SELECT * FROM products", ()),
+    ("SELECT * FROM products WHERE id = ?", (1,)),
+    ("SELECT AVG(rating) FROM reviews WHERE product_id = ?", (1,)),
+)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+def writer_loop(database, stop, hold_seconds):
+    conn = connect(database, timeout=20)
+    conn.execute("PRAGMA cache_size = -256")  # 256 KiB, so bulk edits spill to disk mid-transaction
+    while not stop.is_set():
+        try:
+            with write_transaction(conn):
+                cursor = conn.execute("INSERT INTO orders (user_id, total_amount) VALUES (1, 100)")
+                order_id = cursor.lastrowid
+                conn.executemany("INSERT INTO order_items (order_id, flower_id, quantity, price_at_purchase) VALUES (?, 1, 1, 10)",
+                                 [(order_id,)] * 20)
+                conn.execute("UPDATE orders SET total_amount = total_amount + 0.01 WHERE id % 3 = ?", (order_id % 3,))
+                time.sleep(hold_seconds)  # Slow work inside the transaction
+        except (sqlite3.OperationalError, DatabaseBusyError):
+            pass
+    conn.close()
+
+
+def reader_loop(database, readonly, stop, results):
+    conn = connect(database, readonly=readonly, timeout=20)
+    latencies = []
+    while not stop.is_set():
+        for sql, params in READ_QUERIES:
+            started = time.perf_counter()
+            try:
+                conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError:
+                pass  # Counted with its full wait time
+            latencies.append(time.perf_counter() - started)
+    conn.close()
+    results.put(latencies)
+
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=args.rows)
+        conn = sqlite3.connect(database)
+        conn.execute(f"PRAGMA journal_mode = {'WAL' if mode == 'split' else 'DELETE'}")
+        conn.close()
+
+        stop = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=writer_loop, args=(database, stop, args.hold / 1000))
+                     for _ in range(args.writers)]
+        processes += [multiprocessing.Process(target=reader_loop, args=(database, mode == 'split', stop, results))
+                      for _ in range(args.readers)]
+        for process in processes:
+            process.start()
+        time.sleep(args.seconds)
+        stop.set()
+        latencies = [value for _ in range(args.readers) for value in results.get()]
+        for process in processes:
+            process.join()
+
+    ms = [value * 1000 for value in latencies]
+    print(f"{mode:>7}: {len(ms):>7} reads  p50={percentile(ms, 50):7.2f} ms  p95={percentile(ms, 95):7.2f} ms  "
+          f"p99={percentile(ms, 99):7.2f} ms  max={max(ms):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--hold', type=float, default=20, help="Milliseconds each write transaction holds the lock.")
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+    for mode in ('shared', 'split'):
+        run(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Time to first byte, total time and peak memory of the admin order list and the CSV export.
+
+For each database size a fresh process serves the page once to warm up, then once timed
+(first chunk / whole body) and once under tracemalloc (peak Python allocation while the
+response is produced). With a streamed page the first byte and the peak should stay flat
+as the number of orders grows.
+
+Usage:
+    python benchmarks/bench_streaming.py [--orders 500 2000 8000]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+PAGES = (('admin_orders', '/admin/orders'), ('orders_csv', '/admin/orders/export.csv'))
+
+
+def serve(client, path):
+    """Returns (seconds to the first chunk, seconds to the end, body size) of one request."""
+    started = time.perf_counter()
+    response = client.get(path, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks, b'')
+    first_byte = time.perf_counter() - started
+    size = len(first) + sum(len(chunk) for chunk in chunks)
+    response.close()
+    return first_byte, time.perf_counter() - started, size
+
+
+def child(path):
+    """Runs in the child interpreter: serve 'path' and print the measurements as JSON."""
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = 'admin'
+        session['is_admin'] = True
+    if client.get(path).status_code != 200:  # Warm up; the route may not exist in older trees
+        print(json.dumps(None))
+        return
+    first_byte, total, size = serve(client, path)
+    tracemalloc.start()
+    serve(client, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(json.dumps({'first_byte': first_byte, 'total': total, 'size': size, 'peak': peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, nargs='+', default=[500, 2000, 8000], help="Database sizes (orders).")
+    parser.add_argument('--child', metavar='PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    from app.query_audit import seed_database
+
+    print(f"{'orders':>7} {'page':>13} {'first byte':>11} {'total':>9} {'body':>9} {'peak alloc':>11}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in args.orders:
+            database = os.path.join(tmp_dir, f'bench-{rows}.db')
+            seed_database(database, rows=rows)
+            conn = sqlite3.connect(database)
+            with conn:  # The synthetic products have no image; the order cards expect one
+                conn.execute("UPDATE products SET image_url = 'static/images/flower1.jpg' WHERE image_url IS NULL")
+            conn.close()
+            env = dict(os.environ, DATABASE=database)
+            for name, path in PAGES:
+                output = subprocess.run([sys.executable, __file__, '--child', path], env=env, cwd=ROOT_DIR,
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                if result is None:
+                    continue
+                print(f"{rows:>7} {name:>13} {result['first_byte'] * 1000:>8.1f} ms {result['total'] * 1000:>6.0f} ms"
+                      f" {result['size'] / 1024:>6.0f} KB {result['peak'] / 2**20:>8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
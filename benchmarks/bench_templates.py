@@ -0,0 +1,118 @@
+"""
+Template rendering cost of the home, admin orders and product detail pages.
+
+Cold start: a fresh interpreter imports the app and serves the first request for each
+page, which includes compiling its templates. It is measured twice per page, first with
+an empty Jinja bytecode cache and then with the cache left behind by the first run.
+Steady state: the same pages served repeatedly by one process (templates compiled).
+
+Every page is requested as a logged-in admin against a seeded database.
+
+Usage:
+    python benchmarks/bench_templates.py [--requests 200] [--cold-runs 5] [--rows 500]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+PAGES = (('home', '/'), ('admin_orders', '/admin/orders'), ('product_detail', '/product/1'))
+
+
+def make_client():
+    from app import create_app
+    app = create_app({'TESTING': True, 'DATABASE': os.environ['DATABASE']})
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = 'admin'
+        session['is_admin'] = True
+    return client
+
+
+def cold_child(path):
+    """Runs in the child interpreter: import the app, serve one request, print timings as JSON."""
+    started = time.perf_counter()
+    client = make_client()
+    imported = time.perf_counter()
+    response = client.get(path)
+    served = time.perf_counter()
+    assert response.status_code == 200, response.status_code
+    print(json.dumps({'import': imported - started, 'first_request': served - imported}))
+
+
+def run_cold(path, env):
+    output = subprocess.run([sys.executable, __file__, '--cold-child', path], env=env, cwd=ROOT_DIR,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs) * 1000
+
+
+def run_steady(requests):
+    client = make_client()
+    results = {}
+    for name, path in PAGES:
+        for _ in range(10):  # Compile templates and warm caches
+            client.get(path)
+        timings = []
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        results[name] = statistics.median(timings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200, help="Requests per page in the steady state.")
+    parser.add_argument('--cold-runs', type=int, default=5, help="Fresh processes per page and cache state.")
+    parser.add_argument('--rows', type=int, default=500, help="Synthetic orders to seed.")
+    parser.add_argument('--cold-child', metavar='PATH', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_child:
+        cold_child(args.cold_child)
+        return
+
+    from app.query_audit import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=args.rows)
+        conn = sqlite3.connect(database)
+        with conn:  # The synthetic products have no image; the catalog pages expect one
+            conn.execute("UPDATE products SET image_url = 'static/images/flower1.jpg' WHERE image_url IS NULL")
+        conn.close()
+        os.environ['DATABASE'] = database
+
+        print(f"cold start (median of {args.cold_runs} processes; import / first request, ms):")
+        for name, path in PAGES:
+            empty, cached = [], []
+            for run in range(args.cold_runs):
+                env = dict(os.environ, TEMPLATE_CACHE_DIR=os.path.join(tmp_dir, f'jinja-{name}-{run}'))
+                empty.append(run_cold(path, env))
+                cached.append(run_cold(path, env))
+            print(f"  {name:>15}: empty cache {median(empty, 'import'):6.1f} / {median(empty, 'first_request'):6.1f}"
+                  f"   warm cache {median(cached, 'import'):6.1f} / {median(cached, 'first_request'):6.1f}")
+
+        print(f"steady state (median of {args.requests} requests, ms):")
+        for name, seconds in run_steady(args.requests).items():
+            print(f"  {name:>15}: {seconds * 1000:6.2f}")
+
+
+if __name__ == '__main__':
+    main()
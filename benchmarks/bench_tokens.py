@@ -0,0 +1,75 @@
+"""
+Cost of verifying an API access token.
+
+Times tokens.decode() with the cached KeyRing (one prepared HMAC per key, copied per
+token) against building the HMAC from the secret for every token, and a request to an
+empty view with and without the token_required() decorator, i.e. what authentication adds
+to every API request.
+
+Usage:
+    python benchmarks/bench_tokens.py [--repeat 20000]
+"""
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, ROOT_DIR)
+
+
+def per_call(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20000, help="Calls per measurement.")
+    args = parser.parse_args()
+
+    from app import tokens
+
+    secret = b'k' * 32
+    keys = tokens.KeyRing({'k1': secret})
+    token = tokens.encode(tokens.access_token_claims(1, 'user', 900), keys)
+
+    class UncachedKeyRing(tokens.KeyRing):
+        def sign(self, kid, signing_input):
+            return hmac.new(secret, signing_input, hashlib.sha256).digest()
+
+    uncached = UncachedKeyRing({'k1': secret})
+    print(f"decode, cached key:   {per_call(lambda: tokens.decode(token, keys), args.repeat) * 1e6:6.2f} µs")
+    print(f"decode, uncached key: {per_call(lambda: tokens.decode(token, uncached), args.repeat) * 1e6:6.2f} µs")
+
+    from app.query_audit import seed_database
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database = os.path.join(tmp_dir, 'bench.db')
+        seed_database(database, rows=500)
+        from app import create_app
+        from app.api import token_required
+        app = create_app({'DATABASE': database})
+        app.add_url_rule('/bench/open', 'bench_open', lambda: '')
+        app.add_url_rule('/bench/protected', 'bench_protected', token_required()(lambda: ''))
+        client = app.test_client()
+        with app.app_context():
+            token = tokens.encode(tokens.access_token_claims(1, 'user', 900),
+                                  tokens.get_key_ring(app.config['JWT_SECRET_KEYS'], app.config['SECRET_KEY']))
+        headers = {'Authorization': f'Bearer {token}'}
+        repeat = max(1, args.repeat // 10)
+        assert client.get('/bench/protected', headers=headers).status_code == 200
+        protected = per_call(lambda: client.get('/bench/protected', headers=headers), repeat)
+        unprotected = per_call(lambda: client.get('/bench/open', headers=headers), repeat)
+        print(f"request, token_required: {protected * 1e6:6.0f} µs")
+        print(f"request, open view:      {unprotected * 1e6:6.0f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+gunicorn settings for FlowerStream:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every value can be overridden from the environment (names below) or on the command line.
+"""
+import glob
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Worker processes. A request mostly renders templates and runs SQLite queries, both on the
+# CPU and under the GIL, so one process per core uses the machine; more processes only add
+# memory and contention for SQLite's single write lock. WEB_CONCURRENCY is the usual name
+# platforms set.
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count())))
+
+# Threads per worker (gthread). They cover the waits that hold a request without using the
+# CPU: the NBU exchange rate and Stripe calls, a password hash in the hasher's process pool,
+# a write waiting for the database lock. Raise it if those calls are slow; the CPU-bound part
+# does not get faster with more threads.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Create the app once in the master and fork the workers from it: init_db() runs once instead
+# of racing in every worker, and the imported code is shared copy-on-write. create_app() keeps
+# nothing open that a fork would share; connections and pools are created in each worker.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))              # A stuck worker is killed and replaced
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))           # Behind a reverse proxy that reuses connections
+
+# Restart a worker after this many requests (0: never). Off by default: the login throttle and
+# in-memory rate-limit buckets live in the worker and would be reset with it.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# Worker heartbeat files on tmpfs, so a slow disk cannot make the master kill healthy workers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None  # '-': stdout, empty: off
+
+# Prometheus metrics of all workers (see app/metrics.py): each worker writes its own files to
+# PROMETHEUS_MULTIPROC_DIR and /metrics adds them up. Set here, before the app imports
+# prometheus_client, and emptied so the counters of a previous run are not added in.
+own_metrics_dir = 'PROMETHEUS_MULTIPROC_DIR' not in os.environ
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), f'flowerstream-metrics-{os.getpid()}'))
+os.makedirs(metrics_dir, exist_ok=True)
+for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+    os.remove(path)
+
+
+def on_exit(server):
+    if own_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,14 @@
+from app.query_audit import format_report
+
+
+def pytest_addoption(parser):
+    parser.addoption('--query-plan-report', action='store_true', default=False,
+                     help="Print the EXPLAIN QUERY PLAN report for every audited SQL statement.")
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    # Filled in by the 'query_plan_results' fixture in test_query_plans.py
+    results = getattr(config, '_query_plan_results', None)
+    if results and config.getoption('--query-plan-report'):
+        terminalreporter.section('query plans')
+        terminalreporter.write_line(format_report(results, show_all=True))
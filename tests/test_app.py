@@ -1,23 +1,32 @@
+import collections
 import os
 import sqlite3
 import datetime
 import pytest
 
-from app.app import (
-    app,
-    load_products_from_db,
-    get_reviews_for_product,
-    get_average_rating_for_product,
-    load_user_cart_from_db,
-    save_user_cart_to_db,
-    load_user_favorites_from_db,
-    save_user_favorites_to_db, get_flower_by_id, format_date,
-)
+from app import create_app
+from app.cart import load_user_cart_from_db, save_user_cart_to_db, load_user_favorites_from_db, save_user_favorites_to_db
+from app.catalog import load_products_from_db, get_reviews_for_product, get_average_rating_for_product, get_flower_by_id
+from app.web import format_date
+
+
+class SharedConnection(sqlite3.Connection):
+    """The test database connection, handed out for every get_db_connection()/get_read_connection()."""
+
+    def close(self):
+        pass  # Closed by the app at the end of each request; the test keeps using it
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    database = str(tmp_path_factory.mktemp('app') / 'app.db')  # Only used by init_db() in create_app()
+    return create_app({'TESTING': True, 'DATABASE': database})
+
 
 @pytest.fixture(autouse=True)
-def patch_db(monkeypatch, tmp_path):
+def patch_db(app, monkeypatch, tmp_path):
     db_file = tmp_path / "test.db"
-    conn = sqlite3.connect(str(db_file))
+    conn = sqlite3.connect(str(db_file), factory=SharedConnection)
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     cursor.execute(
@@ -28,7 +37,9 @@ def patch_db(monkeypatch, tmp_path):
             description TEXT,
             price REAL,
             image_url TEXT,
-            stock INTEGER
+            stock INTEGER,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
         )
         """
     )
@@ -60,14 +71,24 @@ def patch_db(monkeypatch, tmp_path):
     cursor.execute(
         "CREATE TABLE favorite_items (user_id INTEGER, flower_id INTEGER)"
     )
+    cursor.execute(
+        "CREATE TABLE login_attempts (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, attempted_at REAL)"
+    )
+    cursor.execute(
+        "CREATE TABLE refresh_tokens (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+        "token_hash TEXT UNIQUE, expires_at REAL, created_at TEXT)"
+    )
+    cursor.execute(
+        "CREATE TABLE revoked_tokens (id INTEGER PRIMARY KEY AUTOINCREMENT, jti TEXT UNIQUE, expires_at REAL)"
+    )
     conn.commit()
-    # Monkeypatch the database connection in the app module
-    monkeypatch.setattr('app.app.get_db_connection', lambda: conn)
-    return conn
+    # Every connection the app opens is this one
+    monkeypatch.setattr('app.db.connect', lambda *args, **kwargs: conn)
+    with app.app_context():
+        yield conn
 
 @pytest.fixture
-def client(patch_db):
-    app.config['TESTING'] = True
+def client(app, patch_db):
     with app.test_client() as client:
         yield client
 
@@ -363,3 +384,403 @@ def test_load_user_favorites_multiple_items(patch_db):
 
 def test_get_reviews_for_product_no_reviews(patch_db):
     assert get_reviews_for_product(1) == []
+
+
+def test_busy_database_returns_503(client, patch_db, monkeypatch):
+    from app.db import DatabaseBusyError
+
+    def busy(operation):
+        raise DatabaseBusyError("busy")
+
+    conn = patch_db
+    conn.execute(
+        "INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?)",
+        ("Busy", "", 1.0, None, 1)
+    )
+    conn.commit()
+    monkeypatch.setattr('app.cart.run_write', busy)
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    response = client.post('/add_to_favorites/1')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_release_image_keeps_shared_file(app, patch_db, tmp_path, monkeypatch):
+    from app.admin import release_image
+
+    conn = patch_db
+    image_url = 'static/images/0123456789abcdef.jpg'
+    monkeypatch.setattr(app, 'root_path', str(tmp_path))
+    (tmp_path / 'static' / 'images').mkdir(parents=True)
+    (tmp_path / 'static' / 'images' / '0123456789abcdef.jpg').write_bytes(b'x')
+    for name in ('First', 'Second'):
+        conn.execute(
+            "INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?)",
+            (name, "", 1.0, image_url, 1)
+        )
+    conn.commit()
+
+    with app.test_request_context():
+        conn.execute("DELETE FROM products WHERE name = 'First'")
+        release_image(image_url)
+        assert (tmp_path / 'static' / 'images' / '0123456789abcdef.jpg').exists()
+        conn.execute("DELETE FROM products WHERE name = 'Second'")
+        release_image(image_url)
+        assert not (tmp_path / 'static' / 'images' / '0123456789abcdef.jpg').exists()
+
+
+def test_navbar_state_comes_from_context_processor(client):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['username'] = 'alice'
+        sess['cart'] = [{'id': 1, 'quantity': 2}, {'id': 2, 'quantity': 3}]
+        sess['favorites'] = [{'id': 1}]
+    html = client.get('/profile').get_data(as_text=True)
+    assert 'icon-badge">5</span>' in html
+    assert 'icon-badge">1</span>' in html
+    assert '<a class="nav-link active" aria-current="page" href="/profile">' in html
+    assert 'Адмін-панель' not in html
+
+
+def test_pages_are_compressed_when_accepted(client):
+    import brotli
+    plain = client.get('/login')
+    response = client.get('/login', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert brotli.decompress(response.data) == plain.data
+
+
+def test_static_urls_use_the_fingerprinted_bundle(app, client, monkeypatch, tmp_path):
+    from app.assets import AssetManifest
+    (tmp_path / 'dist').mkdir()
+    (tmp_path / 'dist' / 'manifest.json').write_text('{"css/site.css": "dist/css/site.0123456789.css"}')
+    monkeypatch.setitem(app.extensions, 'asset_manifest', AssetManifest(str(tmp_path)))
+
+    html = client.get('/login').get_data(as_text=True)
+    assert '/static/dist/css/site.0123456789.css' in html
+    assert 'cdn.jsdelivr.net' not in html
+    assert '<style>' not in html
+
+
+def test_vendored_assets_are_served(client):
+    response = client.get('/static/vendor/bootstrap/bootstrap.min.css')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/css'
+    response.close()
+
+
+def add_daisy(conn):
+    conn.execute(
+        "INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?)",
+        ("Daisy", "White daisy", 7.5, "static/images/flower1.jpg", 10)
+    )
+    conn.commit()
+
+
+def test_flower_data_is_revalidated_with_etag(client, patch_db):
+    add_daisy(patch_db)
+    response = client.get('/get_flower_data/1')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert 'no-cache' in response.headers['Cache-Control']
+
+    response = client.get('/get_flower_data/1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    patch_db.execute("UPDATE products SET stock = 9, version = version + 1 WHERE id = 1")
+    patch_db.commit()
+    response = client.get('/get_flower_data/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['stock'] == 9
+
+
+def test_product_page_not_modified_skips_rendering(client, patch_db, monkeypatch):
+    add_daisy(patch_db)
+    response = client.get('/product/1')
+    assert response.status_code == 200
+    assert 'public' in response.headers['Cache-Control']
+    assert 's-maxage=60' in response.headers['Cache-Control']
+    assert 'Cookie' in response.headers['Vary']
+    etag, last_modified = response.headers['ETag'], response.headers['Last-Modified']
+
+    def fail(*args):
+        raise AssertionError("the page was rendered")
+    monkeypatch.setattr('app.catalog.get_reviews_for_product', fail)
+    assert client.get('/product/1', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/product/1', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_review_changes_product_etag(client, patch_db):
+    add_daisy(patch_db)
+    patch_db.execute("INSERT INTO users (username, password_hash, role) VALUES ('bob', 'x', 'user')")
+    patch_db.commit()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['username'] = 'bob'
+    response = client.get('/product/1')
+    assert 'private' in response.headers['Cache-Control']
+    assert 'Last-Modified' not in response.headers
+    etag = response.headers['ETag']
+
+    client.post('/product/1/add_review', data={'rating': '5', 'comment': 'Nice'})
+    assert patch_db.execute("SELECT version FROM products WHERE id = 1").fetchone()[0] == 2
+    patch_db.execute("UPDATE reviews SET created_at = '2025-01-01 10:00:00'")  # No column default in this schema
+    patch_db.commit()
+    client.get('/product/1')  # Shows the flashed message
+    response = client.get('/product/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Nice' in response.get_data(as_text=True)
+
+
+def add_orders(conn):
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER, total_amount REAL, status TEXT, "
+                 "recipient_name TEXT, delivery_address TEXT, phone_number_at_purchase TEXT, created_at TEXT)")
+    conn.execute("CREATE TABLE order_items (id INTEGER PRIMARY KEY, order_id INTEGER, flower_id INTEGER, "
+                 "quantity INTEGER, price_at_purchase REAL)")
+    conn.execute("ALTER TABLE users ADD COLUMN phone_number TEXT")
+    conn.execute("INSERT INTO users (username, password_hash, role) VALUES ('bob', 'x', 'user')")
+    add_daisy(conn)
+    conn.execute("INSERT INTO orders VALUES (1, 1, 15.0, 'Очікується', 'Bob', 'Kyiv', '+380', '2025-01-01 10:00:00')")
+    conn.execute("INSERT INTO orders VALUES (2, 1, 7.5, 'Підтверджено', 'Bob', 'Lviv', '+381', '2025-01-02 10:00:00')")
+    conn.execute("INSERT INTO orders VALUES (3, 1, 0.0, 'Очікується', 'Bob', 'Odesa', '+382', '2025-01-02 10:00:00')")
+    conn.executemany("INSERT INTO order_items (order_id, flower_id, quantity, price_at_purchase) VALUES (?, 1, ?, 7.5)",
+                     [(1, 2), (2, 1)])
+    conn.execute("ALTER TABLE orders ADD COLUMN change_seq INTEGER")  # Set by triggers in the real schema
+    conn.execute("UPDATE orders SET change_seq = id")
+    conn.commit()
+
+
+def test_admin_orders_page_is_streamed(client, patch_db):
+    add_orders(patch_db)
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['is_admin'] = True
+        sess['_flashes'] = [('success', 'Статус оновлено')]
+    response = client.get('/admin/orders')
+    assert response.is_streamed
+    html = response.get_data(as_text=True)
+    assert html.index('Замовлення №3') < html.index('Замовлення №2') < html.index('Замовлення №1')
+    assert 'Daisy (x2)' in html and 'Daisy (x1)' in html
+    assert 'Lviv' in html
+    assert 'Статус оновлено' in html
+    # The flash was taken out of the session before the page started streaming
+    assert 'Статус оновлено' not in client.get('/admin/orders').get_data(as_text=True)
+
+
+def test_admin_order_changes_return_new_and_updated_orders(app, client, patch_db, monkeypatch):
+    add_orders(patch_db)
+    assert client.get('/admin/orders/changes').status_code == 403
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['is_admin'] = True
+    assert 'data-last-change="3"' in client.get('/admin/orders').get_data(as_text=True)
+    assert client.get('/admin/orders/changes?after=3').get_json() == {'orders': [], 'last_change': 3, 'more': False}
+
+    patch_db.execute("UPDATE orders SET status = 'Підтверджено', change_seq = 4 WHERE id = 1")
+    patch_db.execute("INSERT INTO orders VALUES (4, 1, 7.5, 'Очікується', 'Bob', 'Dnipro', '+383', "
+                     "'2025-01-03 10:00:00', 5)")
+    patch_db.commit()
+    changes = client.get('/admin/orders/changes?after=3').get_json()
+    assert [order['id'] for order in changes['orders']] == [1, 4]
+    assert changes['last_change'] == 5 and not changes['more']
+    assert 'data-order-id="1"' in changes['orders'][0]['html']
+    assert 'Daisy (x2)' in changes['orders'][0]['html']
+    assert 'selected>Підтверджено' in changes['orders'][0]['html']
+
+    monkeypatch.setitem(app.config, 'ADMIN_ORDERS_FEED_LIMIT', 1)
+    changes = client.get('/admin/orders/changes?after=3').get_json()
+    assert [order['id'] for order in changes['orders']] == [1]
+    assert changes['last_change'] == 4 and changes['more']
+
+
+def test_admin_slow_queries_page_lists_top_offenders(client, patch_db, monkeypatch):
+    monkeypatch.setattr('app.db._slow_query_stats', {})
+    monkeypatch.setattr('app.db._recent_slow_queries', collections.deque())
+    monkeypatch.setattr('app.db.slow_query_log.handlers', [])  # Not to the SLOW_QUERY_LOG file
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['is_admin'] = True
+    assert 'Повільних запитів не було' in client.get('/admin/slow_queries').get_data(as_text=True)
+
+    from app.db import _record_slow_query
+    _record_slow_query(patch_db, "SELECT * FROM products WHERE price > 10", (), 0.25, False)
+    for _ in range(2):
+        _record_slow_query(patch_db, "SELECT * FROM reviews WHERE product_id = ?", (1,), 0.2, False)
+    html = client.get('/admin/slow_queries').get_data(as_text=True)
+    assert html.index('FROM reviews WHERE product_id = ?') < html.index('FROM products WHERE price &gt; ?')
+    assert 'SCAN products' in html
+    assert '400.0' in html  # Total of the reviews query
+    assert client.get('/admin/slow_queries').status_code == 200  # The stored entries are left as they were
+
+    with client.session_transaction() as sess:
+        sess['is_admin'] = False
+    assert client.get('/admin/slow_queries').status_code == 302
+
+
+def test_admin_orders_export_csv(client, patch_db):
+    add_orders(patch_db)
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['is_admin'] = True
+    response = client.get('/admin/orders/export.csv')
+    assert response.mimetype == 'text/csv'
+    lines = response.get_data(as_text=True).lstrip('﻿').splitlines()
+    assert lines[0].startswith('id,created_at,status')
+    assert [line.split(',')[0] for line in lines[1:]] == ['3', '2', '1']
+    assert lines[3].endswith('15.00,Daisy x2 (7.50)')
+
+    with client.session_transaction() as sess:
+        sess['is_admin'] = False
+    assert client.get('/admin/orders/export.csv').status_code == 302
+
+
+def add_user(conn, password, method='scrypt:32768:8:1'):
+    from werkzeug.security import generate_password_hash
+    conn.execute("INSERT INTO users (username, password_hash, role) VALUES ('bob', ?, 'user')",
+                 (generate_password_hash(password, method),))
+    conn.commit()
+
+
+def test_login_replaces_outdated_password_hash(app, client, patch_db):
+    from werkzeug.security import check_password_hash
+    add_user(patch_db, 'secret1', method='pbkdf2:sha256:1000')
+    response = client.post('/login', data={'username': 'bob', 'password': 'secret1'})
+    assert response.status_code == 302
+    password_hash = patch_db.execute("SELECT password_hash FROM users WHERE username = 'bob'").fetchone()[0]
+    assert password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+    assert check_password_hash(password_hash, 'secret1')
+
+
+def test_failed_logins_are_throttled(app, client, patch_db, monkeypatch):
+    from app.throttle import SlidingWindowThrottle
+    monkeypatch.setitem(app.extensions, 'user_login_throttle', SlidingWindowThrottle(2, 60))
+    monkeypatch.setitem(app.extensions, 'ip_login_throttle', SlidingWindowThrottle(100, 60))
+    add_user(patch_db, 'secret1')
+
+    for _ in range(2):
+        assert client.post('/login', data={'username': 'bob', 'password': 'wrong'}).status_code == 200
+    assert patch_db.execute("SELECT COUNT(*) FROM login_attempts").fetchone()[0] == 4  # user: and ip: keys
+
+    monkeypatch.setattr('app.auth.password_hasher', lambda: pytest.fail("a throttled login must not hash"))
+    response = client.post('/login', data={'username': 'bob', 'password': 'secret1'})
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 60
+    assert 'Забагато невдалих спроб входу' in response.get_data(as_text=True)
+
+
+def test_successful_login_clears_failed_attempts(app, client, patch_db, monkeypatch):
+    from app.throttle import SlidingWindowThrottle
+    monkeypatch.setitem(app.extensions, 'user_login_throttle', SlidingWindowThrottle(2, 60))
+    monkeypatch.setitem(app.extensions, 'ip_login_throttle', SlidingWindowThrottle(100, 60))
+    add_user(patch_db, 'secret1')
+
+    assert client.post('/login', data={'username': 'bob', 'password': 'wrong'}).status_code == 200
+    assert client.post('/login', data={'username': 'bob', 'password': 'secret1'}).status_code == 302
+    assert [row['key'] for row in patch_db.execute("SELECT key FROM login_attempts")] == ['ip:127.0.0.1']
+    client.get('/logout')
+    assert client.post('/login', data={'username': 'bob', 'password': 'wrong'}).status_code == 200
+
+
+def api_login(client, username='bob', password='secret1'):
+    response = client.post('/api/auth/token', json={'username': username, 'password': password})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_api_token_flow(client, patch_db):
+    add_user(patch_db, 'secret1')
+    add_daisy(patch_db)
+    assert client.post('/api/auth/token', json={'username': 'bob', 'password': 'wrong'}).status_code == 401
+    tokens = api_login(client)
+    auth = {'Authorization': f"Bearer {tokens['access_token']}"}
+
+    assert client.get('/api/cart').status_code == 401
+    patch_db.execute("ALTER TABLE users RENAME TO users_gone")  # Requests must not need the users table
+    response = client.post('/api/cart/1', json={'quantity': 2}, headers=auth)
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['quantity'] == 2
+    assert response.get_json()['total'] == 15.0
+    assert client.put('/api/cart/1', json={'quantity': 'x'}, headers=auth).status_code == 400
+    assert client.put('/api/cart/1', json={'quantity': 0}, headers=auth).get_json()['items'] == []
+    assert client.post('/api/favorites/1', headers=auth).get_json()['items'][0]['name'] == 'Daisy'
+    assert client.post('/api/favorites/99', headers=auth).status_code == 404
+    patch_db.execute("ALTER TABLE users_gone RENAME TO users")
+
+    refreshed = client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']}).get_json()
+    assert refreshed['refresh_token'] != tokens['refresh_token']
+    assert client.post('/api/auth/refresh', json={'refresh_token': tokens['refresh_token']}).status_code == 401
+    assert patch_db.execute("SELECT COUNT(*) FROM refresh_tokens").fetchone()[0] == 1
+
+    assert client.post('/api/auth/logout', json={'refresh_token': refreshed['refresh_token']},
+                       headers=auth).status_code == 204
+    response = client.get('/api/favorites', headers=auth)
+    assert response.status_code == 401
+    assert 'invalid_token' in response.headers['WWW-Authenticate']
+    assert client.post('/api/auth/refresh', json={'refresh_token': refreshed['refresh_token']}).status_code == 401
+
+
+def test_api_orders_and_admin_role(client, patch_db):
+    from werkzeug.security import generate_password_hash
+    add_orders(patch_db)
+    patch_db.execute("UPDATE users SET password_hash = ?", (generate_password_hash('secret1'),))
+    patch_db.execute("INSERT INTO users (username, password_hash, role) VALUES ('root', ?, 'admin')",
+                     (generate_password_hash('secret2'),))
+    patch_db.commit()
+
+    auth = {'Authorization': f"Bearer {api_login(client)['access_token']}"}
+    orders = client.get('/api/orders', headers=auth).get_json()['orders']
+    assert sorted(order['id'] for order in orders) == [1, 2, 3] and orders[2]['id'] == 1  # 2 and 3: same time
+    assert orders[2]['items'] == [{'name': 'Daisy', 'quantity': 2, 'price_at_purchase': 7.5,
+                                   'image_url': 'static/images/flower1.jpg'}]
+    assert client.get('/api/admin/orders', headers=auth).status_code == 403
+
+    auth = {'Authorization': f"Bearer {api_login(client, 'root', 'secret2')['access_token']}"}
+    response = client.get('/api/admin/orders', headers=auth)
+    assert response.is_streamed
+    assert [order['id'] for order in response.get_json()['orders']] == [3, 2, 1]
+
+
+def test_searches_are_rate_limited(app, client, monkeypatch):
+    from app.ratelimit import create_rate_limiter
+    monkeypatch.setitem(app.extensions, 'rate_limiter', create_rate_limiter('search=2/60,api.add_to_cart=1/60'))
+    assert client.get('/?search_query=rose').status_code == 200
+    assert client.get('/?search_query=tulip').status_code == 200
+    response = client.get('/?search_query=daisy')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 30
+    assert client.get('/').status_code == 200  # Browsing without a search is not limited
+
+    assert client.post('/api/cart/1').status_code == 401  # The bucket is charged before the view runs
+    response = client.post('/api/cart/1')
+    assert response.status_code == 429
+    assert response.get_json()['error']
+
+
+def test_trusted_proxies_give_each_client_its_own_bucket(app, tmp_path, monkeypatch):
+    monkeypatch.undo()
+    config = {'TESTING': True, 'DATABASE': str(tmp_path / 'proxied.db'), 'RATE_LIMITS': 'search=1/60'}
+    direct = create_app(config).test_client()
+    assert direct.get('/?search_query=rose', headers={'X-Forwarded-For': '203.0.113.1'}).status_code == 200
+    assert direct.get('/?search_query=rose', headers={'X-Forwarded-For': '203.0.113.2'}).status_code == 429
+
+    proxied = create_app(dict(config, TRUSTED_PROXIES=1)).test_client()
+    for client_ip in ('203.0.113.1', '203.0.113.2'):
+        assert proxied.get('/?search_query=rose', headers={'X-Forwarded-For': client_ip}).status_code == 200
+    # Only the entry the proxy appended counts, not one the client sent itself
+    assert proxied.get('/?search_query=rose', headers={'X-Forwarded-For': '198.51.100.7, 203.0.113.1'}).status_code == 429
+
+
+def test_create_app_keeps_state_per_application(app, tmp_path, monkeypatch):
+    monkeypatch.undo()  # The second app creates and uses its own database, not the shared test connection
+    other = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'other.db'), 'RATE_LIMITS': 'search=1/60'})
+    assert other.config['DATABASE'] != app.config['DATABASE']
+    assert other.extensions['rate_limiter'] is not app.extensions['rate_limiter']
+    assert other.extensions['user_login_throttle'] is not app.extensions['user_login_throttle']
+    assert {'catalog', 'auth', 'cart', 'orders', 'admin', 'api'} <= set(other.blueprints)
+
+    client = other.test_client()
+    assert client.get('/?search_query=rose').status_code == 200
+    assert client.get('/?search_query=tulip').status_code == 429  # The other app's budget, not the fixture's
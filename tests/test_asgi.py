@@ -0,0 +1,180 @@
+import asyncio
+import sqlite3
+
+import httpx
+import pytest
+from starlette.requests import Request
+from starlette.testclient import TestClient
+
+from app import create_app
+from app.asgi import ReadExecutor, create_asgi_app, stock_stream
+from app.ratelimit import create_rate_limiter
+from app.stock_feed import StockNotifier
+from app.utils import DEFAULT_UAH_TO_EUR_RATE
+
+CART = [{'id': 1, 'name': 'Троянда', 'price': 90.0, 'quantity': 2, 'image_url': 'static/images/flower1.jpg', 'stock': 3}]
+
+
+@pytest.fixture(scope='module')
+def flask_app(tmp_path_factory):
+    return create_app({'TESTING': True, 'DATABASE': str(tmp_path_factory.mktemp('asgi') / 'app.db'),
+                       'METRICS_ENABLED': True})
+
+
+@pytest.fixture
+def client(flask_app):
+    with TestClient(create_asgi_app(flask_app)) as client:  # Runs the lifespan: read executor, HTTP client
+        yield client
+
+
+def log_in(flask_app, client, **session):
+    client.cookies.clear()
+    session.setdefault('user_id', 1)
+    session.setdefault('username', 'admin')
+    client.cookies.set('session', flask_app.session_interface.get_signing_serializer(flask_app).dumps(session))
+
+
+def nbu_client(handler):
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.parametrize('path', ['/', '/?search_query=троянд&sort=price_desc', '/product/1'])
+def test_read_pages_match_the_wsgi_app(flask_app, client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.text == flask_app.test_client().get(path).get_data(as_text=True)
+
+
+def test_flower_data_and_conditional_requests(flask_app, client):
+    response = client.get('/get_flower_data/1')
+    assert response.json() == flask_app.test_client().get('/get_flower_data/1').get_json()
+    assert client.get('/get_flower_data/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get('/get_flower_data/999').status_code == 404
+
+    response = client.get('/product/1')
+    assert response.headers['Cache-Control'] == 'public, max-age=0, s-maxage=60'
+    assert client.get('/product/1', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_missing_product_flashes_through_the_session(client):
+    response = client.get('/product/999', follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers['Location'] == '/'
+    assert 'Товар не знайдено.' in client.get('/').text  # The flash was saved in the session cookie
+
+
+def test_cart_fetches_the_rate_without_blocking(flask_app, client, monkeypatch):
+    assert client.get('/cart', follow_redirects=False).headers['Location'] == '/login'
+
+    requested = []
+    def nbu(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, json=[{'rate': 45.0}])
+    monkeypatch.setitem(flask_app.extensions, 'asgi_http', nbu_client(nbu))
+    log_in(flask_app, client, cart=CART)
+    response = client.get('/cart')
+    assert response.status_code == 200
+    assert '4.00' in response.text  # 180 UAH at 45 UAH/EUR
+    assert requested == [flask_app.config['NBU_RATE_URL']]
+
+    def unavailable(request):
+        raise httpx.ConnectTimeout('timed out')
+    monkeypatch.setitem(flask_app.extensions, 'asgi_http', nbu_client(unavailable))
+    assert f'{180 / DEFAULT_UAH_TO_EUR_RATE:.2f}' in client.get('/cart').text
+
+
+def test_other_routes_go_to_the_flask_app(client):
+    assert client.get('/login').status_code == 200
+    response = client.post('/add_to_cart/1', follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers['Location'] == '/login'
+
+
+def test_read_path_applies_rate_limits_and_compression(flask_app, client, monkeypatch):
+    monkeypatch.setitem(flask_app.extensions, 'rate_limiter', create_rate_limiter('search=1/60'))
+    assert client.get('/?search_query=rose').status_code == 200
+    response = client.get('/?search_query=tulip')
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_read_path_takes_the_client_address_from_trusted_proxies(tmp_path):
+    flask_app = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db'), 'TRUSTED_PROXIES': 1})
+    flask_app.extensions['rate_limiter'] = create_rate_limiter('search=1/60')
+    with TestClient(create_asgi_app(flask_app)) as client:
+        for client_ip in ('203.0.113.1', '203.0.113.2'):
+            assert client.get('/?search_query=rose', headers={'X-Forwarded-For': client_ip}).status_code == 200
+        assert client.get('/?search_query=rose', headers={'X-Forwarded-For': '203.0.113.2'}).status_code == 429
+
+
+def test_hooks_and_templates_run_off_the_event_loop(tmp_path):
+    flask_app = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db')})
+    on_loop = {}
+
+    def record(stage):
+        try:
+            asyncio.get_running_loop()
+            on_loop[stage] = True
+        except RuntimeError:
+            on_loop[stage] = False
+
+    flask_app.before_request(lambda: record('before_request'))
+    flask_app.context_processor(lambda: record('template') or {})
+    flask_app.after_request(lambda response: record('after_request') or response)
+    flask_app.teardown_request(lambda exception: record('teardown'))
+    with TestClient(create_asgi_app(flask_app)) as client:
+        assert client.get('/product/1').status_code == 200
+    assert on_loop == {'before_request': False, 'template': False, 'after_request': False, 'teardown': False}
+
+
+def test_pages_subscribe_to_the_stock_feed_only_on_the_asgi_server(flask_app):
+    assert 'js/stock_feed.js' not in flask_app.test_client().get('/').get_data(as_text=True)
+    with TestClient(create_asgi_app(flask_app)) as client:
+        for path in ('/', '/product/1'):
+            assert 'js/stock_feed.js' in client.get(path).text
+        assert client.get('/stock/stream').status_code == 400
+        assert client.get('/stock/stream?ids=x').status_code == 400
+
+
+def test_stock_stream_sends_levels_then_changes(flask_app, monkeypatch):
+    def stream_request(query_string):
+        return Request({'type': 'http', 'method': 'GET', 'path': '/stock/stream', 'headers': [],
+                        'query_string': query_string})
+
+    async def scenario():
+        reads = ReadExecutor(flask_app.config['DATABASE'], 1)
+        notifier = StockNotifier(reads)
+        await notifier.start()
+        monkeypatch.setitem(flask_app.extensions, 'stock_notifier', notifier)
+        response = await stock_stream(flask_app)(stream_request(b'ids=2,1'))
+        assert response.media_type == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        events = response.body_iterator
+        try:
+            assert (await anext(events)).startswith('retry: ')
+            stock = dict(sqlite3.connect(flask_app.config['DATABASE']).execute("SELECT id, stock FROM products"))
+            assert await anext(events) == f'event: stock\ndata: {{"1": {stock[1]}, "2": {stock[2]}}}\n\n'
+
+            with sqlite3.connect(flask_app.config['DATABASE']) as db:
+                db.execute("UPDATE products SET stock = stock - 1 WHERE id IN (1, 3)")
+            await notifier.poll()
+            assert await anext(events) == f'event: stock\ndata: {{"1": {stock[1] - 1}}}\n\n'
+        finally:
+            await events.aclose()
+            await notifier.stop()
+            reads.close()
+        assert notifier.subscription_count == 0  # Unsubscribed when the client went away
+
+    asyncio.run(scenario())
+
+
+def test_read_path_counts_the_sql_statements_of_its_requests(client):
+    from prometheus_client import REGISTRY
+    before = REGISTRY.get_sample_value('flowerstream_request_sql_statements_sum', {'endpoint': 'catalog.product_detail'})
+    assert client.get('/product/1').status_code == 200  # Queries run on the read executor's threads
+    after = REGISTRY.get_sample_value('flowerstream_request_sql_statements_sum', {'endpoint': 'catalog.product_detail'})
+    assert after >= (before or 0) + 2
@@ -0,0 +1,56 @@
+import json
+
+from app.assets import AssetManifest, build, fingerprint
+
+
+def make_static(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    (static / "vendor" / "icons" / "fonts").mkdir(parents=True)
+    (static / "vendor" / "icons" / "fonts" / "icons.woff2").write_bytes(b"font")
+    (static / "vendor" / "icons" / "icons.css").write_text(
+        '@font-face{src:url("fonts/icons.woff2?v=1") format("woff2"),url("data:font/woff;base64,AA==")}')
+    (static / "css" / "site.css").write_text("body { background: url(../images/missing.png); }\n" * 50)
+    (static / "images").mkdir()
+    (static / "images" / "flower1.jpg").write_bytes(b"jpeg")
+    return static
+
+
+def test_fingerprint_depends_on_content():
+    assert fingerprint('css/site.css', b'a') == fingerprint('css/site.css', b'a')
+    assert fingerprint('css/site.css', b'a') != fingerprint('css/site.css', b'b')
+    assert fingerprint('css/site.css', b'a').startswith('css/site.') and fingerprint('css/site.css', b'a').endswith('.css')
+
+
+def test_build_writes_hashed_copies_and_manifest(tmp_path):
+    static = make_static(tmp_path)
+    manifest = build(str(static))
+
+    assert set(manifest) == {'css/site.css', 'vendor/icons/icons.css', 'vendor/icons/fonts/icons.woff2'}
+    assert json.loads((static / "dist" / "manifest.json").read_text()) == manifest
+    font = manifest['vendor/icons/fonts/icons.woff2']
+    assert (static / font).read_bytes() == b"font"
+
+    icons_css = (static / manifest['vendor/icons/icons.css']).read_text()
+    assert f'url("fonts/{font.rsplit("/", 1)[1]}?v=1")' in icons_css  # Rewritten to the hashed font
+    assert 'url("data:font/woff;base64,AA==")' in icons_css
+    site_css = static / manifest['css/site.css']
+    assert 'url(../images/missing.png)' in site_css.read_text()  # Not part of the bundle: left alone
+    assert (static / (manifest['css/site.css'] + ".gz")).exists()
+
+    (static / "css" / "site.css").write_text("body { color: red; }\n")
+    rebuilt = build(str(static))
+    assert rebuilt['css/site.css'] != manifest['css/site.css']
+    assert site_css.exists()  # The previous copy stays for pages rendered before the build
+
+
+def test_manifest_resolves_paths(tmp_path):
+    static = make_static(tmp_path)
+    assert AssetManifest(str(static)).resolve('css/site.css') == 'css/site.css'  # Not built yet
+
+    manifest = build(str(static))
+    assets = AssetManifest(str(static))
+    assert assets.resolve('css/site.css') == manifest['css/site.css']
+    assert assets.resolve('images/flower1.jpg') == 'images/flower1.jpg'
+    assert assets.is_fingerprinted(manifest['css/site.css'])
+    assert not assets.is_fingerprinted('css/site.css')
@@ -0,0 +1,106 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+from flask import Flask, Response
+
+from app.compression import CompressionMiddleware, negotiate_encoding, precompress, send_static_file
+
+BODY = ("<p>FlowerStream</p>" * 200).encode()
+
+
+def make_app(response_factory, minimum_size=500, static_folder=None):
+    app = Flask(__name__, static_folder=static_folder)
+    app.add_url_rule('/', 'index', response_factory)
+    if static_folder:
+        app.view_functions['static'] = send_static_file
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, minimum_size=minimum_size)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('identity', None),
+    ('gzip, deflate', 'gzip'),
+    ('gzip, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('*', 'br'),
+    ('br;q=0, *;q=0.1', 'gzip'),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize('encoding, decompress', [('gzip', gzip.decompress), ('br', brotli.decompress)])
+def test_buffered_response_is_compressed(encoding, decompress):
+    client = make_app(lambda: Response(BODY, mimetype='text/html', headers={'ETag': '"v1"'}))
+    response = client.get('/', headers={'Accept-Encoding': encoding})
+    assert response.headers['Content-Encoding'] == encoding
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"v1"'
+    assert int(response.headers['Content-Length']) == len(response.data) < len(BODY)
+    assert decompress(response.data) == BODY
+
+
+def test_small_and_non_text_responses_are_not_compressed():
+    client = make_app(lambda: Response(b'x' * 100, mimetype='text/html'))
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.data == b'x' * 100
+
+    client = make_app(lambda: Response(BODY, mimetype='image/jpeg'))
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers and 'Vary' not in response.headers
+
+
+def test_existing_content_encoding_is_left_alone():
+    client = make_app(lambda: Response(BODY, mimetype='text/css', headers={'Content-Encoding': 'br'}))
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.data == BODY
+
+
+def test_streamed_response_is_flushed_per_chunk():
+    chunks = [b'<html>' + b'a' * 600, b'<p>second</p>', b'<p>third</p></html>']
+    client = make_app(lambda: Response(iter(chunks), mimetype='text/html'))
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    parts = [decompressor.decompress(part) for part in response.response]
+    assert parts[:3] == chunks  # Each chunk is readable as soon as it is sent
+    assert b''.join(parts) + decompressor.flush() == b''.join(chunks)
+
+
+def test_short_streamed_response_is_sent_uncompressed():
+    client = make_app(lambda: Response(iter([b'<p>a</p>', b'<p>b</p>']), mimetype='text/html'))
+    response = client.get('/', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == b'<p>a</p><p>b</p>'
+
+
+def test_precompressed_static_file_is_served(tmp_path):
+    static = tmp_path / "static"
+    (static / "css").mkdir(parents=True)
+    css = b"body { color: purple; }\n" * 100
+    (static / "css" / "site.css").write_bytes(css)
+    (static / "tiny.js").write_bytes(b"1")
+
+    results = {path: sizes for path, _, sizes in precompress(str(static))}
+    assert set(results[str(static / "css" / "site.css")]) == {'br', 'gzip'}
+    assert results[str(static / "tiny.js")] == {}  # Compressed would be larger
+    assert not (static / "tiny.js.gz").exists()
+
+    client = make_app(lambda: 'ok', static_folder=str(static))
+    response = client.get('/static/css/site.css', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.mimetype == 'text/css'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert brotli.decompress(response.data) == css
+
+    response = client.get('/static/css/site.css')
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == css
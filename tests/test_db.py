@@ -0,0 +1,171 @@
+import collections
+import sqlite3
+import threading
+import pytest
+from flask import Flask
+
+from app import db as db_module
+from app.admin import get_last_order_change, load_order_changes
+from app.db import (DatabaseBusyError, configure_slow_query_log, connect, get_lock_stats, get_slow_queries, init_db,
+                    normalize_sql, write_transaction)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_read_connection_rejects_writes(db_path):
+    conn = connect(db_path, readonly=True)
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("INSERT INTO items (name) VALUES ('x')")
+    conn.close()
+
+
+def test_reader_not_blocked_by_open_write_transaction(db_path):
+    writer = connect(db_path)
+    reader = connect(db_path, readonly=True)
+    with write_transaction(writer):
+        writer.execute("INSERT INTO items (name) VALUES ('pending')")
+        # The reader sees the last committed state without waiting for the writer
+        assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    assert reader.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+
+def test_write_transaction_rolls_back_on_error(db_path):
+    conn = connect(db_path)
+    with pytest.raises(ValueError):
+        with write_transaction(conn):
+            conn.execute("INSERT INTO items (name) VALUES ('lost')")
+            raise ValueError("boom")
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_nested_write_transaction_joins_outer(db_path):
+    conn = connect(db_path)
+    with pytest.raises(ValueError):
+        with write_transaction(conn):
+            with write_transaction(conn):
+                conn.execute("INSERT INTO items (name) VALUES ('inner')")
+            raise ValueError("outer fails")
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'DB_BUSY_TIMEOUT_MS', 10)
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'DB_WRITE_RETRIES', 3)
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'DB_RETRY_BASE_DELAY_MS', 5)
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'DB_RETRY_MAX_DELAY_MS', 20)
+
+
+def test_busy_database_gives_up_with_database_busy_error(db_path, fast_retries):
+    other_process = sqlite3.connect(db_path)  # Not covered by the in-process writer lock
+    other_process.execute("BEGIN IMMEDIATE")
+    conn = connect(db_path)
+    before = get_lock_stats().get('background', {}).get('busy_errors', 0)
+    with pytest.raises(DatabaseBusyError):
+        with write_transaction(conn):
+            conn.execute("INSERT INTO items (name) VALUES ('never')")
+    assert get_lock_stats()['background']['busy_errors'] == before + 1
+    other_process.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+
+def test_busy_database_is_retried_until_lock_is_released(db_path, fast_retries, monkeypatch):
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'DB_WRITE_RETRIES', 50)
+    other_process = sqlite3.connect(db_path, check_same_thread=False)
+    other_process.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.05, other_process.rollback).start()
+    conn = connect(db_path)
+    with write_transaction(conn):
+        conn.execute("INSERT INTO items (name) VALUES ('after retry')")
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 1
+
+
+def test_orders_change_seq_follows_new_orders_and_status_changes(tmp_path):
+    path = str(tmp_path / "shop.db")
+    app = Flask(__name__)
+    app.config['DATABASE'] = path
+    with app.app_context():
+        init_db()
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    with conn:  # A database from before change_seq, with two orders
+        for statement in ("DROP TRIGGER orders_created", "DROP TRIGGER orders_status_changed",
+                          "DROP INDEX idx_orders_change_seq", "ALTER TABLE orders DROP COLUMN change_seq"):
+            conn.execute(statement)
+        conn.execute("INSERT INTO orders (user_id, total_amount) VALUES (1, 10), (1, 20)")
+    with app.app_context():
+        init_db()
+    assert get_last_order_change(conn) == 2
+
+    with conn:
+        conn.execute("INSERT INTO orders (user_id, total_amount) VALUES (1, 30)")
+        conn.execute("UPDATE orders SET status = 'Підтверджено' WHERE id = 1")
+        conn.execute("UPDATE orders SET status = 'Очікується', total_amount = 25 WHERE id = 2")  # Same status
+    orders, more = load_order_changes(2, 10, conn)
+    assert [(order['id'], order['change_seq']) for order in orders] == [(3, 3), (1, 4)]
+    assert not more
+
+
+@pytest.fixture
+def slow_queries(monkeypatch):
+    """Every statement counts as slow; the statistics start empty."""
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'SLOW_QUERY_MS', 1e-9)
+    monkeypatch.setattr(db_module, '_slow_query_stats', {})
+    monkeypatch.setattr(db_module, '_recent_slow_queries', collections.deque(maxlen=db_module.SLOW_QUERIES_KEPT))
+    monkeypatch.setattr(db_module.slow_query_log, 'handlers', [])  # Only the files a test configures
+    yield
+    for handler in db_module.slow_query_log.handlers:
+        handler.close()
+
+
+def test_normalize_sql():
+    assert (normalize_sql("SELECT *  FROM items\n WHERE name = 'it''s' AND id IN (?, ?,?) AND price > 10.5 LIMIT 5")
+            == "SELECT * FROM items WHERE name = ? AND id IN (?, ...) AND price > ? LIMIT ?")
+    assert normalize_sql("SELECT col1 FROM t2") == "SELECT col1 FROM t2"
+    assert normalize_sql("SELECT a, -- Recipient's name\n b FROM t /* 2 */") == "SELECT a, b FROM t"
+
+
+def test_slow_queries_are_logged_with_their_plan_once(db_path, slow_queries, tmp_path, monkeypatch):
+    log_path = tmp_path / 'slow.log'
+    configure_slow_query_log(str(log_path), 1024 * 1024, 1)
+    configure_slow_query_log(str(log_path), 1024 * 1024, 1)  # Not added twice
+    explained = []
+    explain = db_module._explain
+    monkeypatch.setattr(db_module, '_explain', lambda *args: explained.append(args[1]) or explain(*args))
+
+    conn = connect(db_path)
+    conn.executemany("INSERT INTO items (name) VALUES (?)", [('a',), ('b',)])
+    for item_id in (1, 2):
+        conn.execute("SELECT name FROM items WHERE id = ?", (item_id,)).fetchone()
+    conn.execute("SELECT name FROM items WHERE id IN (1, 2)").fetchall()
+
+    top, recent = get_slow_queries()
+    select = next(stats for stats in top if stats['sql'] == "SELECT name FROM items WHERE id = ?")
+    assert select['count'] == 2 and select['routes'] == ['background']
+    assert select['plan'] == ['SEARCH items USING INTEGER PRIMARY KEY (rowid=?)']
+    assert explained.count("SELECT name FROM items WHERE id = ?") == 1
+    assert recent[0]['sql'] == "SELECT name FROM items WHERE id IN (?, ...)"
+    assert recent[-1]['parameters'] == '2 x (str)'
+    assert recent[1]['parameters'] == '(int)'
+
+    for handler in db_module.slow_query_log.handlers:
+        handler.flush()
+    log = log_path.read_text(encoding='utf-8')
+    assert log.count("SELECT name FROM items WHERE id = ? (int)") == 2
+    assert log.count("SEARCH items USING INTEGER PRIMARY KEY") == 2  # Once per statement: 'id = ?', 'id IN'
+    assert "'a'" not in log  # Parameter values are never logged
+
+
+def test_fast_queries_are_not_recorded(db_path, slow_queries, monkeypatch):
+    monkeypatch.setitem(db_module.DEFAULT_SETTINGS, 'SLOW_QUERY_MS', 0)  # Off
+    connect(db_path).execute("SELECT COUNT(*) FROM items").fetchone()
+    assert get_slow_queries() == ([], [])
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+import pytest
+
+from app.db import DatabaseBusyError
+from app.group_commit import GroupCommitWriter
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+    conn.commit()
+    conn.close()
+    writer = GroupCommitWriter(path, max_delay=0.02, max_batch=16)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def count_items(writer):
+    conn = sqlite3.connect(writer.database)
+    count = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_concurrent_operations_are_all_committed(writer):
+    results = []
+
+    def worker(i):
+        future = writer.submit(lambda db: db.execute("INSERT INTO items (name) VALUES (?)", (f"item{i}",)).lastrowid)
+        results.append(future.result(timeout=5))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 40
+    # Acknowledged means committed: another connection already sees every row
+    assert count_items(writer) == 40
+
+
+def test_failing_operation_does_not_affect_batch(writer):
+    ok = writer.submit(lambda db: db.execute("INSERT INTO items (name) VALUES ('a')"))
+    duplicate = writer.submit(lambda db: db.execute("INSERT INTO items (name) VALUES ('a')"))
+    other = writer.submit(lambda db: db.execute("INSERT INTO items (name) VALUES ('b')"))
+
+    ok.result(timeout=5)
+    other.result(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(timeout=5)
+    assert count_items(writer) == 2
+
+
+def test_queued_operation_is_withdrawn_when_the_writer_is_stuck(writer):
+    release = threading.Event()
+    writer.timeout = 0.1
+    blocked = writer.submit(lambda db: release.wait(5))
+    with pytest.raises(DatabaseBusyError):
+        writer.execute(lambda db: db.execute("INSERT INTO items (name) VALUES ('late')"))
+    release.set()
+    blocked.result(timeout=5)
+    assert writer.execute(lambda db: db.execute("SELECT COUNT(*) FROM items WHERE name = 'late'").fetchone()[0]) == 0
+
+
+def test_pending_operations_fail_when_the_writer_thread_fails(writer, monkeypatch):
+    def broken_commit(conn, batch):
+        raise RuntimeError('writer bug')
+
+    monkeypatch.setattr(writer, '_commit', broken_commit)
+    future = writer.submit(lambda db: None)
+    with pytest.raises(RuntimeError, match='writer bug'):
+        future.result(timeout=5)
+    writer._thread.join(timeout=5)
+    assert not writer.is_alive()
+
+
+def test_writer_that_cannot_open_the_database_does_not_hang_requests(tmp_path):
+    writer = GroupCommitWriter(str(tmp_path / 'missing' / 'test.db'), timeout=0.1)
+    writer.start()
+    writer._thread.join(timeout=5)
+    assert not writer.is_alive()
+    with pytest.raises(DatabaseBusyError):
+        writer.execute(lambda db: None)
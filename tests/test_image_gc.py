@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import time
+
+from app.image_gc import collect_garbage, find_orphans
+
+
+def make_tree(tmp_path):
+    database = str(tmp_path / "test.db")
+    conn = sqlite3.connect(database)
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, image_url TEXT)")
+    conn.execute("INSERT INTO products (image_url) VALUES ('static/images/aaaaaaaaaaaaaaaa.jpg'), (NULL)")
+    conn.commit()
+    conn.close()
+
+    folder = tmp_path / "images"
+    (folder / "variants").mkdir(parents=True)
+    for name in ("aaaaaaaaaaaaaaaa.jpg", "bbbbbbbbbbbbbbbb.jpg", "flower1.jpg", ".upload-abc",
+                 "variants/aaaaaaaaaaaaaaaa-320w.webp", "variants/bbbbbbbbbbbbbbbb-320w.webp"):
+        (folder / name).write_bytes(b"x" * 100)
+    old = time.time() - 7200
+    for root, _, names in os.walk(folder):
+        for name in names:
+            os.utime(os.path.join(root, name), (old, old))
+    return database, str(folder)
+
+
+def test_find_orphans_diffs_folder_against_products(tmp_path):
+    database, folder = make_tree(tmp_path)
+    conn = sqlite3.connect(database)
+    scanned, orphans = find_orphans(conn, folder)
+    assert scanned == 6
+    assert sorted(os.path.relpath(path, folder) for path in orphans) == [
+        ".upload-abc", "bbbbbbbbbbbbbbbb.jpg", os.path.join("variants", "bbbbbbbbbbbbbbbb-320w.webp")]
+
+    os.utime(os.path.join(folder, "bbbbbbbbbbbbbbbb.jpg"))  # Just uploaded: too young to collect
+    _, orphans = find_orphans(conn, folder)
+    assert os.path.join(folder, "bbbbbbbbbbbbbbbb.jpg") not in orphans
+
+
+def test_collect_garbage_quarantines_then_purges(tmp_path):
+    database, folder = make_tree(tmp_path)
+    quarantine = str(tmp_path / "quarantine")
+
+    report = collect_garbage(database, folder, quarantine)
+    assert (report.quarantined, report.quarantined_bytes, report.purged) == (3, 300, 0)
+    assert sorted(os.listdir(folder)) == ["aaaaaaaaaaaaaaaa.jpg", "flower1.jpg", "variants"]
+
+    report = collect_garbage(database, folder, quarantine, retention=0)
+    assert (report.quarantined, report.purged, report.purged_bytes) == (0, 3, 300)
+    assert os.listdir(quarantine) == []
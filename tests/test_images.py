@@ -0,0 +1,97 @@
+import io
+import os
+import threading
+import pytest
+from PIL import Image
+
+from app.images import (ImageProcessor, UploadError, create_variants, image_variants, is_content_addressed,
+                        remove_variants, sniff_image_type, stage_upload, store_upload, variant_paths)
+
+
+def make_image(tmp_path, size=(800, 400)):
+    folder = tmp_path / "static" / "images"
+    folder.mkdir(parents=True)
+    path = str(folder / "rose.jpg")
+    Image.new('RGB', size, (200, 30, 60)).save(path, 'JPEG')
+    return path
+
+
+def test_create_variants_does_not_upscale(tmp_path):
+    path = make_image(tmp_path)
+    info = create_variants(path, (320, 640, 1280))
+    assert info.widths == [320, 640, 800]
+    assert (info.width, info.height) == (800, 400)
+    colour = [int(info.placeholder[i:i + 2], 16) for i in (1, 3, 5)]
+    assert all(abs(a - b) <= 4 for a, b in zip(colour, (200, 30, 60)))  # JPEG shifts the colour slightly
+    for width in (320, 640, 800):
+        for variant in variant_paths(path, width).values():
+            with Image.open(variant) as image:
+                assert image.size == (width, width // 2)
+
+
+def test_image_variants_builds_srcset(tmp_path):
+    path = make_image(tmp_path)
+    static_folder = str(tmp_path / "static")
+    assert image_variants('static/images/rose.jpg', static_folder, lambda p: f"/static/{p}") is None
+
+    create_variants(path, (320, 640))
+    variants = image_variants('static/images/rose.jpg', static_folder, lambda p: f"/static/{p}")
+    assert variants['webp'] == ("/static/images/variants/rose-320w.webp 320w, "
+                                "/static/images/variants/rose-640w.webp 640w")
+    assert variants['src'] == "/static/images/variants/rose-640w.jpg"
+
+
+def test_remove_variants(tmp_path):
+    path = make_image(tmp_path)
+    create_variants(path, (320,))
+    remove_variants(path)
+    assert os.listdir(os.path.join(os.path.dirname(path), 'variants')) == []
+
+
+def jpeg_bytes(size=(40, 20)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 40)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def test_identical_uploads_share_one_file(tmp_path):
+    folder = str(tmp_path)
+    first = stage_upload(io.BytesIO(jpeg_bytes()), folder)
+    second = stage_upload(io.BytesIO(jpeg_bytes()), folder)
+    assert first.filename == second.filename
+    assert is_content_addressed(first.filename)
+    assert store_upload(first, folder) == store_upload(second, folder)
+    assert sorted(os.listdir(folder)) == [first.filename]
+
+
+def test_is_content_addressed():
+    assert is_content_addressed('images/0123456789abcdef.jpg')
+    assert is_content_addressed('images/variants/0123456789abcdef-320w.webp')
+    assert not is_content_addressed('images/flower1.jpg')
+
+
+def test_sniff_image_type_uses_magic_bytes():
+    assert sniff_image_type(jpeg_bytes()) == 'jpg'
+    assert sniff_image_type(b'\x89PNG\r\n\x1a\n' + b'\x00' * 8) == 'png'
+    assert sniff_image_type(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == 'webp'
+    assert sniff_image_type(b'<?php echo "not an image"; ?>') is None
+
+
+def test_stage_upload_rejects_unsupported_and_oversized_files(tmp_path):
+    folder = str(tmp_path)
+    with pytest.raises(UploadError):
+        stage_upload(io.BytesIO(b'GIF89a' + b'\x00' * 10), folder, allowed_types={'jpg', 'png'})
+    with pytest.raises(UploadError):
+        stage_upload(io.BytesIO(jpeg_bytes((400, 400)) + b'\x00' * 200_000), folder, max_bytes=100_000)
+    assert os.listdir(folder) == []  # No temporary file left behind
+
+
+def test_image_processor_runs_inline_when_queue_is_full():
+    processor = ImageProcessor(max_workers=1, max_pending=1)
+    release = threading.Event()
+    ran_on = []
+    processor.submit(release.wait)  # Occupies the only slot
+    processor.submit(lambda: ran_on.append(threading.current_thread().name))
+    release.set()
+    processor.shutdown()
+    assert ran_on == [threading.current_thread().name]
@@ -0,0 +1,125 @@
+import json
+import logging
+import sys
+import threading
+
+import pytest
+
+from app import create_app
+from app.logs import JsonFormatter, QueuedHandler
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    """The records of the 'app' loggers, passed through a QueuedHandler like configure_logging() does."""
+    target = ListHandler()
+    handler = QueuedHandler(target)
+    logger = logging.getLogger('app')
+    logger.addHandler(handler)
+    yield handler, target.records
+    logger.removeHandler(handler)
+    handler.close()
+
+
+def make_app(tmp_path, **config):
+    return create_app(dict({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db')}, **config))
+
+
+def test_json_records_carry_extra_fields_and_the_traceback():
+    try:
+        raise ValueError('bad')
+    except ValueError:
+        record = logging.getLogger('app.test').makeRecord('app.test', logging.ERROR, __file__, 1, "Failed %s", ('x',),
+                                                          sys.exc_info(), extra={'order_id': 7})
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'Failed x'
+    assert entry['level'] == 'ERROR' and entry['logger'] == 'app.test'
+    assert entry['order_id'] == 7
+    assert 'ValueError: bad' in entry['exception']
+
+
+def test_requests_are_logged_with_their_id_user_and_duration(tmp_path, captured):
+    handler, records = captured
+    app = make_app(tmp_path, LOG_REQUEST_SAMPLE_RATE=1)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+
+    response = client.get('/', headers={'X-Request-ID': 'edge-42'})
+    assert response.headers['X-Request-ID'] == 'edge-42'
+    assert len(client.get('/', headers={'X-Request-ID': 'bad id <script>'}).headers['X-Request-ID']) == 32
+    handler.flush()
+
+    logged = [record for record in records if record.name == 'app.logs.requests']
+    assert len(logged) == 2
+    record = logged[0]
+    assert (record.request_id, record.user_id, record.endpoint) == ('edge-42', 1, 'catalog.home')
+    assert record.status == 200 and record.duration_ms >= 0 and record.sample_rate == 1
+    assert record.getMessage().startswith('GET / 200 ')
+    assert json.loads(JsonFormatter().format(record))['request_id'] == 'edge-42'
+
+
+def test_ordinary_requests_are_sampled_but_slow_ones_always_logged(tmp_path, captured):
+    handler, records = captured
+    client = make_app(tmp_path, LOG_REQUEST_SAMPLE_RATE=0).test_client()
+    client.get('/')
+    handler.flush()
+    assert not [record for record in records if record.name == 'app.logs.requests']
+
+    client = make_app(tmp_path, LOG_REQUEST_SAMPLE_RATE=0, LOG_SLOW_REQUEST_MS=0).test_client()
+    client.get('/')
+    handler.flush()
+    logged = [record for record in records if record.name == 'app.logs.requests']
+    assert [record.levelno for record in logged] == [logging.WARNING]
+
+
+def test_logging_does_not_wait_for_the_write():
+    release = threading.Event()
+
+    class SlowHandler(ListHandler):
+        def emit(self, record):
+            release.wait(5)
+            super().emit(record)
+
+    target = SlowHandler()
+    handler = QueuedHandler(target)
+    logger = logging.getLogger('app.test.slow')
+    logger.addHandler(handler)
+    try:
+        logger.warning("first")
+        logger.warning("second")  # Returns while the first is still being written
+        assert target.records == []
+        release.set()
+        handler.flush()
+        assert [record.getMessage() for record in target.records] == ['first', 'second']
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def test_a_forked_process_starts_its_own_writer_thread():
+    target = ListHandler()
+    handler = QueuedHandler(target)
+    logger = logging.getLogger('app.test.fork')
+    logger.addHandler(handler)
+    try:
+        logger.warning("parent")
+        parent_listener = handler.listener
+        handler.pid = -1  # As seen from a forked child
+        logger.warning("child")
+        assert handler.listener is not parent_listener
+        handler.flush()
+        assert 'child' in [record.getMessage() for record in target.records]
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        parent_listener.stop()
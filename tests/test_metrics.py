@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import create_app
+from app.metrics import observe_http
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    return create_app({'TESTING': True, 'DATABASE': str(tmp_path_factory.mktemp('metrics') / 'app.db'),
+                       'METRICS_ENABLED': True})
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_requests_are_timed_with_their_sql_statements(app):
+    before = {
+        'requests': sample('flowerstream_requests_total', endpoint='catalog.home', method='GET', status='200'),
+        'latency': sample('flowerstream_request_duration_seconds_count', endpoint='catalog.home', method='GET'),
+        'statements': sample('flowerstream_request_sql_statements_sum', endpoint='catalog.home'),
+        'renders': sample('flowerstream_template_render_seconds_count', template='home.html'),
+        'missing': sample('flowerstream_requests_total', endpoint='unmatched', method='GET', status='404'),
+    }
+    client = app.test_client()
+    assert client.get('/').status_code == 200
+    assert client.get('/no-such-page').status_code == 404
+
+    assert sample('flowerstream_requests_total', endpoint='catalog.home', method='GET', status='200') == before['requests'] + 1
+    assert sample('flowerstream_request_duration_seconds_count', endpoint='catalog.home', method='GET') == before['latency'] + 1
+    assert sample('flowerstream_request_sql_statements_sum', endpoint='catalog.home') >= before['statements'] + 1
+    assert sample('flowerstream_template_render_seconds_count', template='home.html') == before['renders'] + 1
+    assert sample('flowerstream_requests_total', endpoint='unmatched', method='GET', status='404') == before['missing'] + 1
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'flowerstream_request_duration_seconds_bucket{endpoint="catalog.home"' in body
+
+
+def test_streamed_page_counts_statements_run_while_streaming(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['is_admin'] = True
+    before = sample('flowerstream_request_sql_statements_count', endpoint='admin.admin_orders')
+    statements = sample('flowerstream_request_sql_statements_sum', endpoint='admin.admin_orders')
+    response = client.get('/admin/orders')
+    assert response.is_streamed
+    response.get_data()
+    response.close()
+    assert sample('flowerstream_request_sql_statements_count', endpoint='admin.admin_orders') == before + 1
+    assert sample('flowerstream_request_sql_statements_sum', endpoint='admin.admin_orders') >= statements + 2
+
+
+def test_outbound_http_calls_are_timed():
+    before = sample('flowerstream_outbound_http_duration_seconds_count', service='nbu', outcome='error')
+    with pytest.raises(ConnectionError):
+        with observe_http('nbu'):
+            raise ConnectionError('unreachable')
+    assert sample('flowerstream_outbound_http_duration_seconds_count', service='nbu', outcome='error') == before + 1
+
+
+def test_metrics_token_and_disabling(tmp_path):
+    app = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db'), 'METRICS_ENABLED': True,
+                      'METRICS_TOKEN': 's3cret'})
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
+
+    for config in ({}, {'METRICS_ENABLED': False}):  # Off unless enabled
+        app = create_app(dict({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db')}, **config))
+        assert app.test_client().get('/metrics').status_code == 404
+        assert 'metrics' not in app.blueprints
+
+
+def test_metrics_of_all_worker_processes_are_added_up(tmp_path):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path / 'metrics'), DATABASE=str(tmp_path / 'app.db'))
+    os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+    worker = textwrap.dedent("""
+        import sys
+        from app import create_app
+        client = create_app({'TESTING': True, 'METRICS_ENABLED': True}).test_client()
+        for _ in range(int(sys.argv[1])):
+            client.get('/')
+        if sys.argv[2] == 'scrape':
+            sys.stdout.write(client.get('/metrics').get_data(as_text=True))
+    """)
+    subprocess.run([sys.executable, '-c', worker, '2', ''], env=env, cwd=ROOT_DIR, check=True, capture_output=True)
+    scrape = subprocess.run([sys.executable, '-c', worker, '3', 'scrape'], env=env, cwd=ROOT_DIR, check=True,
+                            capture_output=True, text=True).stdout
+    assert 'flowerstream_requests_total{endpoint="catalog.home",method="GET",status="200"} 5.0' in scrape
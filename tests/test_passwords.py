@@ -0,0 +1,76 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.password_worker import lower_priority
+from app.passwords import HasherBusyError, PasswordHasher, needs_rehash
+
+
+def test_needs_rehash():
+    assert not needs_rehash(generate_password_hash('secret', 'scrypt:16384:8:1'), 'scrypt:16384:8:1')
+    assert needs_rehash(generate_password_hash('secret', 'scrypt:16384:8:1'), 'scrypt:32768:8:1')
+    assert needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:1000'), 'scrypt:32768:8:1')
+
+
+def test_worker_priority_is_left_alone_without_os_nice(monkeypatch):
+    monkeypatch.delattr('os.nice', raising=False)  # As on Windows
+    lower_priority(10)
+
+
+@pytest.mark.parametrize('max_workers', [0, 1])
+def test_hash_and_verify(max_workers):
+    hasher = PasswordHasher('scrypt:16384:8:1', max_workers=max_workers)
+    try:
+        password_hash = hasher.hash('secret')
+        assert password_hash.startswith('scrypt:16384:8:1$')
+        assert hasher.verify(password_hash, 'secret')
+        assert not hasher.verify(password_hash, 'Secret')
+    finally:
+        hasher.shutdown()
+
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(max_workers=1, max_pending=1)
+    try:
+        hasher._slots.acquire()  # A hash already waiting
+        with pytest.raises(HasherBusyError):
+            hasher.verify('scrypt:32768:8:1$salt$hash', 'secret')
+    finally:
+        hasher._slots.release()
+        hasher.shutdown()
+
+
+def test_a_killed_worker_is_replaced():
+    hasher = PasswordHasher('scrypt:16384:8:1', max_workers=1)
+    try:
+        password_hash = hasher.hash('secret')
+        for process in list(hasher._executor._processes.values()):  # As the OOM killer would
+            process.kill()
+            process.join()
+        assert hasher.verify(password_hash, 'secret')
+        assert hasher.hash('secret').startswith('scrypt:16384:8:1$')
+    finally:
+        hasher.shutdown()
+
+
+def test_a_hash_without_result_in_time_is_answered_busy():
+    hasher = PasswordHasher(max_workers=1, max_pending=1, timeout=0.1)
+    try:
+        with pytest.raises(HasherBusyError):
+            hasher._run(time.sleep, 1)
+        assert hasher._slots.acquire(blocking=False)  # The slot was given back
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.skipif('forkserver' not in multiprocessing.get_all_start_methods(), reason="Unix only")
+def test_workers_are_not_forked_from_the_app_process():
+    hasher = PasswordHasher(max_workers=1)
+    try:
+        assert hasher._run(os.getppid) != os.getpid()  # Their parent is the forkserver
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,118 @@
+import os
+import pstats
+
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    return create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db'),
+                       'PROFILE_DIR': str(tmp_path / 'profiles'), 'PROFILE_MAX_FILES': 3})
+
+
+def log_in(client, admin=True):
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['is_admin'] = admin
+
+
+def profiles(app):
+    directory = app.config['PROFILE_DIR']
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_admin_requests_are_profiled_on_request(app):
+    client = app.test_client()
+    log_in(client)
+    assert 'X-Profile' not in client.get('/').headers
+    assert profiles(app) == []
+
+    response = client.get('/?profile=1')
+    assert response.status_code == 200
+    name = response.headers['X-Profile']
+    assert name.endswith(f'-catalog.home-{os.getpid()}.prof')
+    assert profiles(app) == [name]
+    stats = pstats.Stats(os.path.join(app.config['PROFILE_DIR'], name))
+    assert any(function == 'home' for _, _, function in stats.stats)
+
+    response = client.get('/admin/orders', headers={'X-Profile': '1'})
+    response.get_data()
+    response.close()  # The profile is stored once the streamed page has been sent
+    assert response.headers['X-Profile'].endswith('-admin.admin_orders-%d.prof' % os.getpid())
+    assert response.headers['X-Profile'] in profiles(app)
+
+
+def test_only_administrators_can_profile(app):
+    client = app.test_client()
+    assert 'X-Profile' not in client.get('/?profile=1').headers
+    log_in(client, admin=False)
+    assert 'X-Profile' not in client.get('/', headers={'X-Profile': '1'}).headers
+    assert client.post('/admin/profiling/toggle').status_code == 302
+    assert 'X-Profile' not in client.get('/').headers
+    assert profiles(app) == []
+
+
+def test_static_files_and_anonymous_requests_leave_the_session_unread(app):
+    client = app.test_client()
+    assert 'Cookie' not in client.get('/static/css/site.css').vary
+    log_in(client)
+    client.post('/admin/profiling/toggle')
+    response = client.get('/static/css/site.css')
+    assert 'X-Profile' not in response.headers and 'Cookie' not in response.vary
+    assert profiles(app) == []
+
+
+def test_only_the_exact_query_flag_profiles(app):
+    client = app.test_client()
+    log_in(client)
+    assert 'X-Profile' not in client.get('/?noprofile=10').headers
+    assert 'X-Profile' not in client.get('/?profile=10').headers
+    assert 'X-Profile' in client.get('/?profile=1').headers
+
+
+def test_session_switch_profiles_redirected_checkout_success(app):
+    client = app.test_client()
+    log_in(client)
+    client.post('/admin/profiling/toggle')
+    with client.session_transaction() as sess:
+        sess['cart'] = [{'id': 1, 'name': 'Троянда', 'price': 50.0, 'quantity': 1}]
+
+    response = client.get('/checkout/success?session_id=cs_test')
+    assert response.status_code == 302
+    assert '-orders.checkout_success-' in response.headers['X-Profile']
+
+    client.post('/admin/profiling/toggle')
+    assert 'X-Profile' not in client.get('/').headers
+
+
+def test_only_the_newest_profiles_are_kept_and_listed(app):
+    client = app.test_client()
+    log_in(client)
+    names = [client.get('/?profile=1').headers['X-Profile'] for _ in range(5)]
+    assert profiles(app) == names[-3:]
+
+    page = client.get('/admin_dashboard').get_data(as_text=True)
+    assert names[-1] in page and names[0] not in page
+
+    report = client.get(f'/admin/profiles/{names[-1]}?sort=tottime')
+    assert report.status_code == 200
+    assert 'function calls' in report.get_data(as_text=True)
+    download = client.get(f'/admin/profiles/{names[-1]}/download')
+    assert download.data == open(os.path.join(app.config['PROFILE_DIR'], names[-1]), 'rb').read()
+    assert client.get(f'/admin/profiles/{names[0]}').status_code == 404
+    assert client.get('/admin/profiles/..%2Fapp.db').status_code == 404
+
+    log_in(client, admin=False)
+    assert client.get(f'/admin/profiles/{names[-1]}/download').status_code == 403
+
+
+def test_profiling_can_be_disabled(tmp_path):
+    app = create_app({'TESTING': True, 'DATABASE': str(tmp_path / 'app.db'), 'PROFILING_ENABLED': False,
+                      'PROFILE_DIR': str(tmp_path / 'profiles')})
+    client = app.test_client()
+    log_in(client)
+    assert 'X-Profile' not in client.get('/?profile=1').headers
+    assert 'profiling' not in app.blueprints
+    assert 'Профілі запитів' not in client.get('/admin_dashboard').get_data(as_text=True)
@@ -0,0 +1,28 @@
+import sqlite3
+import pytest
+
+from app.query_audit import collect_statements, seed_database, audit, format_report
+
+STATEMENTS = collect_statements()
+
+
+@pytest.fixture(scope='session')
+def query_plan_results(tmp_path_factory, pytestconfig):
+    db_file = tmp_path_factory.mktemp('audit') / 'audit.db'
+    seed_database(str(db_file), rows=5000)
+    conn = sqlite3.connect(str(db_file))
+    results = audit(conn, STATEMENTS)
+    conn.close()
+    pytestconfig._query_plan_results = results
+    return {result.statement: result for result in results}
+
+
+def test_statements_are_collected():
+    functions = {s.function for s in STATEMENTS}
+    assert {'load_products_from_db', 'load_user_orders', 'iter_admin_orders', 'init_db'} <= functions
+
+
+@pytest.mark.parametrize('statement', STATEMENTS, ids=[f"{s.function}:{s.lineno}" for s in STATEMENTS])
+def test_query_uses_index(statement, query_plan_results):
+    result = query_plan_results[statement]
+    assert not result.problems, format_report([result])
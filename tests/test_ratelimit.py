@@ -0,0 +1,44 @@
+import pytest
+
+from app.ratelimit import Limit, MemoryBucketStore, RateLimiter, SqliteBucketStore, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits('search=30/60, add_review=5/1.5,') == {'search': Limit(30, 60.0), 'add_review': Limit(5, 1.5)}
+    with pytest.raises(ValueError):
+        parse_limits('search=30')
+
+
+@pytest.mark.parametrize('make_store', [lambda tmp_path: MemoryBucketStore(),
+                                        lambda tmp_path: SqliteBucketStore(str(tmp_path / 'limits.db'))],
+                         ids=['memory', 'sqlite'])
+def test_bucket_bursts_then_refills(make_store, tmp_path):
+    limiter = RateLimiter({'search': Limit(3, 30)}, make_store(tmp_path))  # 3 at once, then one per 10 s
+    assert [limiter.check('search', ['ip:1'], now=100) for _ in range(3)] == [0, 0, 0]
+    assert limiter.check('search', ['ip:1'], now=100) == pytest.approx(10)
+    assert limiter.check('search', ['ip:2'], now=100) == 0
+    assert limiter.check('search', ['ip:1'], now=105) == pytest.approx(5)  # Refused requests take nothing
+    assert limiter.check('search', ['ip:1'], now=110) == 0
+    assert limiter.check('home', ['ip:1'], now=110) == 0  # No budget: not limited
+
+
+def test_any_exhausted_key_refuses():
+    limiter = RateLimiter({'add_review': Limit(1, 60)}, MemoryBucketStore())
+    assert limiter.check('add_review', ['ip:1', 'user:1'], now=0) == 0
+    assert limiter.check('add_review', ['ip:2', 'user:1'], now=1) == pytest.approx(59)  # Same user, other IP
+
+
+def test_sqlite_buckets_are_shared(tmp_path):
+    path = str(tmp_path / 'limits.db')
+    worker_a = RateLimiter({'search': Limit(2, 60)}, SqliteBucketStore(path))
+    worker_b = RateLimiter({'search': Limit(2, 60)}, SqliteBucketStore(path))
+    assert worker_a.check('search', ['ip:1'], now=0) == 0
+    assert worker_b.check('search', ['ip:1'], now=0) == 0
+    assert worker_a.check('search', ['ip:1'], now=0) == pytest.approx(30)
+
+
+def test_memory_store_is_bounded():
+    store = MemoryBucketStore(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        store.take(key, 5, 1, now=0)
+    assert list(store._buckets) == ['b', 'c']
@@ -0,0 +1,120 @@
+import asyncio
+import sqlite3
+
+import pytest
+from flask import Flask
+
+from app.db import STOCK_CHANGES_KEPT, init_db
+from app.stock_feed import StockNotifier, format_event, load_stock_changes, parse_product_ids
+
+
+class InlineReads:
+    """Runs the notifier's queries directly on one connection (asgi.ReadExecutor runs them on threads)."""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def run(self, query, *args):
+        return query(*args, db=self.db)
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = str(tmp_path / 'stock.db')
+    app = Flask(__name__)
+    app.config['DATABASE'] = database
+    with app.app_context():
+        init_db()
+    conn = sqlite3.connect(database)
+    yield conn
+    conn.close()
+
+
+def set_stock(db, product_id, stock):
+    with db:
+        db.execute("UPDATE products SET stock = ? WHERE id = ?", (stock, product_id))
+
+
+def test_triggers_record_stock_changes_only(db):
+    set_stock(db, 1, 7)
+    with db:
+        db.execute("UPDATE products SET name = 'Троянда', stock = stock WHERE id = 2")  # Stock unchanged
+        db.execute("DELETE FROM products WHERE id = 3")
+    assert [tuple(row[1:]) for row in load_stock_changes(0, db=db)] == [(1, 7), (3, 0)]
+
+
+def test_stock_changes_are_pruned(db):
+    with db:
+        for stock in range(STOCK_CHANGES_KEPT + 50):
+            db.execute("UPDATE products SET stock = ? WHERE id = 1", (stock,))
+    count, first, last = db.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM stock_changes").fetchone()
+    assert count == STOCK_CHANGES_KEPT
+    assert last - first == STOCK_CHANGES_KEPT - 1
+
+
+def test_parse_product_ids_and_format_event():
+    assert parse_product_ids('3,1,x,3,,2', limit=10) == [3, 1, 2]
+    assert parse_product_ids('1,2,3', limit=2) == [1, 2]
+    assert parse_product_ids(None, limit=2) == []
+    assert format_event({1: 0}) == 'event: stock\ndata: {"1": 0}\n\n'
+
+
+def test_notifier_fans_out_coalesced_levels(db):
+    async def scenario():
+        notifier = StockNotifier(InlineReads(db))
+        await notifier.start()
+        try:
+            first = notifier.subscribe([1, 2])
+            second = notifier.subscribe([3])
+            assert await first.next(0.1) == {1: 50, 2: 75}  # Current levels first
+            assert await second.next(0.1) == {3: 30}
+
+            for stock in (49, 48, 47):  # A burst of orders between two polls
+                set_stock(db, 1, stock)
+            set_stock(db, 3, 0)
+            assert await notifier.poll() == 2
+            assert await first.next(0.1) == {1: 47}
+            assert await second.next(0.1) == {3: 0}
+
+            set_stock(db, 2, 10)
+            await notifier.poll()
+            assert await second.next(0.05) == {}  # Not showing product 2
+
+            notifier.unsubscribe(first)
+            assert notifier.subscription_count == 1
+            assert await notifier.poll() == 0  # Nothing new
+        finally:
+            await notifier.stop()
+
+    asyncio.run(scenario())
+
+
+def test_notifier_reloads_levels_after_missing_changes(db):
+    async def scenario():
+        notifier = StockNotifier(InlineReads(db))
+        await notifier.start()
+        subscription = notifier.subscribe([1])
+        await subscription.next(0.1)
+        set_stock(db, 1, 5)
+        with db:  # As if this worker had fallen further behind than the rows kept
+            db.execute("DELETE FROM stock_changes")
+        set_stock(db, 2, 1)
+        assert await notifier.poll() == 2
+        assert await subscription.next(0.1) == {1: 5}
+        assert notifier.levels[2] == 1
+        await notifier.stop()
+
+    asyncio.run(scenario())
+
+
+def test_notifier_polls_in_the_background(db):
+    async def scenario():
+        notifier = StockNotifier(InlineReads(db), interval=0.01)
+        await notifier.start()
+        subscription = notifier.subscribe([4])
+        await subscription.next(0.1)
+        set_stock(db, 4, 3)
+        assert await subscription.next(1) == {4: 3}
+        await notifier.stop()
+
+    asyncio.run(scenario())
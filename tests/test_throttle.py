@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+from app.throttle import SlidingWindowThrottle
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE login_attempts (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, attempted_at REAL)")
+    yield conn
+    conn.close()
+
+
+def test_window_slides():
+    throttle = SlidingWindowThrottle(max_attempts=3, window=60)
+    for now in (0, 10, 20):
+        assert throttle.retry_after('ip:1', now=now) == 0
+        throttle.record('ip:1', now=now)
+    assert throttle.retry_after('ip:1', now=30) == 30  # Until the attempt at 0 leaves the window
+    assert throttle.retry_after('ip:2', now=30) == 0
+    assert throttle.retry_after('ip:1', now=60) == 0
+    throttle.record('ip:1', now=60)
+    assert throttle.retry_after('ip:1', now=61) == 9
+
+
+def test_attempts_are_shared_through_the_table(db):
+    worker_a = SlidingWindowThrottle(max_attempts=2, window=60)
+    worker_b = SlidingWindowThrottle(max_attempts=2, window=60)
+    worker_a.record('user:bob', db, now=0)
+    worker_b.record('user:bob', db, now=5)
+    assert worker_b.retry_after('user:bob', now=10) == 0  # Memory alone has one attempt
+    assert worker_b.retry_after('user:bob', db, now=10) == 50
+    assert worker_b.retry_after('user:bob', now=10) == 50  # Now answered from memory
+
+    worker_a.reset('user:bob', db)
+    assert worker_a.retry_after('user:bob', db, now=10) == 0
+    worker_a.record('user:bob', db, now=20)
+    assert worker_b.retry_after('user:bob', now=20) == 40  # Still blocked in worker_b's memory
+    assert worker_a.retry_after('user:bob', db, now=20) == 0
+
+
+def test_expired_attempts_are_pruned(db):
+    throttle = SlidingWindowThrottle(max_attempts=5, window=60, max_keys=2, prune_every=3)
+    throttle.record('user:a', db, now=0)
+    throttle.record('user:b', db, now=1)
+    throttle.record('user:c', db, now=100)  # Third record: prunes every key out of the window
+    assert db.execute("SELECT key FROM login_attempts").fetchall() == [('user:c',)]
+    assert len(throttle._attempts) == 2
@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from app import tokens
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE revoked_tokens (id INTEGER PRIMARY KEY AUTOINCREMENT, jti TEXT UNIQUE, expires_at REAL)")
+    conn.execute("CREATE TABLE refresh_tokens (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, "
+                 "token_hash TEXT UNIQUE, expires_at REAL)")
+    yield conn
+    conn.close()
+
+
+def test_round_trip_and_expiry():
+    keys = tokens.get_key_ring('', 'secret')
+    claims = tokens.access_token_claims(7, 'user', ttl=60, now=1000)
+    token = tokens.encode(claims, keys)
+    assert tokens.decode(token, keys, now=1030) == claims
+    with pytest.raises(tokens.TokenError, match='expired'):
+        tokens.decode(token, keys, now=1060)
+    with pytest.raises(tokens.TokenError, match='signature'):
+        tokens.decode(token, tokens.get_key_ring('', 'other secret'), now=1030)
+
+
+@pytest.mark.parametrize('token', ['', 'a.b', 'a.b.c', 'eyJhbGciOiJub25lIn0.e30.', 'ключ.b.c'])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(tokens.TokenError):
+        tokens.decode(token, tokens.get_key_ring('', 'secret'))
+
+
+def test_tampered_payload_is_rejected():
+    keys = tokens.get_key_ring('', 'secret')
+    header, payload, signature = tokens.encode(tokens.access_token_claims(7, 'user', 60), keys).split('.')
+    forged = tokens.encode(tokens.access_token_claims(1, 'admin', 60), keys).split('.')[1]
+    with pytest.raises(tokens.TokenError):
+        tokens.decode(f"{header}.{forged}.{signature}", keys)
+
+
+@pytest.mark.parametrize('kid', [['default'], {'id': 'default'}, None, 1])
+def test_tokens_with_an_invalid_key_id_are_rejected(kid):
+    keys = tokens.get_key_ring('', 'secret')
+    _, payload, signature = tokens.encode(tokens.access_token_claims(7, 'user', 60), keys).split('.')
+    header = tokens._b64encode(json.dumps({'alg': tokens.ALGORITHM, 'typ': 'JWT', 'kid': kid}).encode())
+    with pytest.raises(tokens.TokenError, match='key id'):
+        tokens.decode(f"{header.decode('ascii')}.{payload}.{signature}", keys)
+
+
+def test_key_rotation():
+    old = tokens.get_key_ring('k1:first', 'unused')
+    rotated = tokens.get_key_ring('k2:second,k1:first', 'unused')
+    token = tokens.encode(tokens.access_token_claims(7, 'user', 60), old)
+    assert tokens.decode(token, rotated)['sub'] == '7'  # Old tokens stay valid during the rotation
+    with pytest.raises(tokens.TokenError, match='unknown key'):
+        tokens.decode(tokens.encode(tokens.access_token_claims(7, 'user', 60), rotated), old)
+    assert tokens.get_key_ring('k2:second,k1:first', 'unused') is rotated  # Cached
+
+
+def test_refresh_tokens_are_single_use(db):
+    token = tokens.store_refresh_token(db, 7, ttl=60, now=1000)
+    assert token not in str(db.execute("SELECT * FROM refresh_tokens").fetchall())  # Only the hash is stored
+    assert tokens.consume_refresh_token(db, token, now=1010) == 7
+    assert tokens.consume_refresh_token(db, token, now=1010) is None
+    expired = tokens.store_refresh_token(db, 7, ttl=60, now=1000)
+    assert tokens.consume_refresh_token(db, expired, now=1060) is None
+
+
+def test_revocations_reach_other_workers(db):
+    now = time.time()
+    worker_a = tokens.RevocationSet(refresh_interval=5)
+    worker_b = tokens.RevocationSet(refresh_interval=5)
+    worker_b.refresh(db, now=now)
+    worker_a.revoke(db, 'jti-1', expires_at=now + 100)
+    assert 'jti-1' in worker_a
+    assert not worker_b.stale(now=now + 1) and 'jti-1' not in worker_b
+    assert worker_b.stale(now=now + 5)
+    worker_b.refresh(db, now=now + 5)
+    assert 'jti-1' in worker_b
+    worker_b.refresh(db, now=now + 100)
+    assert 'jti-1' not in worker_b  # Expired tokens are forgotten
+
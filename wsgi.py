@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Settings come from the environment and .env (see app/config.py); gunicorn.conf.py explains
+the worker and thread counts.
+"""
+from app import create_app
+
+app = create_app()